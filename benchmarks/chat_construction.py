@@ -0,0 +1,62 @@
+"""Benchmark the cost of constructing a ChatOpenAI wrapper, and of resolving its plugin instance.
+
+Run with `python benchmarks/chat_construction.py`. The client is a stub whose `use_plugin` sleeps for
+`PLUGIN_LATENCY_S`, standing in for the round-trip to the Steamship engine.
+"""
+import sys
+import time
+import timeit
+import uuid
+from types import SimpleNamespace
+
+from steamship_langchain.chat_models.openai import ChatOpenAI
+
+PLUGIN_LATENCY_S = 0.05
+RUNS = 200
+
+
+class StubClient:
+    """Just enough of a Steamship client to construct a wrapper, counting (slow) plugin lookups."""
+
+    def __init__(self, latency_s: float):
+        self.config = SimpleNamespace(
+            api_base="https://stub",
+            api_key="stub",
+            workspace_id=uuid.uuid4().hex,
+            workspace_handle=None,
+        )
+        self.latency_s = latency_s
+        self.use_plugin_calls = 0
+
+    def use_plugin(self, *args, **kwargs) -> object:
+        self.use_plugin_calls += 1
+        time.sleep(self.latency_s)
+        return object()
+
+
+def main():
+    openai_module = sys.modules.get("openai")
+
+    client = StubClient(latency_s=0.0)
+    per_run = timeit.timeit(lambda: ChatOpenAI(client=client), number=RUNS) / RUNS
+    print(f"construction (no plugin latency):   {per_run * 1e6:8.1f} us/wrapper")
+
+    client = StubClient(latency_s=PLUGIN_LATENCY_S)
+    per_run = timeit.timeit(lambda: ChatOpenAI(client=client), number=RUNS // 10) / (RUNS // 10)
+    print(
+        f"construction ({PLUGIN_LATENCY_S * 1000:.0f}ms plugin latency): {per_run * 1e6:8.1f} us/wrapper"
+    )
+    print(f"plugin lookups during construction: {client.use_plugin_calls}")
+
+    for attempt in ("first", "shared"):
+        chat = ChatOpenAI(client=client)
+        t0 = time.perf_counter()
+        getattr(chat, "_llm_plugin")
+        print(
+            f"{attempt} plugin resolution:{' ' * (19 - len(attempt))}{(time.perf_counter() - t0) * 1e6:8.1f} us"
+        )
+    print(f"openai module left intact: {sys.modules.get('openai') is openai_module}")
+
+
+if __name__ == "__main__":
+    main()
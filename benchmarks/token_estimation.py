@@ -0,0 +1,50 @@
+"""Benchmark exact, approximate and hybrid token counting of a conversation history.
+
+Run with `python benchmarks/token_estimation.py`. Loading the tiktoken encodings needs network access, or a populated
+encoding cache directory (set TIKTOKEN_CACHE_DIR, see `steamship_langchain.tokens.prewarm_encodings`).
+"""
+import random
+import timeit
+
+from steamship_langchain.tokens import TokenCounter, TokenEstimator, get_encoding, prewarm_encodings
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while agents call tools and summarize memory".split()
+)
+
+
+def _history(turns: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 200))) for _ in range(turns)]
+
+
+def main():
+    print(f"encoding load times (s): {prewarm_encodings()}")
+    history = _history(200)
+    for encoding_name in ("p50k_base", "cl100k_base"):
+        encoding = get_encoding(encoding_name)
+        exact_total = sum(len(encoding.encode_ordinary(text)) for text in history)
+        calibrated = TokenEstimator()
+        calibrated.calibrate(TokenCounter(encoding), _history(200, seed=1))
+
+        estimators = {
+            "exact": TokenEstimator(mode="exact"),
+            "approximate": TokenEstimator(mode="approximate"),
+            "calibrated": calibrated,
+            "hybrid": TokenEstimator(mode="hybrid", limit=exact_total // 2),
+        }
+        print(f"\n{encoding_name}: {len(history)} messages, {exact_total} tokens")
+        for name, estimator in estimators.items():
+
+            def _count():
+                # a fresh (uncached) counter per run, so that exact counting encodes every message.
+                return estimator.count_total(TokenCounter(encoding), history)
+
+            seconds = min(timeit.repeat(_count, number=10, repeat=3)) / 10
+            total = _count()
+            error = (total - exact_total) / exact_total
+            print(f"  {name:>12}: {seconds * 1000:8.3f} ms/count, total {total:7d} ({error:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,27 @@
 """OpenAI chat wrapper."""
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
 import json
 import logging
-from typing import Any, Dict, Generator, List, Mapping, Optional, Tuple
+import weakref
+from collections import defaultdict
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
-import tiktoken
-from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain.chat_models.base import BaseChatModel
 from langchain.chat_models.openai import ChatOpenAI
 from langchain.schema import (
@@ -20,12 +35,40 @@ from langchain.schema import (
     LLMResult,
     SystemMessage,
 )
-from pydantic import Extra, Field, ValidationError
-from steamship import Block, File, MimeTypes, PluginInstance, Steamship, Tag
-from steamship.data.tags.tag_constants import TagKind
+from pydantic import Extra, Field, PrivateAttr, root_validator
+from steamship import Block, File, MimeTypes, PluginInstance, Steamship, Tag, Task
+from steamship.data.tags.tag_constants import RoleTag, TagKind
+
+from steamship_langchain.files import (
+    ConversationFile,
+    arun_with_prompt_file,
+    run_with_prompt_file,
+    transient_tag,
+)
+from steamship_langchain.limits import RateLimiter, limit, limit_async
+from steamship_langchain.plugins import use_plugin
+from steamship_langchain.tasks import Hedger, PollPolicy, stream_block_text, wait, wait_async
+from steamship_langchain.tokens import (
+    REPLY_PRIMING_TOKENS,
+    ContextTrimmer,
+    TokenCounter,
+    TokenEstimator,
+    combine_token_usage,
+    message_overhead,
+    message_texts_and_overhead,
+    message_token_cache,
+    message_token_counts,
+    reported_token_usage,
+    token_counter,
+    token_counter_for_model,
+    token_usage,
+)
+from steamship_langchain.workspace import get_workspace_handle
 
 logger = logging.getLogger(__file__)
 
+PLUGIN_HANDLE: str = "gpt-4"
+
 
 def _convert_dict_to_message(_dict: Mapping[str, Any]) -> BaseMessage:
     role = _dict["role"]
@@ -103,7 +146,31 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
     max_tokens: Optional[int] = None
     """Maximum number of tokens to generate."""
     model_kwargs: Dict[str, Any] = Field(default_factory=dict)
-    _llm_plugin: PluginInstance
+    poll_policy: Optional[PollPolicy] = None
+    """How to poll generation tasks for completion. Defaults to the shared backoff policy."""
+    rate_limiter: Optional[RateLimiter] = None
+    """Limits on requests/sec, tokens/min and concurrency, shared with other LLMs drawing on the same quota."""
+    hedger: Optional[Hedger] = None
+    """If set, slow (non-streaming) completions are hedged with a duplicate generate task."""
+    reuse_prompt_files: bool = False
+    """If set, (non-streaming) prompts are uploaded once, as content-addressed Files, and reused on repeat calls.
+
+    Reused Files are tagged as transient like any other prompt File, and each distinct prompt keeps its File until a
+    `TransientFileCollector` deletes it (after which it is uploaded again on next use), so run one when enabling this.
+    """
+    token_estimator: Optional[TokenEstimator] = None
+    """If set, token counts are approximated (or, in hybrid mode, only counted exactly near a limit)."""
+    moderate_output: bool = True
+    """Whether the plugin should moderate generated output."""
+    context_trimmer: Optional[ContextTrimmer] = None
+    """If set, prompts are trimmed to its token budget (with a conversation File, only the kept messages are selected)."""
+    conversation_file: Optional[ConversationFile] = None
+    """If set, the session's history is kept in this File, and each turn (one message list) uploads only new messages."""
+    max_concurrent_generations: int = 8
+    """Maximum number of message lists that `agenerate` has in-flight at once (per event loop)."""
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+        PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    )
 
     class Config:
         """Configuration for this pydantic object."""
@@ -117,27 +184,21 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
         moderate_output: bool = True,
         **kwargs,
     ):
-        try:
+        super().__init__(
+            client=client, model_name=model_name, moderate_output=moderate_output, **kwargs
+        )
 
-            class OpenAI(object):
-                class ChatCompletion:
-                    pass
-
-            import sys
-
-            sys.modules["openai"] = OpenAI
-
-            dummy_api_key = False
-            if "openai_api_key" not in kwargs:
-                kwargs["openai_api_key"] = "DUMMY"
-                dummy_api_key = True
-            super().__init__(client=client, model_name=model_name, **kwargs)
-            if dummy_api_key:
-                self.openai_api_key = None
-        except ValidationError as e:
-            print(e)
-        self.client = client
-        plugin_config = {"model": self.model_name, "moderate_output": moderate_output}
+    @root_validator()
+    def validate_environment(cls, values: Dict) -> Dict:  # noqa: N805
+        # generation happens in the Steamship plugin: neither the openai package nor an API key are required.
+        if values["n"] < 1:
+            raise ValueError("n must be at least 1.")
+        if values["n"] > 1 and values["streaming"]:
+            raise ValueError("n must be 1 when streaming.")
+        return values
+
+    def _plugin_config(self) -> Dict[str, Any]:
+        plugin_config = {"model": self.model_name, "moderate_output": self.moderate_output}
         if self.openai_api_key:
             plugin_config["openai_api_key"] = self.openai_api_key
 
@@ -152,12 +213,12 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
         ]:
             if model_args.get(arg):
                 plugin_config[arg] = model_args[arg]
+        return plugin_config
 
-        self._llm_plugin = self.client.use_plugin(
-            plugin_handle="gpt-4",
-            config=plugin_config,
-            fetch_if_exists=True,
-        )
+    @property
+    def _llm_plugin(self) -> PluginInstance:
+        """The generator plugin instance, resolved on first use and shared by wrappers with the same config."""
+        return use_plugin(self.client, PLUGIN_HANDLE, self._plugin_config())
 
     @property
     def _default_params(self) -> Dict[str, Any]:
@@ -171,36 +232,158 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
             # TODO (enias): Add other params
         }
 
+    def generate(self, messages: List[List[BaseMessage]], *args: Any, **kwargs: Any) -> LLMResult:
+        self._check_single_conversation(messages)
+        return super().generate(messages, *args, **kwargs)
+
+    async def agenerate(
+        self, messages: List[List[BaseMessage]], *args: Any, **kwargs: Any
+    ) -> LLMResult:
+        self._check_single_conversation(messages)
+        return await super().agenerate(messages, *args, **kwargs)
+
+    def _check_single_conversation(self, messages: List[List[BaseMessage]]) -> None:
+        # a conversation File holds one history: each of several message lists would restart it in turn.
+        if self.conversation_file is not None and len(messages) != 1:
+            raise ValueError(
+                f"With a conversation_file, generate from one list of messages at a time (got {len(messages)})."
+            )
+
     def completion_with_retry(self, prompt: str, stop: Optional[List[str]] = None) -> Generator:
         raise RuntimeError("completion_with_retry is not supported, please use .generate instead.")
 
     def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
-        return {"model_name": self.model_name}
+        token_usage = combine_token_usage(
+            output.get("token_usage") for output in llm_outputs if output is not None
+        )
+        return {"token_usage": token_usage, "model_name": self.model_name}
+
+    @staticmethod
+    def _message_block(msg: Dict[str, str]) -> Optional[Block]:
+        """The block holding a message, or None for a message without content (which is not uploaded)."""
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        name = msg.get("name", "")
+        if len(content) == 0:
+            return None
+
+        tags = [Tag(kind=TagKind.ROLE, name=role)]
+        if name:
+            tags.append(Tag(kind="name", name=name))
+        return Block(
+            text=content,
+            tags=tags,
+            mime_type=MimeTypes.TXT,
+        )
+
+    def _message_blocks(self, messages: [Dict[str, str]]) -> List[Block]:
+        return [block for block in map(self._message_block, messages) if block is not None]
+
+    def _estimate_tokens(self, messages: [Dict[str, str]], **params) -> int:
+        """Estimate the tokens a completion counts against the upstream quota: its messages plus the replies."""
+        prompt_tokens = sum(self.get_num_tokens_batch([msg.get("content", "") for msg in messages]))
+        return prompt_tokens + params.get("n", 1) * (params.get("max_tokens") or 0)
+
+    def _conversation(self, params: Dict[str, Any]) -> Optional[ConversationFile]:
+        # with several completions, the File would hold replies that the next turn's history does not.
+        if self.conversation_file is None or params.get("n", 1) != 1:
+            return None
+        return self.conversation_file
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _turn(conversation: Optional[ConversationFile]) -> Iterator[None]:
+        if conversation is None:
+            yield
+            return
+        with conversation.turn():
+            yield
+
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def _aturn(conversation: Optional[ConversationFile]) -> AsyncIterator[None]:
+        if conversation is None:
+            yield
+            return
+        async with conversation.aturn():
+            yield
+
+    def _prompt_input(
+        self,
+        messages: [Dict[str, str]],
+        conversation: Optional[ConversationFile] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """Upload the prompt `messages`, returning the `generate` arguments that select it as input.
+
+        With a conversation, the File holds the whole (untrimmed) `history`, and the messages kept by trimming are
+        selected from it by block index, so that trimming does not start a new File every turn. A summary of dropped
+        turns is not part of the history: a prompt holding one is uploaded as a transient File of its own.
+        """
+        if conversation is not None:
+            history = messages if history is None else history
+            blocks = [self._message_block(msg) for msg in history]
+            file_id = conversation.sync([block for block in blocks if block is not None])
+            if messages is history:
+                return {"input_file_id": file_id}
+
+            block_indices, index = {}, 0
+            for msg, block in zip(history, blocks):
+                block_indices[id(msg)] = index if block is not None else None
+                index += block is not None
+            if all(id(msg) in block_indices for msg in messages):
+                return {
+                    "input_file_id": file_id,
+                    "input_file_block_index_list": [
+                        block_indices[id(msg)]
+                        for msg in messages
+                        if block_indices[id(msg)] is not None
+                    ],
+                }
 
-    def _complete(self, messages: [Dict[str, str]], **params) -> List[BaseMessage]:
-        blocks = []
+        blocks = self._message_blocks(messages)
+        file = File.create(self.client, blocks=blocks, tags=[transient_tag(self._llm_type)])
+        return {"input_file_id": file.id}
 
-        for msg in messages:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            name = msg.get("name", "")
-            if len(content) > 0:
-                tags = [Tag(kind=TagKind.ROLE, name=role)]
-                if name:
-                    tags.append(Tag(kind="name", name=name))
+    def _generate_call(
+        self,
+        prompt_input: Dict[str, Any],
+        params: Dict[str, Any],
+        conversation: Optional[ConversationFile],
+        streaming: bool = False,
+    ) -> Callable[[], Task]:
+        if conversation is None and not streaming:
+            return functools.partial(self._llm_plugin.generate, options=params, **prompt_input)
+        # replies are appended to the conversation File, so that the next turn need not upload them. streamed
+        # output is always written to a File.
+        return functools.partial(
+            self._llm_plugin.generate,
+            options=params,
+            streaming=streaming,
+            append_output_to_file=True,
+            output_file_id=(
+                conversation.file_id if conversation is not None else prompt_input["input_file_id"]
+            ),
+            **prompt_input,
+        )
 
-                blocks.append(
+    @staticmethod
+    def _record_streamed(
+        conversation: Optional[ConversationFile], completions: Dict[int, str]
+    ) -> None:
+        if conversation is not None:
+            conversation.extend(
+                [
                     Block(
-                        text=content,
-                        tags=tags,
-                        mime_type=MimeTypes.TXT,
+                        text=completions[index],
+                        tags=[Tag(kind=TagKind.ROLE, name=RoleTag.ASSISTANT)],
                     )
-                )
-
-        file = File.create(self.client, blocks=blocks)
-        generate_task = self._llm_plugin.generate(input_file_id=file.id, options=params)
-        generate_task.wait()
+                    for index in sorted(completions)
+                ]
+            )
 
+    @staticmethod
+    def _output_messages(output: Any) -> List[BaseMessage]:
         return [
             _convert_dict_to_message(
                 {
@@ -208,9 +391,163 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
                     "role": [tag for tag in block.tags if tag.kind == TagKind.ROLE.value][0].name,
                 }
             )
-            for block in generate_task.output.blocks
+            for block in output.blocks
         ]
 
+    def _run_generate(
+        self,
+        prompt_input: Dict[str, Any],
+        params: Dict[str, Any],
+        conversation: Optional[ConversationFile],
+    ) -> Task:
+        generate = self._generate_call(prompt_input, params, conversation)
+        # a hedge would append a second reply to a conversation File.
+        if self.hedger and conversation is None:
+            return self.hedger.run(generate, policy=self.poll_policy)
+        generate_task = generate()
+        wait(generate_task, policy=self.poll_policy)
+        return generate_task
+
+    async def _arun_generate(
+        self,
+        prompt_input: Dict[str, Any],
+        params: Dict[str, Any],
+        conversation: Optional[ConversationFile],
+    ) -> Task:
+        loop = asyncio.get_running_loop()
+        generate = self._generate_call(prompt_input, params, conversation)
+        if self.hedger and conversation is None:
+            return await loop.run_in_executor(
+                None, functools.partial(self.hedger.run, generate, policy=self.poll_policy)
+            )
+        generate_task = await loop.run_in_executor(None, generate)
+        await wait_async(generate_task, policy=self.poll_policy)
+        return generate_task
+
+    def _complete(
+        self,
+        messages: [Dict[str, str]],
+        history: Optional[List[Dict[str, Any]]] = None,
+        **params,
+    ) -> Tuple[List[BaseMessage], Optional[Dict[str, int]]]:
+        conversation = self._conversation(params)
+        with self._turn(conversation), limit(
+            self.rate_limiter, lambda: self._estimate_tokens(messages, **params)
+        ):
+            if self.reuse_prompt_files and conversation is None:
+                generate_task = run_with_prompt_file(
+                    self.client,
+                    self._message_blocks(messages),
+                    lambda file_id: self._run_generate({"input_file_id": file_id}, params, None),
+                    tags=[transient_tag(self._llm_type)],
+                )
+            else:
+                prompt_input = self._prompt_input(messages, conversation, history)
+                generate_task = self._run_generate(prompt_input, params, conversation)
+            if conversation is not None:
+                conversation.extend(generate_task.output.blocks)
+        output = generate_task.output
+        return self._output_messages(output), reported_token_usage(output.blocks)
+
+    async def _acomplete(
+        self,
+        messages: [Dict[str, str]],
+        history: Optional[List[Dict[str, Any]]] = None,
+        **params,
+    ) -> Tuple[List[BaseMessage], Optional[Dict[str, int]]]:
+        loop = asyncio.get_running_loop()
+        conversation = self._conversation(params)
+        async with self._aturn(conversation), limit_async(
+            self.rate_limiter, lambda: self._estimate_tokens(messages, **params)
+        ):
+            if self.reuse_prompt_files and conversation is None:
+                generate_task = await arun_with_prompt_file(
+                    self.client,
+                    self._message_blocks(messages),
+                    lambda file_id: self._arun_generate({"input_file_id": file_id}, params, None),
+                    tags=[transient_tag(self._llm_type)],
+                )
+            else:
+                prompt_input = await loop.run_in_executor(
+                    None, self._prompt_input, messages, conversation, history
+                )
+                generate_task = await self._arun_generate(prompt_input, params, conversation)
+            if conversation is not None:
+                conversation.extend(generate_task.output.blocks)
+        output = generate_task.output
+        return self._output_messages(output), reported_token_usage(output.blocks)
+
+    def _stream_complete(
+        self,
+        messages: [Dict[str, str]],
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **params,
+    ) -> Generator[Tuple[int, str], None, None]:
+        """Generate with streaming, yielding (completion index, token) pairs as output is written.
+
+        Each token is also reported to `run_manager.on_llm_new_token`.
+        """
+        conversation = self._conversation(params)
+        completions = defaultdict(str)
+        with self._turn(conversation), limit(
+            self.rate_limiter, lambda: self._estimate_tokens(messages, **params)
+        ):
+            prompt_input = self._prompt_input(messages, conversation, history)
+            generate_task = self._generate_call(
+                prompt_input, params, conversation, streaming=True
+            )()
+            # with streaming, the task completes once the output blocks exist; their content is written afterwards.
+            wait(generate_task, policy=self.poll_policy)
+
+            for index, block in enumerate(generate_task.output.blocks):
+                for token in stream_block_text(self.client, block.id):
+                    if run_manager:
+                        run_manager.on_llm_new_token(token)
+                    completions[index] += token
+                    yield index, token
+            self._record_streamed(conversation, completions)
+
+    async def _astream_complete(
+        self,
+        messages: [Dict[str, str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        **params,
+    ) -> Dict[int, str]:
+        """Asynchronous counterpart of `_stream_complete`, returning the completions by index once they are done."""
+        loop = asyncio.get_running_loop()
+        conversation = self._conversation(params)
+        completions = defaultdict(str)
+        async with self._aturn(conversation), limit_async(
+            self.rate_limiter, lambda: self._estimate_tokens(messages, **params)
+        ):
+            prompt_input = await loop.run_in_executor(
+                None, self._prompt_input, messages, conversation, history
+            )
+            generate_task = await loop.run_in_executor(
+                None, self._generate_call(prompt_input, params, conversation, streaming=True)
+            )
+            await wait_async(generate_task, policy=self.poll_policy)
+
+            for index, block in enumerate(generate_task.output.blocks):
+                tokens = stream_block_text(self.client, block.id)
+                # each token is polled for in the default executor, so that streaming does not block the loop.
+                while (token := await loop.run_in_executor(None, next, tokens, None)) is not None:
+                    if run_manager:
+                        await run_manager.on_llm_new_token(token)
+                    completions[index] += token
+            self._record_streamed(conversation, completions)
+        return completions
+
+    def stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None
+    ) -> Generator[str, None, None]:
+        """Yield generated text incrementally, as it is produced, for a single list of messages."""
+        history, params = self._create_message_dicts(messages, stop)
+        for _, token in self._stream_complete(self._trim(history), history=history, **params):
+            yield token
+
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -218,18 +555,95 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        message_dicts, params = self._create_message_dicts(messages, stop)
+        history, params = self._create_message_dicts(messages, stop)
+        message_dicts = self._trim(history)
         params = {**params, **kwargs}
-        messages = self._complete(messages=message_dicts, **params)
+        usage = None
+        if self.streaming:
+            completions = defaultdict(str)
+            for index, token in self._stream_complete(
+                message_dicts, run_manager=run_manager, history=history, **params
+            ):
+                completions[index] += token
+            messages = [
+                _convert_dict_to_message({"role": "assistant", "content": completions[index]})
+                for index in sorted(completions)
+            ]
+        else:
+            messages, usage = self._complete(messages=message_dicts, history=history, **params)
+        return self._chat_result(message_dicts, messages, usage)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        history, params = self._create_message_dicts(messages, stop)
+        message_dicts = self._trim(history)
+        params = {**params, **kwargs}
+        # `agenerate` gathers every message list at once: bound how many are in-flight.
+        usage = None
+        async with self._semaphore():
+            if self.streaming:
+                completions = await self._astream_complete(
+                    message_dicts, run_manager=run_manager, history=history, **params
+                )
+                messages = [
+                    _convert_dict_to_message({"role": "assistant", "content": completions[index]})
+                    for index in sorted(completions)
+                ]
+            else:
+                messages, usage = await self._acomplete(
+                    messages=message_dicts, history=history, **params
+                )
+        return self._chat_result(message_dicts, messages, usage)
+
+    def _chat_result(
+        self,
+        message_dicts: List[Dict[str, Any]],
+        messages: List[BaseMessage],
+        usage: Optional[Dict[str, int]] = None,
+    ) -> ChatResult:
+        """Build the result of a generation, with the usage reported by the plugin (or, failing that, counted)."""
+        if usage is None:
+            try:
+                usage = self._counted_token_usage(message_dicts, messages)
+            except Exception as e:
+                # e.g. the encoding could not be loaded: usage is reported, but never fails a generation.
+                logger.warning(f"could not count token usage: {e}")
+                usage = {}
         return ChatResult(
             generations=[ChatGeneration(message=message) for message in messages],
-            llm_output={"model_name": self.model_name},
+            llm_output={"token_usage": usage, "model_name": self.model_name},
         )
 
-    async def _agenerate(
-        self, messages: List[BaseMessage], stop: Optional[List[str]] = None
-    ) -> ChatResult:
-        raise NotImplementedError("Support for async is not provided yet.")
+    def _counted_token_usage(
+        self, message_dicts: List[Dict[str, Any]], messages: List[BaseMessage]
+    ) -> Dict[str, int]:
+        try:
+            prompt_tokens = REPLY_PRIMING_TOKENS + sum(self._message_token_counts(message_dicts))
+        except NotImplementedError:
+            # the chat format of the model is unknown: count the message contents alone.
+            prompt_tokens = sum(self._count_texts([m.get("content", "") for m in message_dicts]))
+        completion_tokens = sum(self._count_texts([message.content for message in messages]))
+        return token_usage(prompt_tokens, completion_tokens)
+
+    def _count_texts(self, texts: List[str]) -> List[int]:
+        counter = self._message_counter()
+        if self.token_estimator:
+            return self.token_estimator.count_batch(counter, texts)
+        return counter.count_batch(texts)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(
+                max(1, self.max_concurrent_generations)
+            )
+        return semaphore
 
     def _create_message_dicts(
         self, messages: List[BaseMessage], stop: Optional[List[str]]
@@ -242,6 +656,26 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
         message_dicts = [_convert_message_to_dict(m) for m in messages]
         return message_dicts, params
 
+    def _trim(self, message_dicts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Trim a history to the context trimmer's budget (if any), keeping the dicts of the messages it keeps.
+
+        Messages are counted exactly (and cached) even with a token estimator, since the trimmed prompt must fit.
+        """
+        if self.context_trimmer is None:
+            return message_dicts
+        return self.context_trimmer.trim(message_dicts, self._exact_message_token_counts)
+
+    def _message_token_counts(self, message_dicts: List[Dict[str, Any]]) -> List[int]:
+        """Count the tokens each message adds to a prompt (see `message_token_counts`)."""
+        if self.token_estimator:
+            overhead = message_overhead(self.model_name)
+            return message_token_counts(message_dicts, overhead, self._count_texts)
+        return self._exact_message_token_counts(message_dicts)
+
+    def _exact_message_token_counts(self, message_dicts: List[Dict[str, Any]]) -> List[int]:
+        overhead = message_overhead(self.model_name)
+        return message_token_cache.counts(message_dicts, overhead, self._message_counter())
+
     def _create_chat_result(self, response: Mapping[str, Any]) -> ChatResult:
         generations = []
         for res in response["choices"]:
@@ -257,72 +691,53 @@ class ChatOpenAI(ChatOpenAI, BaseChatModel):
         return {
             **{
                 "model_name": self.model_name,
-                "workspace_handle": self.client.get_workspace().handle,
+                "workspace_handle": get_workspace_handle(self.client),
                 "plugin_handle": "gpt-4",
             },
             **self._default_params,
         }
 
-    async def agenerate(
-        self, messages: List[List[BaseMessage]], stop: Optional[List[str]] = None
-    ) -> LLMResult:
-        raise NotImplementedError("Support for async is not provided yet.")
-
     def get_num_tokens(self, text: str) -> int:
         """Calculate num tokens with tiktoken package."""
-        enc = tiktoken.encoding_for_model(self.model_name)
-        tokenized_text = enc.encode(text)
-        return len(tokenized_text)
+        counter = token_counter_for_model(self.model_name)
+        if self.token_estimator:
+            return self.token_estimator.count(counter, text)
+        return counter.count(text)
+
+    def get_num_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Calculate num tokens for each of `texts` with tiktoken package, encoding them as a single batch."""
+        counter = token_counter_for_model(self.model_name)
+        if self.token_estimator:
+            return self.token_estimator.count_batch(counter, texts)
+        return counter.count_batch(texts)
 
     def get_num_tokens_from_messages(self, messages: List[BaseMessage]) -> int:
         """Calculate num tokens for gpt-3.5-turbo and gpt-4 with tiktoken package.
 
+        The per-message overhead of each model is looked up in `MODEL_MESSAGE_OVERHEAD` (and, by prefix, in
+        `MODEL_PREFIX_MESSAGE_OVERHEAD`). Per-message counts are cached in `message_token_cache`, and the fields of
+        uncached messages are encoded as a single batch.
+
         Official documentation: https://github.com/openai/openai-cookbook/blob/
         main/examples/How_to_format_inputs_to_ChatGPT_models.ipynb"""
 
-        model = self.model_name
-        if model == "gpt-3.5-turbo":
-            # gpt-3.5-turbo may change over time.
-            # Returning num tokens assuming gpt-3.5-turbo-0301.
-            model = "gpt-3.5-turbo-0301"
-        elif model == "gpt-4":
-            # gpt-4 may change over time.
-            # Returning num tokens assuming gpt-4-0314.
-            model = "gpt-4-0314"
-
-        # Returns the number of tokens used by a list of messages.
+        overhead = message_overhead(self.model_name)
+        counter = self._message_counter()
+        message_dicts = [_convert_message_to_dict(m) for m in messages]
+        if self.token_estimator:
+            texts, num_tokens = message_texts_and_overhead(message_dicts, overhead)
+            return self.token_estimator.count_total(counter, texts, overhead=num_tokens)
+        # unchanged messages are counted once, across turns: only new messages are encoded.
+        return REPLY_PRIMING_TOKENS + sum(
+            message_token_cache.counts(message_dicts, overhead, counter)
+        )
+
+    def _message_counter(self) -> TokenCounter:
         try:
-            encoding = tiktoken.encoding_for_model(model)
+            return token_counter_for_model(self.model_name)
         except KeyError:
             logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-
-        if model == "gpt-3.5-turbo-0301":
-            # every message follows <im_start>{role/name}\n{content}<im_end>\n
-            tokens_per_message = 4
-            # if there's a name, the role is omitted
-            tokens_per_name = -1
-        elif model == "gpt-4-0314":
-            tokens_per_message = 3
-            tokens_per_name = 1
-        else:
-            raise NotImplementedError(
-                f"get_num_tokens_from_messages() is not presently implemented "
-                f"for model {model}."
-                "See https://github.com/openai/openai-python/blob/main/chatml.md for "
-                "information on how messages are converted to tokens."
-            )
-        num_tokens = 0
-        messages_dict = [_convert_message_to_dict(m) for m in messages]
-        for message in messages_dict:
-            num_tokens += tokens_per_message
-            for key, value in message.items():
-                num_tokens += len(encoding.encode(value))
-                if key == "name":
-                    num_tokens += tokens_per_name
-        # every reply is primed with <im_start>assistant
-        num_tokens += 3
-        return num_tokens
+            return token_counter("cl100k_base")
 
     @property
     def _llm_type(self) -> str:
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from steamship import File, PluginInstance, Steamship, SteamshipError, TaskState
 
 from steamship_langchain.file_loaders import add_tags_to_file_from_url
+from steamship_langchain.tasks import PollPolicy, wait
 
 
 class YouTubeFileLoader(BaseModel):
@@ -22,9 +23,13 @@ class YouTubeFileLoader(BaseModel):
     client: Steamship
     "Provides Steamship workspace-scoping for File loading."
 
+    poll_policy: Optional[PollPolicy] = None
+    "Determines how import tasks are polled for completion (default: shared backoff policy)."
+
     _yt_importer: PluginInstance = None
 
     class Config:
+        arbitrary_types_allowed = True
         underscore_attrs_are_private = True
 
     def __init__(self, **kwargs):
@@ -36,12 +41,8 @@ class YouTubeFileLoader(BaseModel):
         task = File.create_with_plugin(
             client=self.client, plugin_instance=self._yt_importer.handle, url=video_url
         )
-        while task.state not in [TaskState.failed, TaskState.succeeded]:
-            try:
-                task.wait(max_timeout_s=60, retry_delay_s=2)
-            except SteamshipError as e:
-                if not ("timeout" in e.message):
-                    raise e
+        # imports can take a long time; wait without a timeout, until the task either succeeds or fails.
+        wait(task, max_timeout_s=-1, policy=self.poll_policy)
 
         if task.state == TaskState.failed:
             raise SteamshipError(
@@ -0,0 +1,26 @@
+"""Provides helpers for managing the Steamship Files that prompts are uploaded as."""
+
+from .conversation import ConversationFile
+from .prompt_files import (
+    PromptFileIndex,
+    arun_with_prompt_file,
+    prompt_file_handle,
+    prompt_file_id,
+    prompt_file_index,
+    run_with_prompt_file,
+)
+from .transient import TRANSIENT_TAG_KIND, CollectionReport, TransientFileCollector, transient_tag
+
+__all__ = [
+    "arun_with_prompt_file",
+    "CollectionReport",
+    "ConversationFile",
+    "prompt_file_handle",
+    "prompt_file_id",
+    "prompt_file_index",
+    "PromptFileIndex",
+    "run_with_prompt_file",
+    "TRANSIENT_TAG_KIND",
+    "TransientFileCollector",
+    "transient_tag",
+]
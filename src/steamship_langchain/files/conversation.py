@@ -0,0 +1,147 @@
+"""Conversation Files, which hold a chat session's history and only have each turn's new messages appended."""
+import asyncio
+import contextlib
+import logging
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from steamship import Block, File, Steamship, SteamshipError
+from steamship.data.tags.tag_constants import TagKind
+
+BlockKey = Tuple[str, str, str]
+
+
+def _block_key(block: Block) -> BlockKey:
+    role, name = "", ""
+    for tag in block.tags or []:
+        if tag.kind == TagKind.ROLE:
+            role = tag.name
+        elif tag.kind == "name":
+            name = tag.name
+    return role, name, block.text or ""
+
+
+class ConversationFile:
+    """A persistent File holding the messages of one chat session, to which each turn appends only what is new.
+
+    Without one, every turn uploads the whole history as a new File, so upload cost grows with the length of the
+    conversation. `sync()` instead compares the turn's message blocks with the blocks already in the File, and
+    appends only those past the common prefix. If the history no longer extends the File (e.g. it was edited), a
+    new File is started in its place. (A history trimmed to fit the context window is still kept whole in the File:
+    the messages to generate from are selected by block index.) Generations are appended to the File by the plugin,
+    and recorded with `extend()`, so that the next turn's history (which includes the reply) extends it.
+
+    A turn runs from `sync()` through `extend()`: hold `turn()` (or, from asyncio code, `aturn()`) for its duration,
+    so that concurrent turns of the same session do not interleave their messages and replies in the File.
+
+    With a `handle`, the File can be picked up again by later processes serving the same session. Conversation
+    Files are not transient: `delete()` one once its session has ended.
+
+    Example:
+        .. code-block:: python
+
+            conversation = ConversationFile(client, handle=f"conversation-{session_id}")
+            chat = ChatOpenAI(client=client, conversation_file=conversation)
+    """
+
+    def __init__(self, client: Steamship, handle: Optional[str] = None):
+        self.client = client
+        self.handle = handle
+        self.files_created = 0
+        self.blocks_appended = 0
+        self._file: Optional[File] = None
+        self._keys: List[BlockKey] = []
+        self._loaded = handle is None
+        self._lock = threading.Lock()
+        self._turn_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def turn(self) -> Iterator["ConversationFile"]:
+        """Hold the conversation for one turn, waiting for any other turn in progress to finish first."""
+        with self._turn_lock:
+            yield self
+
+    @contextlib.asynccontextmanager
+    async def aturn(self) -> AsyncIterator["ConversationFile"]:
+        """Asynchronous counterpart of `turn()`, which waits for the conversation without blocking the event loop."""
+        acquire = asyncio.get_running_loop().run_in_executor(None, self._turn_lock.acquire)
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # the lock is still acquired once the executor gets to it: hand it straight back.
+            acquire.add_done_callback(lambda _: self._turn_lock.release())
+            raise
+        try:
+            yield self
+        finally:
+            self._turn_lock.release()
+
+    @property
+    def file_id(self) -> Optional[str]:
+        """The id of the current conversation File, or None if it has not been created yet."""
+        return self._file.id if self._file is not None else None
+
+    def sync(self, blocks: List[Block]) -> str:
+        """Make the File hold `blocks`, uploading only those it does not already end with. Returns the File's id."""
+        keys = [_block_key(block) for block in blocks]
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if self.file_id is None or keys[: len(self._keys)] != self._keys:
+                self._restart(blocks, keys)
+                return self.file_id
+
+            for block, key in zip(blocks[len(self._keys) :], keys[len(self._keys) :]):
+                Block.create(
+                    self.client,
+                    file_id=self.file_id,
+                    text=block.text,
+                    tags=block.tags,
+                    mime_type=block.mime_type,
+                )
+                self._keys.append(key)
+                self.blocks_appended += 1
+            return self.file_id
+
+    def extend(self, blocks: List[Block]) -> None:
+        """Record blocks that were appended to the File by other means (e.g. generations written by the plugin)."""
+        with self._lock:
+            self._keys.extend(_block_key(block) for block in blocks)
+
+    def delete(self) -> None:
+        """Delete the File, if it has been created. The next `sync()` starts a new one."""
+        with self._lock:
+            if self._file is not None:
+                self._file.delete()
+            self._file = None
+            self._keys = []
+
+    def stats(self) -> Dict[str, int]:
+        """Report the number of Files created, blocks appended to existing Files, and blocks currently held."""
+        with self._lock:
+            return {
+                "files_created": self.files_created,
+                "blocks_appended": self.blocks_appended,
+                "size": len(self._keys),
+            }
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            self._file = File.get(self.client, handle=self.handle)
+        except SteamshipError:
+            return
+        self._keys = [_block_key(block) for block in self._file.blocks]
+
+    def _restart(self, blocks: List[Block], keys: List[BlockKey]) -> None:
+        if self._file is not None:
+            try:
+                # the handle must be free before the replacement File can take it.
+                self._file.delete()
+            except SteamshipError as e:
+                logging.warning(
+                    f"could not delete superseded conversation file {self.file_id}: {e}"
+                )
+        self._file = File.create(self.client, blocks=blocks, handle=self.handle)
+        self._keys = keys
+        self.files_created += 1
@@ -0,0 +1,139 @@
+"""Content-addressed prompt Files, which are uploaded once and reused by every call with the same prompt."""
+import asyncio
+import functools
+import hashlib
+import json
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from steamship import Block, File, Steamship, SteamshipError, Tag, Task, TaskState
+
+from steamship_langchain.lru import LRUCache
+from steamship_langchain.workspace import client_scope
+
+
+def prompt_file_handle(blocks: List[Block]) -> str:
+    """Derive a File handle from the content (text, tags and mime types) of a prompt's blocks."""
+    content = [
+        block.dict(
+            by_alias=True,
+            exclude_unset=True,
+            exclude_none=True,
+            include={"text", "tags", "mime_type"},
+        )
+        for block in blocks
+    ]
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"prompt-{digest}"
+
+
+class PromptFileIndex(LRUCache[str]):
+    """Remembers the ids of content-addressed prompt Files known to exist, so that reuse needs no existence checks.
+
+    Entries are keyed by workspace and File handle, and the most recently used `max_size` entries are kept.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        super().__init__(max_size)
+
+    @staticmethod
+    def key_for(client: Steamship, handle: str) -> Tuple[str, str, str, str]:
+        """Build an index key scoping `handle` to the client's engine, credentials and workspace."""
+        return (*client_scope(client), handle)
+
+
+prompt_file_index = PromptFileIndex()
+
+
+def prompt_file_id(
+    client: Steamship,
+    blocks: List[Block],
+    index: Optional[PromptFileIndex] = None,
+    tags: Optional[List[Tag]] = None,
+) -> str:
+    """Return the id of a File holding `blocks`, uploading it only if no File with the same content exists yet.
+
+    Only use this for Files that are never modified after creation (e.g. generation inputs whose output is not
+    appended to the File), since every call with the same content shares the same File. `tags` are only applied
+    when the File is uploaded; tag it as transient (see `transient_tag`) to have it collected once it is old, after
+    which it is uploaded again on next use.
+    """
+    index = prompt_file_index if index is None else index
+    handle = prompt_file_handle(blocks)
+    key = index.key_for(client, handle)
+    file_id = index.get(key)
+    if file_id is None:
+        try:
+            file_id = File.create(client, blocks=blocks, handle=handle, tags=tags).id
+        except SteamshipError as create_error:
+            # uploaded earlier (by this or another process): handles are unique within a workspace. if no File
+            # holds the handle, creation failed for some other reason, which is the error worth reporting.
+            try:
+                file_id = File.get(client, handle=handle).id
+            except SteamshipError:
+                raise create_error
+        index.put(key, file_id)
+    return file_id
+
+
+def _file_exists(client: Steamship, file_id: str) -> bool:
+    try:
+        File.get(client, _id=file_id)
+        return True
+    except SteamshipError:
+        return False
+
+
+def _forget_prompt_file(client: Steamship, blocks: List[Block], index: PromptFileIndex) -> None:
+    index.invalidate(index.key_for(client, prompt_file_handle(blocks)))
+
+
+def run_with_prompt_file(
+    client: Steamship,
+    blocks: List[Block],
+    run: Callable[[str], Task],
+    index: Optional[PromptFileIndex] = None,
+    tags: Optional[List[Tag]] = None,
+) -> Task:
+    """Run `run` (e.g. a generate call, waited on) on the id of the prompt File holding `blocks` (see `prompt_file_id`).
+
+    An indexed File may since have been deleted (e.g. collected as transient), so if `run` raises a SteamshipError or
+    returns a failed Task and the File no longer exists, it is forgotten, uploaded again and `run` is retried once.
+    """
+    index = prompt_file_index if index is None else index
+    file_id = prompt_file_id(client, blocks, index=index, tags=tags)
+    try:
+        task = run(file_id)
+    except SteamshipError:
+        if _file_exists(client, file_id):
+            raise
+    else:
+        if task.state != TaskState.failed or _file_exists(client, file_id):
+            return task
+    _forget_prompt_file(client, blocks, index)
+    return run(prompt_file_id(client, blocks, index=index, tags=tags))
+
+
+async def arun_with_prompt_file(
+    client: Steamship,
+    blocks: List[Block],
+    run: Callable[[str], Awaitable[Task]],
+    index: Optional[PromptFileIndex] = None,
+    tags: Optional[List[Tag]] = None,
+) -> Task:
+    """Like `run_with_prompt_file`, but awaits `run`, and makes the (blocking) File requests in the default executor."""
+    loop = asyncio.get_running_loop()
+    index = prompt_file_index if index is None else index
+    upload = functools.partial(prompt_file_id, client, blocks, index=index, tags=tags)
+    file_id = await loop.run_in_executor(None, upload)
+    try:
+        task = await run(file_id)
+    except SteamshipError:
+        if await loop.run_in_executor(None, _file_exists, client, file_id):
+            raise
+    else:
+        if task.state != TaskState.failed or await loop.run_in_executor(
+            None, _file_exists, client, file_id
+        ):
+            return task
+    _forget_prompt_file(client, blocks, index)
+    return await run(await loop.run_in_executor(None, upload))
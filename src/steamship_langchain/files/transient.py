@@ -0,0 +1,134 @@
+"""Tagging and garbage collection of the transient Files that LLM calls leave in a workspace."""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from steamship import File, Steamship, Tag
+
+from steamship_langchain.files.prompt_files import PromptFileIndex, prompt_file_index
+
+TRANSIENT_TAG_KIND = "transient"
+
+
+def transient_tag(source: str) -> Tag:
+    """Tag marking a File as transient (safe to delete once it has expired), recording its source and creation time."""
+    return Tag(kind=TRANSIENT_TAG_KIND, name=source, value={"created_at": time.time()})
+
+
+def _created_at(file: File) -> Optional[float]:
+    for tag in file.tags or []:
+        if tag.kind == TRANSIENT_TAG_KIND and tag.value and "created_at" in tag.value:
+            return tag.value["created_at"]
+    return None
+
+
+class CollectionReport:
+    """The outcome of a single collection: which transient Files expired, and which of those were deleted."""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.expired: List[str] = []
+        self.deleted: List[str] = []
+        self.failed: Dict[str, str] = {}
+        self.kept = 0
+        self.elapsed_s = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"CollectionReport(dry_run={self.dry_run}, expired={len(self.expired)}, "
+            f"deleted={len(self.deleted)}, failed={len(self.failed)}, kept={self.kept}, "
+            f"elapsed_s={self.elapsed_s:.2f})"
+        )
+
+
+class TransientFileCollector:
+    """Deletes transient Files (prompt and generation Files left behind by LLM calls) once they are `ttl_s` old.
+
+    Files are found by their transient tag (see `transient_tag`), and at most `max_concurrency` deletions are in-flight
+    at once. A collection can be run on demand with `collect()` (optionally as a `dry_run`, which only reports what
+    would be deleted), or periodically in a background thread with `start()`. Deleted prompt Files are forgotten by
+    `index` (the shared prompt File index by default), so that they are uploaded again on next use.
+
+    Example:
+        .. code-block:: python
+
+            collector = TransientFileCollector(client, ttl_s=24 * 60 * 60)
+            print(collector.collect(dry_run=True))
+            collector.start(interval_s=60 * 60)
+    """
+
+    def __init__(
+        self,
+        client: Steamship,
+        ttl_s: float = 24 * 60 * 60,
+        max_concurrency: int = 4,
+        index: Optional[PromptFileIndex] = None,
+    ):
+        self.client = client
+        self.ttl_s = ttl_s
+        self.max_concurrency = max_concurrency
+        self.index = prompt_file_index if index is None else index
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def collect(self, dry_run: bool = False) -> CollectionReport:
+        """Delete every transient File older than the TTL (or, with `dry_run`, only report them)."""
+        t0 = time.perf_counter()
+        report = CollectionReport(dry_run=dry_run)
+        cutoff = time.time() - self.ttl_s
+
+        expired = []
+        query = f'filetag and kind "{TRANSIENT_TAG_KIND}"'
+        for file in File.query(self.client, tag_filter_query=query).files:
+            created_at = _created_at(file)
+            if created_at is not None and created_at <= cutoff:
+                expired.append(file)
+            else:
+                report.kept += 1
+        report.expired = [file.id for file in expired]
+
+        if not dry_run:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for file, error in zip(expired, executor.map(self._delete, expired)):
+                    if error is None:
+                        report.deleted.append(file.id)
+                        if file.handle:
+                            self.index.invalidate(self.index.key_for(self.client, file.handle))
+                    else:
+                        report.failed[file.id] = error
+
+        report.elapsed_s = time.perf_counter() - t0
+        return report
+
+    def start(self, interval_s: float = 60 * 60) -> None:
+        """Run a collection every `interval_s` seconds in a background (daemon) thread, until `stop()` is called."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval_s,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background collection, waiting for a collection in progress to finish."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval_s: float) -> None:
+        while not self._stopped.is_set():
+            try:
+                logging.info(f"collected transient files: {self.collect()}")
+            except Exception as e:
+                logging.error(f"could not collect transient files: {e}")
+            self._stopped.wait(interval_s)
+
+    @staticmethod
+    def _delete(file: File) -> Optional[str]:
+        try:
+            file.delete()
+            return None
+        except Exception as e:
+            return str(e)
@@ -0,0 +1,9 @@
+"""Provides limits on the rate and concurrency of LLM calls, shareable across model instances."""
+
+from .rate_limiter import RateLimiter, limit, limit_async
+
+__all__ = [
+    "limit",
+    "limit_async",
+    "RateLimiter",
+]
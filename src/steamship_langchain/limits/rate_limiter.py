@@ -0,0 +1,205 @@
+"""Token-bucket rate limiting (requests/sec and tokens/min) plus a concurrency cap, for threads and asyncio alike."""
+import asyncio
+import contextlib
+import threading
+import time
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+
+class RateLimiter:
+    """Governs the LLM calls of any number of model instances that share one upstream quota.
+
+    Two token buckets are maintained: one refilled at `requests_per_second` (holding up to one second's worth of
+    requests), and one refilled at `tokens_per_minute` (holding up to one minute's worth of tokens). Each call
+    reserves one request and its estimated tokens up front, and then sleeps until its reservation is covered, so
+    that callers are admitted in the order in which they arrived. At most `max_concurrency` calls may hold a slot at
+    any one time. Any of the limits may be left unset.
+
+    The limiter is safe to share between threads and between asyncio tasks (on one or more event loops): sync
+    callers use `acquire()`/`release()` (or `limit()`, or `try_acquire()` to skip waiting for a concurrency slot) and
+    async callers `acquire_async()` (or `limit_async()`).
+
+    Example:
+        .. code-block:: python
+
+            limiter = RateLimiter(requests_per_second=5, tokens_per_minute=90_000, max_concurrency=8)
+            llm = OpenAI(client=client, rate_limiter=limiter)
+            chat = ChatOpenAI(client=client, rate_limiter=limiter)
+    """
+
+    # how often async callers re-check for a free concurrency slot.
+    _slot_poll_interval_s = 0.01
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self._request_capacity = max(1.0, requests_per_second or 0.0)
+        self._requests = self._request_capacity
+        self._tokens = tokens_per_minute or 0.0
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._tokens_admitted = 0
+        self._total_wait_s = 0.0
+        self._max_wait_s = 0.0
+        self._lock = threading.Lock()
+        self._slot_released = threading.Condition(self._lock)
+
+    @property
+    def counts_tokens(self) -> bool:
+        """Whether callers need to estimate the tokens of their calls (i.e. whether a tokens/min limit is set)."""
+        return self.tokens_per_minute is not None
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a call of `tokens` estimated tokens may proceed, returning the time spent waiting.
+
+        Every successful `acquire` must be paired with a `release` once the call has completed.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            try:
+                while not self._try_take_slot():
+                    self._slot_released.wait()
+            finally:
+                self._queued -= 1
+            delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return self._admit(tokens, time.perf_counter() - t0)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """Take a concurrency slot only if one is free right away, returning whether the call may proceed.
+
+        Unlike `acquire`, this never waits for another call to release its slot (although it still waits for the
+        request and token rates). Callers that hold slots of their own while dispatching more calls use it, so that
+        they cannot wait on slots that only they would release. A successful `try_acquire` must be paired with a
+        `release`.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            if not self._try_take_slot():
+                return False
+            delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        self._admit(tokens, time.perf_counter() - t0)
+        return True
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Asynchronous counterpart of `acquire`, which waits without blocking the event loop."""
+        t0 = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+        try:
+            while True:
+                with self._lock:
+                    if self._try_take_slot():
+                        delay = self._reserve(tokens)
+                        break
+                await asyncio.sleep(self._slot_poll_interval_s)
+        finally:
+            with self._lock:
+                self._queued -= 1
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # cancelled while waiting: give the slot back, as the caller will not get to release it.
+                self.release()
+                raise
+        return self._admit(tokens, time.perf_counter() - t0)
+
+    def release(self) -> None:
+        """Return the concurrency slot taken by a completed call."""
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_released.notify()
+
+    def stats(self) -> Dict[str, float]:
+        """Summarize admissions: calls and tokens admitted, calls queued and in-flight, and mean/max queueing time."""
+        with self._lock:
+            admitted = self._admitted
+            return {
+                "admitted": admitted,
+                "tokens_admitted": self._tokens_admitted,
+                "queued": self._queued,
+                "in_flight": self._in_flight,
+                "mean_wait_s": self._total_wait_s / admitted if admitted else 0.0,
+                "max_wait_s": self._max_wait_s,
+            }
+
+    def _try_take_slot(self) -> bool:
+        """Take a concurrency slot, if one is free. Must be called with the lock held."""
+        if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+            return False
+        self._in_flight += 1
+        return True
+
+    def _reserve(self, tokens: int) -> float:
+        """Debit one request and `tokens` tokens, returning the delay until the debt is repaid.
+
+        Must be called with the lock held. Buckets may go negative: later callers then wait for the earlier debt too.
+        """
+        now = time.monotonic()
+        elapsed, self._refilled_at = now - self._refilled_at, now
+
+        delay = 0.0
+        if self.requests_per_second:
+            self._requests = min(
+                self._request_capacity, self._requests + elapsed * self.requests_per_second
+            )
+            self._requests -= 1
+            delay = max(delay, -self._requests / self.requests_per_second)
+        if self.tokens_per_minute:
+            tokens_per_second = self.tokens_per_minute / 60
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * tokens_per_second)
+            # a call larger than the whole bucket can never be covered; it waits for a full bucket instead.
+            self._tokens -= min(tokens, self.tokens_per_minute)
+            delay = max(delay, -self._tokens / tokens_per_second)
+        return delay
+
+    def _admit(self, tokens: int, waited_s: float) -> float:
+        with self._lock:
+            self._admitted += 1
+            self._tokens_admitted += tokens
+            self._total_wait_s += waited_s
+            self._max_wait_s = max(self._max_wait_s, waited_s)
+        return waited_s
+
+
+@contextlib.contextmanager
+def limit(limiter: Optional[RateLimiter], estimate_tokens: Callable[[], int]) -> Iterator[None]:
+    """Hold `limiter` (if any) for the duration of a call. Tokens are only estimated if the limiter counts them."""
+    if limiter is None:
+        yield
+        return
+
+    limiter.acquire(estimate_tokens() if limiter.counts_tokens else 0)
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+@contextlib.asynccontextmanager
+async def limit_async(
+    limiter: Optional[RateLimiter], estimate_tokens: Callable[[], int]
+) -> AsyncIterator[None]:
+    """Asynchronous counterpart of `limit`."""
+    if limiter is None:
+        yield
+        return
+
+    await limiter.acquire_async(estimate_tokens() if limiter.counts_tokens else 0)
+    try:
+        yield
+    finally:
+        limiter.release()
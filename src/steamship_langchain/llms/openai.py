@@ -1,11 +1,15 @@
+import asyncio
+import contextlib
+import functools
 import hashlib
 import json
 import logging
 import warnings
-from collections import defaultdict
-from typing import Any, Dict, Generator, List, Mapping, Optional
+from concurrent.futures import FIRST_COMPLETED, Future
+from concurrent.futures import wait as wait_for_futures
+from typing import Any, Dict, Generator, List, Mapping, Optional, Tuple
 
-import tiktoken
+from langchain.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain.llms.base import Generation, LLMResult
 from langchain.llms.openai import BaseOpenAI
 from langchain.llms.openai import OpenAIChat as BaseOpenAIChat
@@ -18,12 +22,38 @@ from steamship import (
     Steamship,
     SteamshipError,
     Tag,
+    Task,
     TaskState,
 )
 from steamship.data import TagKind, TagValueKey
 from steamship.data.tags.tag_constants import RoleTag
 
+from steamship_langchain.files import arun_with_prompt_file, run_with_prompt_file, transient_tag
+from steamship_langchain.limits import RateLimiter, limit, limit_async
+from steamship_langchain.plugins import plugin_instance_registry, use_plugin
+from steamship_langchain.tasks import (
+    Hedger,
+    PollPolicy,
+    TaskMultiplexer,
+    stream_block_text,
+    wait,
+    wait_async,
+)
+from steamship_langchain.tokens import (
+    REPLY_PRIMING_TOKENS,
+    TokenEstimator,
+    combine_token_usage,
+    message_overhead,
+    message_token_cache,
+    reported_token_usage,
+    token_counter,
+    token_counter_for_model,
+    token_usage,
+)
+from steamship_langchain.workspace import get_workspace_handle
+
 PLUGIN_HANDLE: str = "gpt-3"
+CHAT_PLUGIN_HANDLE: str = "gpt-4"
 ARGUMENT_WHITELIST = {
     "client",
     "model_name",
@@ -40,20 +70,45 @@ ARGUMENT_WHITELIST = {
     "request_timeout",
     # "logit_bias",
     "max_retries",
+    "max_concurrent_batches",
+    "batch_token_budget",
+    "deduplicate_prompts",
+    "bisect_failed_batches",
+    "max_bisect_depth",
+    "poll_policy",
+    "rate_limiter",
+    "token_estimator",
     "callback_manager",
     "cache",
     "verbose",
 }
 
 
+class GenerationBatchError(SteamshipError):
+    """A generation task failed, or returned the wrong number of generations, for a batch of prompts.
+
+    Unlike other errors (timeouts, authentication or quota failures), these may be caused by individual prompts of
+    the batch, so the batch is worth splitting and retrying.
+    """
+
+
 class OpenAI(BaseOpenAI):
     """Implements LangChain LLM interface in a Steamship-compatible fashion, allowing use in chains/agents as required.
 
-    NOTE: This provides a **synchronous** interaction with the LLM backend.
+    NOTE: Both synchronous (`generate`) and asynchronous (`agenerate`) interaction with the LLM backend are
+    supported.
     """
 
     client: Steamship  # We can use validate_environment to add the client here
     batch_task_timeout_seconds: int = 10 * 60  # 10 minute limit on generation tasks
+    max_concurrent_batches: int = 1  # number of sub-batches that may be in-flight at once
+    batch_token_budget: Optional[int] = None  # if set, also pack sub-batches by prompt tokens
+    deduplicate_prompts: bool = True  # generate once per unique prompt, then fan results back out
+    bisect_failed_batches: bool = True  # split and retry failed sub-batches to isolate bad prompts
+    max_bisect_depth: int = 5  # how many times a failed sub-batch may be split
+    poll_policy: Optional[PollPolicy] = None  # how to poll tasks (default: shared backoff)
+    rate_limiter: Optional[RateLimiter] = None  # limits shared with other LLMs on the same quota
+    token_estimator: Optional[TokenEstimator] = None  # if set, approximate (or hybrid) token counts
 
     def __new__(cls, **data: Any):
         """Initialize the OpenAI object."""
@@ -71,7 +126,7 @@ class OpenAI(BaseOpenAI):
     def _identifying_params(self) -> Mapping[str, Any]:
         return {
             "plugin_handle": PLUGIN_HANDLE,
-            "workspace_handle": self.client.get_workspace().handle,
+            "workspace_handle": get_workspace_handle(self.client),
             **super()._identifying_params,
         }
 
@@ -131,93 +186,395 @@ class OpenAI(BaseOpenAI):
 
     def _generate(self, prompts: List[str], stop: Optional[List[str]] = None) -> LLMResult:
         # TODO(douglas-reid): add validation + stop param checking, etc.
+        unique_prompts = self._unique_prompts(prompts)
+        result = self._create_llm_result(
+            self._run_batches(self._sub_prompts(unique_prompts), stop=stop)
+        )
+        return self._fan_out(result, prompts, unique_prompts)
 
-        sub_prompts = [
-            prompts[i : i + self.batch_size] for i in range(0, len(prompts), self.batch_size)
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None) -> LLMResult:
+        unique_prompts = self._unique_prompts(prompts)
+        result = self._create_llm_result(
+            await self._arun_batches(self._sub_prompts(unique_prompts), stop=stop)
+        )
+        return self._fan_out(result, prompts, unique_prompts)
+
+    def _unique_prompts(self, prompts: List[str]) -> List[str]:
+        if not self.deduplicate_prompts:
+            return prompts
+        return list(dict.fromkeys(prompts))
+
+    def _fan_out(
+        self, result: LLMResult, prompts: List[str], unique_prompts: List[str]
+    ) -> LLMResult:
+        """Map generations for the unique prompts back onto every position of the original prompts."""
+        if not self.deduplicate_prompts:
+            return result
+
+        result.llm_output["deduplicated_prompts"] = len(prompts) - len(unique_prompts)
+        if len(unique_prompts) == len(prompts) or len(result.generations) != len(unique_prompts):
+            # nothing to fan out (or there were no prompts, in which case there is nothing to map).
+            return result
+
+        position = {prompt: i for i, prompt in enumerate(unique_prompts)}
+        result.generations = [result.generations[position[prompt]] for prompt in prompts]
+        return result
+
+    def _sub_prompts(self, prompts: List[str]) -> List[List[str]]:
+        if self.batch_token_budget is None:
+            return [
+                prompts[i : i + self.batch_size] for i in range(0, len(prompts), self.batch_size)
+            ]
+
+        # pack consecutive prompts into sub-batches until either the token budget or the batch size is reached.
+        # a prompt that exceeds the budget on its own is sent as a sub-batch of one.
+        sub_prompts = []
+        current, current_tokens = [], 0
+        for prompt, num_tokens in zip(prompts, self.get_num_tokens_batch(prompts)):
+            if current and (
+                current_tokens + num_tokens > self.batch_token_budget
+                or len(current) >= self.batch_size
+            ):
+                sub_prompts.append(current)
+                current, current_tokens = [], 0
+            current.append(prompt)
+            current_tokens += num_tokens
+        if current:
+            sub_prompts.append(current)
+        return sub_prompts
+
+    def _create_llm_result(
+        self, batch_results: List[Tuple[List[Generation], Dict[str, int]]]
+    ) -> LLMResult:
+        all_generations, token_usage = self._merge_batches(batch_results)
+        generations = [
+            all_generations[i : i + self.n] for i in range(0, len(all_generations), self.n)
         ]
-        generations = []
-        total_token_usage = defaultdict(int)
-        for _prompts in sub_prompts:
-            sub_generations, token_usage = self._batch(prompts=_prompts, stop=stop)
-            for i in range(0, len(sub_generations), self.n):
-                generations.append(sub_generations[i : i + self.n])
-            for key, usage in token_usage.items():
-                total_token_usage[key] += usage
 
         if len(generations) == 0:
             generations = [[Generation(text="Generation failed.")]]
 
-        return LLMResult(
-            generations=generations, llm_output={"token_usage": dict(total_token_usage)}
-        )
+        return LLMResult(generations=generations, llm_output={"token_usage": token_usage})
+
+    def _run_batches(
+        self, sub_prompts: List[List[str]], stop: Optional[List[str]] = None
+    ) -> List[Tuple[List[Generation], Dict[str, int]]]:
+        """Run each set of sub-prompts as a generation batch, returning the results in sub-prompt order.
+
+        When `max_concurrent_batches` is greater than one, up to that many generation tasks are in-flight in
+        Steamship at the same time. They are all waited on from a single polling loop (see `TaskMultiplexer`).
+        """
+        max_in_flight = min(self.max_concurrent_batches, len(sub_prompts))
+        if max_in_flight <= 1:
+            return [self._batch(prompts=_prompts, stop=stop) for _prompts in sub_prompts]
+
+        results = [None] * len(sub_prompts)
+        in_flight: Dict[Future, Tuple[int, contextlib.ExitStack]] = {}
+        try:
+            with TaskMultiplexer(
+                policy=self.poll_policy, max_timeout_s=self.batch_task_timeout_seconds
+            ) as multiplexer:
+                next_index = 0
+                while next_index < len(sub_prompts) or in_flight:
+                    while next_index < len(sub_prompts) and len(in_flight) < max_in_flight:
+                        _prompts = sub_prompts[next_index]
+                        # the rate limiter (if any) is held from the start of a batch until its task has finished.
+                        # while batches are in-flight, only dispatch another once a slot is free: the slots this
+                        # loop holds are only released by this loop.
+                        limiter_slot = self._batch_slot(_prompts, wait=not in_flight)
+                        if limiter_slot is None:
+                            break
+                        future = self._submit_batch(multiplexer, _prompts, stop, limiter_slot)
+                        in_flight[future] = (next_index, limiter_slot)
+                        next_index += 1
+                    if not in_flight:
+                        continue
+
+                    done, _ = wait_for_futures(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, limiter_slot = in_flight.pop(future)
+                        limiter_slot.close()
+                        results[index] = self._finished_batch(future, sub_prompts[index], stop)
+        finally:
+            for _, limiter_slot in in_flight.values():
+                limiter_slot.close()
+        return results
+
+    def _submit_batch(
+        self,
+        multiplexer: TaskMultiplexer,
+        prompts: List[str],
+        stop: Optional[List[str]],
+        limiter_slot: contextlib.ExitStack,
+    ) -> Future:
+        """Start a batch, and submit its task to `multiplexer`. If it cannot be started, its future holds the error.
+
+        Any other exception releases the batch's rate limiter slot before it is raised.
+        """
+        try:
+            return multiplexer.submit(self._start_batch(prompts, stop))
+        except SteamshipError as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        except BaseException:
+            limiter_slot.close()
+            raise
+
+    def _finished_batch(
+        self, future: Future, prompts: List[str], stop: Optional[List[str]]
+    ) -> Tuple[List[Generation], Dict[str, int]]:
+        """Parse the generations of a multiplexed batch, recovering the batch if it failed."""
+        try:
+            return self._parse_generation_task(future.result(), expected=len(prompts) * self.n)
+        except SteamshipError as e:
+            return self._recover_batch(prompts, stop, e)
+
+    async def _arun_batches(
+        self, sub_prompts: List[List[str]], stop: Optional[List[str]] = None
+    ) -> List[Tuple[List[Generation], Dict[str, int]]]:
+        """Run `_abatch` over each set of sub-prompts, returning the results in sub-prompt order.
+
+        At most `max_concurrent_batches` sub-batches are in-flight at once for a single call.
+        """
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_batches))
+
+        async def _bounded_batch(_prompts: List[str]) -> Tuple[List[Generation], Dict[str, int]]:
+            async with semaphore:
+                return await self._abatch(prompts=_prompts, stop=stop)
+
+        return list(await asyncio.gather(*[_bounded_batch(_prompts) for _prompts in sub_prompts]))
 
     def get_num_tokens(self, text: str) -> int:
-        """Calculate num tokens with tiktoken package."""
-        encoder = "p50k_base"
-        enc = tiktoken.get_encoding(encoder)
-        tokenized_text = enc.encode(text)
-        return len(tokenized_text)
+        """Calculate num tokens with tiktoken package (or estimate them, if a `token_estimator` is set)."""
+        if self.token_estimator:
+            return self.token_estimator.count(token_counter("p50k_base"), text)
+        return token_counter("p50k_base").count(text)
+
+    def get_num_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Calculate num tokens for each of `texts` with tiktoken package, encoding them as a single batch."""
+        if self.token_estimator:
+            return self.token_estimator.count_batch(token_counter("p50k_base"), texts)
+        return token_counter("p50k_base").count_batch(texts)
 
     def stream(self, prompt: str, stop: Optional[List[str]] = None) -> Generator:
-        raise NotImplementedError("Support for streaming is not supported yet.")
+        # the gpt-3 plugin is a tagger, which produces its generations all at once.
+        raise NotImplementedError(
+            "Streaming is not supported for completion models. Please use OpenAIChat or ChatOpenAI instead."
+        )
 
     def completion_with_retry(self, prompt: str, stop: Optional[List[str]] = None) -> Generator:
         raise RuntimeError("completion_with_retry is not supported, please use .generate instead.")
 
-    def _batch(
-        self, prompts: List[str], stop: Optional[List[str]] = None
-    ) -> (List[Generation], Dict[str, int]):
-        # rudimentary batching implementation
-
+    def _get_llm_plugin(self, stop: Optional[List[str]] = None) -> PluginInstance:
         llm_config = self._invocation_params(stop)
         instance_handle = self._instance_handle(stop)
 
         # we create a plugin instance in `_call` because currently `stop` params are passed at configuration-time,
         # not run-time. this will be addressed in planned subsequent versions.
-        llm_plugin = self.client.use_plugin(
-            plugin_handle=PLUGIN_HANDLE,
-            instance_handle=instance_handle,
-            config=llm_config,
-            fetch_if_exists=True,
+        # resolved instances are memoized, so only the first call with a given set of params pays for resolution.
+        return plugin_instance_registry.get_or_create(
+            key=plugin_instance_registry.key_for(self.client, instance_handle),
+            factory=lambda: self.client.use_plugin(
+                plugin_handle=PLUGIN_HANDLE,
+                instance_handle=instance_handle,
+                config=llm_config,
+                fetch_if_exists=True,
+            ),
         )
 
-        blocks = [Block(text=prompt) for prompt in prompts]
+    def _batch(
+        self, prompts: List[str], stop: Optional[List[str]] = None, depth: int = 0
+    ) -> (List[Generation], Dict[str, int]):
+        # rudimentary batching implementation
+        try:
+            return self._tag_batch(prompts=prompts, stop=stop)
+        except SteamshipError as e:
+            return self._recover_batch(prompts=prompts, stop=stop, error=e, depth=depth)
+
+    def _recover_batch(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]],
+        error: SteamshipError,
+        depth: int = 0,
+    ) -> (List[Generation], Dict[str, int]):
+        """Handle a failed batch, by isolating the failing prompt(s) and marking their generations as failed."""
+        logging.error(f"could not generate from OpenAI LLM: {error}")
+        if not self._should_bisect(prompts, error, depth):
+            return self._failed_generations(prompts, error), {}
+
+        # isolate the failing prompt(s) by splitting the batch in half and retrying each half.
+        mid = len(prompts) // 2
+        return self._merge_batches(
+            [
+                self._batch(prompts=prompts[:mid], stop=stop, depth=depth + 1),
+                self._batch(prompts=prompts[mid:], stop=stop, depth=depth + 1),
+            ]
+        )
 
-        generations = []
-        token_usage = {}
+    async def _abatch(
+        self, prompts: List[str], stop: Optional[List[str]] = None, depth: int = 0
+    ) -> (List[Generation], Dict[str, int]):
+        """Asynchronous counterpart of `_batch`."""
         try:
-            prompt_file = File.create(client=self.client, blocks=blocks)
-            task = llm_plugin.tag(doc=prompt_file)
+            return await self._atag_batch(prompts=prompts, stop=stop)
+        except SteamshipError as e:
+            logging.error(f"could not generate from OpenAI LLM: {e}")
+            if not self._should_bisect(prompts, e, depth):
+                return self._failed_generations(prompts, e), {}
+
+        mid = len(prompts) // 2
+        return self._merge_batches(
+            await asyncio.gather(
+                self._abatch(prompts=prompts[:mid], stop=stop, depth=depth + 1),
+                self._abatch(prompts=prompts[mid:], stop=stop, depth=depth + 1),
+            )
+        )
+
+    def _should_bisect(self, prompts: List[str], error: SteamshipError, depth: int) -> bool:
+        """Whether a failed batch should be split and retried, to isolate the prompt(s) that caused the failure.
+
+        Only failures that individual prompts can cause are bisected: retrying after a timeout, or an authentication
+        or quota failure, would only multiply the number of failing requests.
+        """
+        return (
+            self.bisect_failed_batches
+            and isinstance(error, GenerationBatchError)
+            and len(prompts) > 1
+            and depth < self.max_bisect_depth
+        )
+
+    def _start_batch(self, prompts: List[str], stop: Optional[List[str]] = None) -> Task:
+        llm_plugin = self._get_llm_plugin(stop)
+        blocks = [Block(text=prompt) for prompt in prompts]
+
+        prompt_file = File.create(
+            client=self.client, blocks=blocks, tags=[transient_tag(self._llm_type)]
+        )
+        return llm_plugin.tag(doc=prompt_file)
+
+    def _tag_batch(
+        self, prompts: List[str], stop: Optional[List[str]] = None
+    ) -> (List[Generation], Dict[str, int]):
+        with self._limit_batch(prompts):
+            task = self._start_batch(prompts=prompts, stop=stop)
             # the llm_plugin handles retries and backoff. this wait()
             # will allow for that to happen.
-            task.wait(max_timeout_s=self.batch_task_timeout_seconds)
+            wait(task, max_timeout_s=self.batch_task_timeout_seconds, policy=self.poll_policy)
+        return self._parse_generation_task(task, expected=len(prompts) * self.n)
+
+    async def _atag_batch(
+        self, prompts: List[str], stop: Optional[List[str]] = None
+    ) -> (List[Generation], Dict[str, int]):
+        """Asynchronous counterpart of `_tag_batch`.
+
+        The Steamship client is synchronous, so each individual request is run in the event loop's default
+        executor. Waiting on the generation task happens on the event loop itself.
+        """
+        loop = asyncio.get_running_loop()
+        llm_plugin = await loop.run_in_executor(None, self._get_llm_plugin, stop)
+        blocks = [Block(text=prompt) for prompt in prompts]
 
-            if not task.state == TaskState.succeeded:
-                raise SteamshipError(f"generation task failed: {task.status_message}")
+        async with limit_async(self.rate_limiter, lambda: self._estimate_batch_tokens(prompts)):
+            prompt_file = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    File.create,
+                    client=self.client,
+                    blocks=blocks,
+                    tags=[transient_tag(self._llm_type)],
+                ),
+            )
+            task = await loop.run_in_executor(None, llm_plugin.tag, prompt_file)
+            await wait_async(
+                task, max_timeout_s=self.batch_task_timeout_seconds, policy=self.poll_policy
+            )
+        return self._parse_generation_task(task, expected=len(prompts) * self.n)
 
-            generation_file = task.output.file
+    def _estimate_batch_tokens(self, prompts: List[str]) -> int:
+        """Estimate the tokens a batch counts against the upstream quota: its prompts plus the requested completions."""
+        prompt_tokens = sum(self.get_num_tokens_batch(prompts))
+        return prompt_tokens + len(prompts) * self.n * max(self.max_tokens, 0)
 
-            for text_block in generation_file.blocks:
-                for block_tag in text_block.tags:
-                    if block_tag.kind == TagKind.GENERATION:
-                        generations.append(
-                            Generation(text=block_tag.value[TagValueKey.STRING_VALUE])
-                        )
+    def _batch_slot(self, prompts: List[str], wait: bool) -> Optional[contextlib.ExitStack]:
+        """Take a rate limiter slot for a batch, returning a stack that releases it, or None if no slot is free.
 
-            for file_tag in generation_file.tags:
-                if file_tag.kind == "token_usage":
-                    token_usage = file_tag.value
+        Unless `wait` is set, no slot is waited for.
+        """
+        slot = contextlib.ExitStack()
+        if self.rate_limiter is None:
+            return slot
+        tokens = self._estimate_batch_tokens(prompts) if self.rate_limiter.counts_tokens else 0
+        if wait:
+            self.rate_limiter.acquire(tokens)
+        elif not self.rate_limiter.try_acquire(tokens):
+            return None
+        slot.callback(self.rate_limiter.release)
+        return slot
+
+    def _limit_batch(self, prompts: List[str]):
+        return limit(self.rate_limiter, lambda: self._estimate_batch_tokens(prompts))
+
+    def _failed_generations(self, prompts: List[str], error: SteamshipError) -> List[Generation]:
+        """Mark every completion of each prompt as failed, so that positional mapping to prompts is preserved."""
+        return [
+            Generation(text="", generation_info={"error": str(error)})
+            for _ in range(len(prompts) * self.n)
+        ]
 
-        except SteamshipError as e:
-            logging.error(f"could not generate from OpenAI LLM: {e}")
-            # TODO(douglas-reid): determine appropriate action here.
-            # for now, if an error is encountered, just swallow.
+    @staticmethod
+    def _merge_batches(
+        batch_results: List[Tuple[List[Generation], Dict[str, int]]]
+    ) -> (List[Generation], Dict[str, int]):
+        generations = [
+            generation for sub_generations, _ in batch_results for generation in sub_generations
+        ]
+        return generations, combine_token_usage(usage for _, usage in batch_results)
+
+    @staticmethod
+    def _parse_generation_task(task: Task, expected: int) -> (List[Generation], Dict[str, int]):
+        if not task.state == TaskState.succeeded:
+            raise GenerationBatchError(f"generation task failed: {task.status_message}")
+
+        generation_file = task.output.file
+
+        generations = []
+        for text_block in generation_file.blocks:
+            for block_tag in text_block.tags:
+                if block_tag.kind == TagKind.GENERATION:
+                    generations.append(Generation(text=block_tag.value[TagValueKey.STRING_VALUE]))
+
+        if len(generations) != expected:
+            raise GenerationBatchError(
+                f"generation task returned {len(generations)} generations, expected {expected}"
+            )
+
+        token_usage = {}
+        for file_tag in generation_file.tags:
+            if file_tag.kind == "token_usage":
+                token_usage = file_tag.value
 
         return generations, token_usage
 
 
 class OpenAIChat(BaseOpenAIChat):
-    _llm_plugin: PluginInstance
+    poll_policy: Optional[PollPolicy] = None
+    """How to poll generation tasks for completion. Defaults to the shared backoff policy."""
+    rate_limiter: Optional[RateLimiter] = None
+    """Limits on requests/sec, tokens/min and concurrency, shared with other LLMs drawing on the same quota."""
+    hedger: Optional[Hedger] = None
+    """If set, slow (non-streaming) completions are hedged with a duplicate generate task."""
+    reuse_prompt_files: bool = False
+    """If set, (non-streaming) prompts are uploaded once, as content-addressed Files, and reused on repeat calls.
+
+    Reused Files are tagged as transient like any other prompt File, and each distinct prompt keeps its File until a
+    `TransientFileCollector` deletes it (after which it is uploaded again on next use), so run one when enabling this.
+    """
+    token_estimator: Optional[TokenEstimator] = None
+    """If set, token counts are approximated (or, in hybrid mode, only counted exactly near a limit)."""
+    moderate_output: bool = True
+    """Whether the plugin should moderate generated output."""
 
     class Config:
         """Configuration for this pydantic object."""
@@ -227,8 +584,12 @@ class OpenAIChat(BaseOpenAIChat):
     def __init__(
         self, client: Steamship, model_name: str = "gpt-4", moderate_output: bool = True, **kwargs
     ):
-        super().__init__(client=client, model_name=model_name, **kwargs)
-        plugin_config = {"model": model_name, "moderate_output": moderate_output}
+        super().__init__(
+            client=client, model_name=model_name, moderate_output=moderate_output, **kwargs
+        )
+
+    def _plugin_config(self) -> Dict[str, Any]:
+        plugin_config = {"model": self.model_name, "moderate_output": self.moderate_output}
         if self.openai_api_key:
             plugin_config["openai_api_key"] = self.openai_api_key
 
@@ -243,18 +604,19 @@ class OpenAIChat(BaseOpenAIChat):
         ]:
             if model_args.get(arg):
                 plugin_config[arg] = model_args[arg]
+        return plugin_config
 
-        self._llm_plugin = self.client.use_plugin(
-            plugin_handle="gpt-4",
-            config=plugin_config,
-            fetch_if_exists=True,
-        )
+    @property
+    def _llm_plugin(self) -> PluginInstance:
+        """The generator plugin instance, resolved on first use and shared by wrappers with the same config."""
+        return use_plugin(self.client, CHAT_PLUGIN_HANDLE, self._plugin_config())
 
     @root_validator()
     def validate_environment(cls, values: Dict) -> Dict:  # noqa: N805
         return values
 
-    def _completion(self, messages: [Dict[str, str]], **params) -> str:
+    @staticmethod
+    def _completion_blocks(messages: [Dict[str, str]]) -> List[Block]:
         blocks = []
 
         for msg in messages:
@@ -275,26 +637,227 @@ class OpenAIChat(BaseOpenAIChat):
                     )
                 )
 
-        file = File.create(self.client, blocks=blocks)
-        generate_task = self._llm_plugin.generate(input_file_id=file.id, options=params)
-        generate_task.wait()
-        return generate_task.output.blocks[0].text
+        return blocks
 
-    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None) -> LLMResult:
+    def _estimate_completion_tokens(self, messages: [Dict[str, str]], **params) -> int:
+        """Estimate the tokens a completion counts against the upstream quota: its messages plus the reply."""
+        prompt_tokens = sum(self.get_num_tokens_batch([msg.get("content", "") for msg in messages]))
+        return prompt_tokens + (params.get("max_tokens") or 0)
+
+    def _run_completion(self, file_id: str, params: Dict[str, Any]) -> Task:
+        generate = functools.partial(
+            self._llm_plugin.generate, input_file_id=file_id, options=params
+        )
+        if self.hedger:
+            return self.hedger.run(generate, policy=self.poll_policy)
+        generate_task = generate()
+        wait(generate_task, policy=self.poll_policy)
+        return generate_task
+
+    async def _arun_completion(self, file_id: str, params: Dict[str, Any]) -> Task:
+        loop = asyncio.get_running_loop()
+        generate = functools.partial(
+            self._llm_plugin.generate, input_file_id=file_id, options=params
+        )
+        if self.hedger:
+            return await loop.run_in_executor(
+                None, functools.partial(self.hedger.run, generate, policy=self.poll_policy)
+            )
+        generate_task = await loop.run_in_executor(None, generate)
+        await wait_async(generate_task, policy=self.poll_policy)
+        return generate_task
+
+    def _completion(
+        self, messages: [Dict[str, str]], **params
+    ) -> Tuple[str, Optional[Dict[str, int]]]:
+        with limit(self.rate_limiter, lambda: self._estimate_completion_tokens(messages, **params)):
+            blocks = self._completion_blocks(messages)
+            tags = [transient_tag(self._llm_type)]
+            if self.reuse_prompt_files:
+                generate_task = run_with_prompt_file(
+                    self.client,
+                    blocks,
+                    functools.partial(self._run_completion, params=params),
+                    tags=tags,
+                )
+            else:
+                file = File.create(self.client, blocks=blocks, tags=tags)
+                generate_task = self._run_completion(file.id, params)
+        output = generate_task.output
+        return output.blocks[0].text, reported_token_usage(output.blocks)
+
+    async def _acompletion(
+        self, messages: [Dict[str, str]], **params
+    ) -> Tuple[str, Optional[Dict[str, int]]]:
+        loop = asyncio.get_running_loop()
+        async with limit_async(
+            self.rate_limiter, lambda: self._estimate_completion_tokens(messages, **params)
+        ):
+            blocks = self._completion_blocks(messages)
+            tags = [transient_tag(self._llm_type)]
+            if self.reuse_prompt_files:
+                generate_task = await arun_with_prompt_file(
+                    self.client,
+                    blocks,
+                    functools.partial(self._arun_completion, params=params),
+                    tags=tags,
+                )
+            else:
+                file = await loop.run_in_executor(
+                    None, functools.partial(File.create, self.client, blocks=blocks, tags=tags)
+                )
+                generate_task = await self._arun_completion(file.id, params)
+        output = generate_task.output
+        return output.blocks[0].text, reported_token_usage(output.blocks)
+
+    def _stream_completion(
+        self,
+        messages: [Dict[str, str]],
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **params,
+    ) -> Generator[str, None, None]:
+        """Generate with streaming, yielding tokens (and reporting them to `run_manager`) as output is written."""
+        with limit(self.rate_limiter, lambda: self._estimate_completion_tokens(messages, **params)):
+            file = File.create(
+                self.client,
+                blocks=self._completion_blocks(messages),
+                tags=[transient_tag(self._llm_type)],
+            )
+            generate_task = self._llm_plugin.generate(
+                input_file_id=file.id,
+                options=params,
+                streaming=True,
+                append_output_to_file=True,
+                output_file_id=file.id,
+            )
+            # with streaming, the task completes once the output block exists; its content is written afterwards.
+            wait(generate_task, policy=self.poll_policy)
+
+            for token in stream_block_text(self.client, generate_task.output.blocks[0].id):
+                if run_manager:
+                    run_manager.on_llm_new_token(token)
+                yield token
+
+    async def _astream_completion(
+        self,
+        messages: [Dict[str, str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **params,
+    ) -> str:
+        """Asynchronous counterpart of `_stream_completion`, returning the generated text once it is done."""
+        loop = asyncio.get_running_loop()
+        async with limit_async(
+            self.rate_limiter, lambda: self._estimate_completion_tokens(messages, **params)
+        ):
+            file = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    File.create,
+                    self.client,
+                    blocks=self._completion_blocks(messages),
+                    tags=[transient_tag(self._llm_type)],
+                ),
+            )
+            generate_task = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    self._llm_plugin.generate,
+                    input_file_id=file.id,
+                    options=params,
+                    streaming=True,
+                    append_output_to_file=True,
+                    output_file_id=file.id,
+                ),
+            )
+            await wait_async(generate_task, policy=self.poll_policy)
+
+            text = ""
+            tokens = stream_block_text(self.client, generate_task.output.blocks[0].id)
+            # each token is polled for in the default executor, so that streaming does not block the loop.
+            while (token := await loop.run_in_executor(None, next, tokens, None)) is not None:
+                if run_manager:
+                    await run_manager.on_llm_new_token(token)
+                text += token
+        return text
+
+    def stream(self, prompt: str, stop: Optional[List[str]] = None) -> Generator[str, None, None]:
+        """Yield generated text incrementally, as it is produced."""
+        messages, params = self._get_chat_params([prompt], stop)
+        yield from self._stream_completion(messages=messages, **params)
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+    ) -> LLMResult:
         messages, params = self._get_chat_params(prompts, stop)
-        generated_text = self._completion(messages=messages, **params)
+        usage = None
+        if self.streaming:
+            generated_text = "".join(
+                self._stream_completion(messages=messages, run_manager=run_manager, **params)
+            )
+        else:
+            generated_text, usage = self._completion(messages=messages, **params)
+        return self._completion_result(messages, generated_text, usage)
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+    ) -> LLMResult:
+        messages, params = self._get_chat_params(prompts, stop)
+        usage = None
+        if self.streaming:
+            generated_text = await self._astream_completion(
+                messages=messages, run_manager=run_manager, **params
+            )
+        else:
+            generated_text, usage = await self._acompletion(messages=messages, **params)
+        return self._completion_result(messages, generated_text, usage)
+
+    def _completion_result(
+        self,
+        messages: [Dict[str, str]],
+        generated_text: str,
+        usage: Optional[Dict[str, int]] = None,
+    ) -> LLMResult:
+        """Build the result of a completion, with the usage reported by the plugin (or, failing that, counted)."""
+        if usage is None:
+            try:
+                usage = self._counted_token_usage(messages, generated_text)
+            except Exception as e:
+                # e.g. the encoding could not be loaded: usage is reported, but never fails a generation.
+                logging.warning(f"could not count token usage: {e}")
+                usage = {}
         return LLMResult(
             generations=[[Generation(text=generated_text)]],
-            # TODO(dougreid): token usage calculations !!!
+            llm_output={"token_usage": usage, "model_name": self.model_name},
         )
 
+    def _counted_token_usage(
+        self, messages: [Dict[str, str]], generated_text: str
+    ) -> Dict[str, int]:
+        """Count usage as the chat model's encoding and format do (see `ChatOpenAI.get_num_tokens_from_messages`)."""
+        counter = token_counter_for_model(self.model_name)
+        try:
+            overhead = message_overhead(self.model_name)
+            prompt_tokens = REPLY_PRIMING_TOKENS + sum(
+                message_token_cache.counts(messages, overhead, counter)
+            )
+        except NotImplementedError:
+            # the chat format of the model is unknown: count the message contents alone.
+            prompt_tokens = sum(counter.count_batch([msg.get("content", "") for msg in messages]))
+        return token_usage(prompt_tokens, counter.count(generated_text))
+
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
         """Get the identifying parameters."""
         return {
             **{
                 "model_name": self.model_name,
-                "workspace_handle": self.client.get_workspace().handle,
+                "workspace_handle": get_workspace_handle(self.client),
                 "plugin_handle": "gpt-4",
             },
             **self._default_params,
@@ -306,11 +869,13 @@ class OpenAIChat(BaseOpenAIChat):
         return "steamship-openai-chat"
 
     def get_num_tokens(self, text: str) -> int:
-        """Calculate num tokens with tiktoken package."""
-        encoder = "p50k_base"
-        enc = tiktoken.get_encoding(encoder)
-        tokenized_text = enc.encode(text)
-        return len(tokenized_text)
-
-    async def agenerate(self, prompts: List[str], stop: Optional[List[str]] = None) -> LLMResult:
-        raise NotImplementedError("Support for async is not provided yet.")
+        """Calculate num tokens with tiktoken package (or estimate them, if a `token_estimator` is set)."""
+        if self.token_estimator:
+            return self.token_estimator.count(token_counter("p50k_base"), text)
+        return token_counter("p50k_base").count(text)
+
+    def get_num_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Calculate num tokens for each of `texts` with tiktoken package, encoding them as a single batch."""
+        if self.token_estimator:
+            return self.token_estimator.count_batch(token_counter("p50k_base"), texts)
+        return token_counter("p50k_base").count_batch(texts)
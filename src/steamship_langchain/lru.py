@@ -0,0 +1,93 @@
+"""Thread-safe, size-bounded LRU map, the base of the package's caches, indexes and registries."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, Iterable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """Keeps the `max_size` most recently used entries, counting lookup hits and misses.
+
+    If `ttl_s` is set, entries expire once they have been stored for that long, and looking one up is a miss. All
+    operations hold a single lock, so that a cache can be shared across threads; compute values for missed keys
+    outside of it (between `get_many` and `put_many`), so that a slow computation does not block other lookups.
+    """
+
+    def __init__(self, max_size: int, ttl_s: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return the value stored under `key`, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, V]:
+        """Look up `keys`, returning the values found by key (missed keys are left out).
+
+        Each lookup of a stored key is a hit, and each distinct missed key is a single miss (it is computed once).
+        """
+        found: Dict[Hashable, V] = {}
+        missed = set()
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    self.hits += 1
+                    continue
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    missed.add(key)
+                else:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+                    self.hits += 1
+            self.misses += len(missed)
+        return found
+
+    def put(self, key: Hashable, value: V) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, values: Dict[Hashable, V]) -> None:
+        """Store `values` by key, evicting the least recently used entries beyond `max_size`."""
+        expires_at = float("inf") if self.ttl_s is None else time.monotonic() + self.ttl_s
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the entry stored under `key`, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def hit_rate(self) -> float:
+        """The fraction of lookups that were answered from the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Drop all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Report the hit/miss counters and the current number of entries."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,15 @@
+"""Provides process-wide memoization of resolved Steamship Plugin Instances."""
+
+from .registry import (
+    DEFAULT_INSTANCE_TTL_S,
+    PluginInstanceRegistry,
+    plugin_instance_registry,
+    use_plugin,
+)
+
+__all__ = [
+    "DEFAULT_INSTANCE_TTL_S",
+    "PluginInstanceRegistry",
+    "plugin_instance_registry",
+    "use_plugin",
+]
@@ -0,0 +1,76 @@
+"""Thread-safe, size-bounded registry of resolved Steamship Plugin Instances."""
+import hashlib
+import json
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from steamship import PluginInstance, Steamship
+
+from steamship_langchain.lru import LRUCache
+from steamship_langchain.workspace import client_scope
+
+
+class PluginInstanceRegistry(LRUCache[PluginInstance]):
+    """Memoizes `PluginInstance` objects so that repeat calls with the same parameters skip instance resolution.
+
+    Resolving an instance via `client.use_plugin(..., fetch_if_exists=True)` costs at least one round trip to the
+    Steamship engine. The registry keeps the most recently used instances (up to `max_size`) keyed by workspace and
+    instance handle, and counts hits and misses so that its effectiveness can be observed in production. If `ttl_s`
+    is set, instances are resolved again once they have been registered for that long, so that a long-lived process
+    eventually picks up instances that were deleted or reconfigured in the workspace.
+    """
+
+    def __init__(self, max_size: int = 128, ttl_s: Optional[float] = None):
+        super().__init__(max_size, ttl_s)
+
+    @staticmethod
+    def key_for(client: Steamship, instance_handle: str) -> Tuple[str, str, str, str]:
+        """Build a registry key scoping `instance_handle` to the client's engine, credentials and workspace."""
+        return (*client_scope(client), instance_handle)
+
+    @classmethod
+    def key_for_config(
+        cls, client: Steamship, plugin_handle: str, config: Dict[str, Any]
+    ) -> Tuple[str, str, str, str]:
+        """Build a registry key for the instance of `plugin_handle` that the engine resolves for `config`."""
+        config_hash = hashlib.sha256(
+            json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return cls.key_for(client, f"{plugin_handle}@{config_hash}")
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], PluginInstance]) -> PluginInstance:
+        """Return the instance registered under `key`, calling `factory` to resolve it on a miss.
+
+        The factory is called outside of the registry lock, so that a slow resolution does not block lookups of
+        other instances. Concurrent misses for the same key may each call the factory; the last one wins.
+        """
+        instance = self.get(key)
+        if instance is None:
+            instance = factory()
+            self.put(key, instance)
+        return instance
+
+
+# instances are re-resolved every 15 minutes, so that deleted or reconfigured instances are eventually noticed.
+DEFAULT_INSTANCE_TTL_S = 15 * 60
+
+plugin_instance_registry = PluginInstanceRegistry(ttl_s=DEFAULT_INSTANCE_TTL_S)
+
+
+def use_plugin(
+    client: Steamship,
+    plugin_handle: str,
+    config: Dict[str, Any],
+    registry: Optional[PluginInstanceRegistry] = None,
+) -> PluginInstance:
+    """Return the instance of `plugin_handle` with `config`, resolving it only if `registry` has not already.
+
+    The instance is keyed by (a hash of) its config, so wrappers constructed with the same settings share a single
+    resolution, while wrappers with different settings (e.g. another model or API key) get their own instance.
+    """
+    registry = plugin_instance_registry if registry is None else registry
+    return registry.get_or_create(
+        key=registry.key_for_config(client, plugin_handle, config),
+        factory=lambda: client.use_plugin(
+            plugin_handle=plugin_handle, config=config, fetch_if_exists=True
+        ),
+    )
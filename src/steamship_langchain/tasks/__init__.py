@@ -0,0 +1,19 @@
+"""Provides helpers for waiting on Steamship Tasks (and streamed Blocks) from synchronous and asynchronous code."""
+
+from .hedging import Hedger
+from .multiplexer import TaskMultiplexer
+from .polling import BackoffPollPolicy, FixedPollPolicy, PollPolicy, default_poll_policy
+from .streaming import stream_block_text
+from .waiting import wait, wait_async
+
+__all__ = [
+    "BackoffPollPolicy",
+    "default_poll_policy",
+    "FixedPollPolicy",
+    "Hedger",
+    "PollPolicy",
+    "stream_block_text",
+    "TaskMultiplexer",
+    "wait",
+    "wait_async",
+]
@@ -0,0 +1,120 @@
+"""Hedge slow Steamship Tasks by starting a duplicate and taking whichever finishes first."""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from steamship import SteamshipError, Task, TaskState
+
+from steamship_langchain.tasks.polling import PollPolicy, default_poll_policy
+
+
+def _is_finished(task: Task) -> bool:
+    return task.state in (TaskState.succeeded, TaskState.failed)
+
+
+class Hedger:
+    """Cuts tail latency by starting a duplicate (hedge) task when the original is slower than usual.
+
+    If the original task has not finished `delay_s` seconds after it was started, the same work is started again and
+    whichever task finishes first (successfully) is used. If `delay_s` is not set, the hedge delay is the `percentile`
+    of the latencies observed so far (hedging starts once `min_samples` calls have been observed), so that only the
+    slowest calls are hedged. The Steamship engine does not support cancelling tasks, so the losing task is ignored.
+
+    Hedges cost extra generations: `stats()` reports how many hedges were fired and how many of those won.
+    """
+
+    def __init__(
+        self,
+        delay_s: Optional[float] = None,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        max_samples: int = 1000,
+    ):
+        self.delay_s = delay_s
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=max_samples)
+        self._calls = 0
+        self._hedges_fired = 0
+        self._hedges_won = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return the delay after which a call is hedged, or None if there are too few observations to tell."""
+        if self.delay_s is not None:
+            return self.delay_s
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(int(self.percentile * len(latencies)), len(latencies) - 1)]
+
+    def run(
+        self,
+        start: Callable[[], Task],
+        max_timeout_s: float = 180,
+        policy: Optional[PollPolicy] = None,
+    ) -> Task:
+        """Start a task with `start`, hedging it if it is slow, and return the first task to succeed.
+
+        If every started task fails, the original (failed) task is returned. A `max_timeout_s` of -1 is equivalent to
+        no timeout.
+        """
+        policy = policy or default_poll_policy
+        hedge_delay = self.hedge_delay()
+        t0 = time.perf_counter()
+        tasks = [start()]
+        polls = 0
+        for delay in policy.delays():
+            winner = self._winner(tasks)
+            if winner is not None:
+                break
+            elapsed = time.perf_counter() - t0
+            if max_timeout_s != -1 and elapsed >= max_timeout_s:
+                raise SteamshipError(
+                    message=f"Task {tasks[0].task_id} did not complete within requested timeout of "
+                    f"{max_timeout_s}s."
+                )
+            if hedge_delay is not None and len(tasks) == 1 and elapsed >= hedge_delay:
+                tasks.append(start())
+                with self._lock:
+                    self._hedges_fired += 1
+                continue
+
+            if hedge_delay is not None and len(tasks) == 1:
+                # wake up in time to fire the hedge.
+                delay = min(delay, max(hedge_delay - elapsed, 0))
+            time.sleep(delay)
+            for task in tasks:
+                if not _is_finished(task):
+                    task.refresh()
+            polls += 1
+
+        latency = time.perf_counter() - t0
+        policy.record(polls, latency)
+        with self._lock:
+            self._calls += 1
+            self._latencies.append(latency)
+            if winner is not tasks[0]:
+                self._hedges_won += 1
+        return winner
+
+    def stats(self) -> Dict[str, float]:
+        """Summarize hedging: calls made, hedges fired and hedges won (those that finished before the original)."""
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "hedges_fired": self._hedges_fired,
+                "hedges_won": self._hedges_won,
+            }
+
+    @staticmethod
+    def _winner(tasks: List[Task]) -> Optional[Task]:
+        """Return the first succeeded task, or the original task once all tasks have failed."""
+        for task in tasks:
+            if task.state == TaskState.succeeded:
+                return task
+        if all(task.state == TaskState.failed for task in tasks):
+            return tasks[0]
+        return None
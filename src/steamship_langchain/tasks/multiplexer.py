@@ -0,0 +1,180 @@
+"""Wait on many in-flight Steamship Tasks from a single polling loop."""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue
+from typing import Any, Dict, Iterator, List, Optional
+
+from steamship import SteamshipError, Task, TaskState
+
+from steamship_langchain.tasks.polling import PollPolicy, default_poll_policy
+
+
+class _Entry:
+    def __init__(self, task: Task):
+        self.task = task
+        self.future: Future = Future()
+        self.started_at = time.perf_counter()
+        self.polls = 0
+
+
+class TaskMultiplexer:
+    """Multiplexes the waiting on many Steamship Tasks (generation, search, import, ...) onto one polling loop.
+
+    Rather than each task being waited on by its own blocking `task.wait()` (and, typically, its own thread), tasks
+    are submitted to the multiplexer, which returns a `Future` per task. A single background loop polls all pending
+    tasks once per round (spacing rounds according to `policy`) and resolves each future with its Task as soon as the
+    task has succeeded or failed. The Steamship engine offers no bulk status endpoint, so the status requests of a
+    round are issued concurrently on a small, shared pool of `refresh_workers` threads.
+
+    Tasks that do not finish within `max_timeout_s` of being submitted have their futures failed with a
+    `SteamshipError`. Finished tasks are exposed in completion order via `as_completed()` and `completion_order`.
+
+    Example:
+        .. code-block:: python
+
+            with TaskMultiplexer() as multiplexer:
+                for task in [index.search(query, k=4) for query in queries]:
+                    multiplexer.submit(task)
+                for task in multiplexer.as_completed():
+                    print(task.output)
+    """
+
+    def __init__(
+        self,
+        policy: Optional[PollPolicy] = None,
+        max_timeout_s: float = 180,
+        refresh_workers: int = 4,
+    ):
+        self.policy = policy or default_poll_policy
+        self.max_timeout_s = max_timeout_s
+        self.completion_order: List[Task] = []
+        self._pending: Dict[int, _Entry] = {}
+        self._completed: "Queue[Optional[Task]]" = Queue()
+        self._submitted = 0
+        self._unresolvable = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers)
+        self._poller = threading.Thread(target=self._poll_loop, daemon=True)
+        self._poller.start()
+
+    def submit(self, task: Task) -> "Future[Task]":
+        """Start waiting on `task`, returning a Future that resolves to the Task once it has succeeded or failed."""
+        if self._closed:
+            raise SteamshipError(message="Cannot submit a task to a closed TaskMultiplexer.")
+        entry = _Entry(task)
+        with self._lock:
+            self._submitted += 1
+            if task.state in (TaskState.succeeded, TaskState.failed):
+                self._resolve(entry)
+            else:
+                self._pending[id(entry)] = entry
+        self._wakeup.set()
+        return entry.future
+
+    def as_completed(self) -> Iterator[Task]:
+        """Yield submitted tasks in the order in which they finish, until all submitted tasks have been yielded.
+
+        Tasks that time out (or whose status cannot be retrieved) are not yielded; their futures hold the error.
+        """
+        yielded = 0
+        while True:
+            with self._lock:
+                if yielded + self._unresolvable >= self._submitted and self._completed.empty():
+                    return
+            task = self._completed.get()
+            if task is None:
+                continue
+            yielded += 1
+            yield task
+
+    def wait_all(self) -> List[Any]:
+        """Block until every pending task has finished, returning the outputs of all completed tasks."""
+        while True:
+            with self._lock:
+                futures = [entry.future for entry in self._pending.values()]
+            if not futures:
+                return [task.output for task in self.completion_order]
+            for future in futures:
+                future.exception()
+
+    def close(self) -> None:
+        """Stop polling. Futures of tasks that are still pending are cancelled."""
+        self._closed = True
+        self._wakeup.set()
+        self._poller.join()
+        self._refresh_pool.shutdown()
+        with self._lock:
+            for entry in self._pending.values():
+                self._unresolvable += 1
+                entry.future.cancel()
+            self._pending.clear()
+        self._completed.put(None)
+
+    def __enter__(self) -> "TaskMultiplexer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _resolve(self, entry: _Entry) -> None:
+        """Resolve the future for a finished task. Must be called with the lock held."""
+        self.completion_order.append(entry.task)
+        self.policy.record(entry.polls, time.perf_counter() - entry.started_at)
+        self._completed.put(entry.task)
+        entry.future.set_result(entry.task)
+
+    def _fail(self, entry: _Entry, error: Exception) -> None:
+        """Fail the future for a task that cannot be waited on further. Must be called with the lock held."""
+        self._unresolvable += 1
+        entry.future.set_exception(error)
+        self._completed.put(None)
+
+    def _refresh(self, entry: _Entry) -> Optional[Exception]:
+        try:
+            entry.task.refresh()
+            entry.polls += 1
+            return None
+        except Exception as e:
+            return e
+
+    def _poll_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # each burst of work (pending tasks) restarts the policy's delays: fast first polls, then backoff.
+            for delay in self.policy.delays():
+                with self._lock:
+                    if self._closed or not self._pending:
+                        break
+                time.sleep(delay)
+
+                with self._lock:
+                    entries = list(self._pending.values())
+                errors = list(self._refresh_pool.map(self._refresh, entries))
+
+                now = time.perf_counter()
+                with self._lock:
+                    for entry, error in zip(entries, errors):
+                        if id(entry) not in self._pending:
+                            continue
+                        if error is not None:
+                            del self._pending[id(entry)]
+                            self._fail(entry, error)
+                        elif entry.task.state in (TaskState.succeeded, TaskState.failed):
+                            del self._pending[id(entry)]
+                            self._resolve(entry)
+                        elif (
+                            self.max_timeout_s != -1
+                            and now - entry.started_at >= self.max_timeout_s
+                        ):
+                            del self._pending[id(entry)]
+                            self._fail(
+                                entry,
+                                SteamshipError(
+                                    message=f"Task {entry.task.task_id} did not complete within requested "
+                                    f"timeout of {self.max_timeout_s}s."
+                                ),
+                            )
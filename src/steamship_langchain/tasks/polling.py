@@ -0,0 +1,91 @@
+"""Pluggable policies for polling the state of Steamship Tasks."""
+import random
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterator, Tuple
+
+
+class PollPolicy:
+    """Determines the delays between status checks while waiting on a Task.
+
+    Policies also record the number of polls and the completion latency of every wait they are used for, so that
+    their parameters can be tuned against observed task durations.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples: Deque[Tuple[int, float]] = deque(maxlen=max_samples)
+        self._calls = 0
+        self._total_polls = 0
+        self._total_latency_s = 0.0
+        self._lock = threading.Lock()
+
+    def delays(self) -> Iterator[float]:
+        """Yield the delay (in seconds) to sleep before each successive status check."""
+        raise NotImplementedError()
+
+    def record(self, polls: int, latency_s: float) -> None:
+        """Record the number of polls made, and the elapsed time, for a single completed wait."""
+        with self._lock:
+            self._samples.append((polls, latency_s))
+            self._calls += 1
+            self._total_polls += polls
+            self._total_latency_s += latency_s
+
+    def stats(self) -> Dict[str, float]:
+        """Summarize the recorded waits: call count, mean polls per call and mean/max completion latency."""
+        with self._lock:
+            calls = self._calls
+            return {
+                "calls": calls,
+                "mean_polls": self._total_polls / calls if calls else 0.0,
+                "mean_latency_s": self._total_latency_s / calls if calls else 0.0,
+                "max_recent_latency_s": max((s[1] for s in self._samples), default=0.0),
+            }
+
+    def samples(self) -> Tuple[Tuple[int, float], ...]:
+        """Return the most recent (polls, latency_s) samples, oldest first."""
+        with self._lock:
+            return tuple(self._samples)
+
+
+class FixedPollPolicy(PollPolicy):
+    """Poll at a fixed interval (the behavior of `Task.wait()`)."""
+
+    def __init__(self, delay_s: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay_s = delay_s
+
+    def delays(self) -> Iterator[float]:
+        while True:
+            yield self.delay_s
+
+
+class BackoffPollPolicy(PollPolicy):
+    """Poll quickly at first, then back off exponentially (with jitter) up to a maximum delay.
+
+    Short tasks are noticed soon after they complete, while long-running tasks are not polled more often than every
+    `max_delay_s` seconds. Jitter spreads out the polls of tasks that were started at the same time.
+    """
+
+    def __init__(
+        self,
+        initial_delay_s: float = 0.1,
+        multiplier: float = 2.0,
+        max_delay_s: float = 5.0,
+        jitter: float = 0.1,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.initial_delay_s = initial_delay_s
+        self.multiplier = multiplier
+        self.max_delay_s = max_delay_s
+        self.jitter = jitter
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial_delay_s
+        while True:
+            yield min(delay * random.uniform(1 - self.jitter, 1 + self.jitter), self.max_delay_s)
+            delay = min(delay * self.multiplier, self.max_delay_s)
+
+
+default_poll_policy = BackoffPollPolicy()
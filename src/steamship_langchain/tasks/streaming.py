@@ -0,0 +1,43 @@
+"""Stream text from Steamship Blocks as it is written by a generation plugin."""
+import codecs
+import time
+from typing import Generator
+
+from steamship import Block, Steamship, SteamshipError
+from steamship.data.block import StreamState
+
+
+def stream_block_text(
+    client: Steamship, block_id: str, max_timeout_s: float = 180, retry_delay_s: float = 0.1
+) -> Generator[str, None, None]:
+    """Yield the text of a streaming Block incrementally, until its producer has finished writing it.
+
+    The Block is polled every `retry_delay_s` seconds. Each poll yields only the text appended since the previous
+    poll. Blocks that were not created for streaming (or that have already finished streaming) are yielded whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    bytes_seen = 0
+    t0 = time.perf_counter()
+    while True:
+        block = Block.get(client, _id=block_id)
+        content = block.raw() or b""
+        if len(content) > bytes_seen:
+            # decode incrementally, so that multibyte characters split across polls are not mangled.
+            text = decoder.decode(content[bytes_seen:])
+            bytes_seen = len(content)
+            if text:
+                yield text
+
+        if block.stream_state == StreamState.ABORTED:
+            raise SteamshipError(message=f"Streaming to block {block_id} was aborted.")
+        if block.stream_state != StreamState.STARTED:
+            break
+        if max_timeout_s != -1 and time.perf_counter() - t0 >= max_timeout_s:
+            raise SteamshipError(
+                message=f"Block {block_id} did not finish streaming within requested timeout of {max_timeout_s}s."
+            )
+        time.sleep(retry_delay_s)
+
+    remainder = decoder.decode(b"", final=True)
+    if remainder:
+        yield remainder
@@ -0,0 +1,67 @@
+"""Wait on Steamship Tasks using a pluggable poll policy, from synchronous code or an asyncio event loop."""
+import asyncio
+import time
+from typing import Any, Optional
+
+from steamship import SteamshipError, Task, TaskState
+
+from steamship_langchain.tasks.polling import PollPolicy, default_poll_policy
+
+
+def _is_finished(task: Task) -> bool:
+    return task.state in (TaskState.succeeded, TaskState.failed)
+
+
+def _timed_out(task: Task, max_timeout_s: float) -> SteamshipError:
+    return SteamshipError(
+        message=f"Task {task.task_id} did not complete within requested timeout of {max_timeout_s}s."
+    )
+
+
+def wait(task: Task, max_timeout_s: float = 180, policy: Optional[PollPolicy] = None) -> Any:
+    """Poll until the task has succeeded or failed (or the timeout is reached), sleeping as directed by `policy`.
+
+    This is a drop-in replacement for `Task.wait()`. A `max_timeout_s` of -1 is equivalent to no timeout.
+    """
+    policy = policy or default_poll_policy
+    t0 = time.perf_counter()
+    polls = 0
+    for delay in policy.delays():
+        elapsed = time.perf_counter() - t0
+        if _is_finished(task) or (max_timeout_s != -1 and elapsed >= max_timeout_s):
+            break
+        time.sleep(delay if max_timeout_s == -1 else min(delay, max_timeout_s - elapsed))
+        task.refresh()
+        polls += 1
+
+    if not _is_finished(task):
+        raise _timed_out(task, max_timeout_s)
+    policy.record(polls, time.perf_counter() - t0)
+    return task.output
+
+
+async def wait_async(
+    task: Task, max_timeout_s: float = 180, policy: Optional[PollPolicy] = None
+) -> Any:
+    """Poll until the task has succeeded or failed (or the timeout is reached), without blocking the event loop.
+
+    This mirrors `wait()`, but sleeps with `asyncio.sleep` between refreshes and runs each (blocking) status
+    request in the loop's default executor. A thread is therefore only held for the duration of a single status
+    request, and many tasks can be awaited concurrently from a single event loop.
+    """
+    policy = policy or default_poll_policy
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    polls = 0
+    for delay in policy.delays():
+        elapsed = time.perf_counter() - t0
+        if _is_finished(task) or (max_timeout_s != -1 and elapsed >= max_timeout_s):
+            break
+        await asyncio.sleep(delay if max_timeout_s == -1 else min(delay, max_timeout_s - elapsed))
+        await loop.run_in_executor(None, task.refresh)
+        polls += 1
+
+    if not _is_finished(task):
+        raise _timed_out(task, max_timeout_s)
+    policy.record(polls, time.perf_counter() - t0)
+    return task.output
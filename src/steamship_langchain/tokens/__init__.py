@@ -0,0 +1,53 @@
+"""Provides shared tiktoken encodings and cached, batched token counting."""
+
+from .counting import (
+    TokenCounter,
+    encoding_for_model,
+    encoding_name_for_model,
+    get_encoding,
+    token_counter,
+    token_counter_for_model,
+)
+from .estimation import DEFAULT_BYTES_PER_TOKEN, TokenEstimator
+from .loading import DEFAULT_ENCODINGS, prewarm_encodings, set_encoding_cache_dir
+from .messages import (
+    MODEL_MESSAGE_OVERHEAD,
+    MODEL_PREFIX_MESSAGE_OVERHEAD,
+    REPLY_PRIMING_TOKENS,
+    MessageOverhead,
+    MessageTokenCache,
+    message_overhead,
+    message_texts_and_overhead,
+    message_token_cache,
+    message_token_counts,
+)
+from .trimming import ContextTrimmer
+from .usage import TOKEN_USAGE_TAG_KIND, combine_token_usage, reported_token_usage, token_usage
+
+__all__ = [
+    "combine_token_usage",
+    "ContextTrimmer",
+    "DEFAULT_BYTES_PER_TOKEN",
+    "DEFAULT_ENCODINGS",
+    "encoding_for_model",
+    "encoding_name_for_model",
+    "get_encoding",
+    "message_overhead",
+    "message_texts_and_overhead",
+    "message_token_cache",
+    "message_token_counts",
+    "MessageTokenCache",
+    "MessageOverhead",
+    "MODEL_MESSAGE_OVERHEAD",
+    "MODEL_PREFIX_MESSAGE_OVERHEAD",
+    "prewarm_encodings",
+    "REPLY_PRIMING_TOKENS",
+    "reported_token_usage",
+    "set_encoding_cache_dir",
+    "token_counter",
+    "token_counter_for_model",
+    "TOKEN_USAGE_TAG_KIND",
+    "token_usage",
+    "TokenCounter",
+    "TokenEstimator",
+]
@@ -0,0 +1,103 @@
+"""Process-wide registry of tiktoken encodings, and token counters that cache and batch their work.
+
+Memory windows and agent prompts re-count the same strings (system prompts, conversation history) over and over.
+Each encoding is therefore loaded once per process, and each counter remembers the counts of recently seen strings
+and encodes the strings it has not seen in a single batch.
+"""
+import hashlib
+import threading
+from typing import Dict, List
+
+import tiktoken
+from tiktoken.model import MODEL_PREFIX_TO_ENCODING, MODEL_TO_ENCODING
+
+from steamship_langchain.lru import LRUCache
+
+_encodings: Dict[str, tiktoken.Encoding] = {}
+_model_encodings: Dict[str, str] = {}
+_counters: Dict[str, "TokenCounter"] = {}
+_lock = threading.Lock()
+
+
+def get_encoding(encoding_name: str) -> tiktoken.Encoding:
+    """Return the named tiktoken encoding, loading it only on first use."""
+    encoding = _encodings.get(encoding_name)
+    if encoding is None:
+        encoding = tiktoken.get_encoding(encoding_name)
+        with _lock:
+            _encodings[encoding_name] = encoding
+    return encoding
+
+
+def encoding_name_for_model(model_name: str) -> str:
+    """Return the name of the encoding used by `model_name`, without loading the encoding."""
+    if model_name in MODEL_TO_ENCODING:
+        return MODEL_TO_ENCODING[model_name]
+    for prefix, encoding_name in MODEL_PREFIX_TO_ENCODING.items():
+        if model_name.startswith(prefix):
+            return encoding_name
+    raise KeyError(f"Could not automatically map {model_name} to a tokeniser.")
+
+
+def encoding_for_model(model_name: str) -> tiktoken.Encoding:
+    """Return the tiktoken encoding used by `model_name`, loading it only on first use.
+
+    Like `tiktoken.encoding_for_model`, this raises a `KeyError` for models that tiktoken does not know about.
+    """
+    encoding_name = _model_encodings.get(model_name)
+    if encoding_name is None:
+        encoding_name = encoding_name_for_model(model_name)
+        with _lock:
+            _model_encodings[model_name] = encoding_name
+    return get_encoding(encoding_name)
+
+
+class TokenCounter(LRUCache[int]):
+    """Counts the tokens of strings under one encoding, caching the counts of the `max_size` most recent strings.
+
+    Strings are encoded as ordinary text: special tokens (e.g. `<|endoftext|>`) are counted as the text they contain,
+    rather than rejected. Counts are keyed by a digest of each string, so the cache does not keep (possibly very
+    long) strings alive, and its memory is bounded by `max_size` alone.
+    """
+
+    def __init__(self, encoding: tiktoken.Encoding, max_size: int = 4096):
+        super().__init__(max_size)
+        self.encoding = encoding
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in `text`."""
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Return the number of tokens in each of `texts`, encoding all uncached strings in a single batch."""
+        keys = [self._key(text) for text in texts]
+        counts = self.get_many(keys)
+        uncached = {key: text for key, text in zip(keys, texts) if key not in counts}
+        if uncached:
+            if len(uncached) == 1:
+                encoded = [self.encoding.encode_ordinary(next(iter(uncached.values())))]
+            else:
+                encoded = self.encoding.encode_ordinary_batch(list(uncached.values()))
+            new_counts = {key: len(tokens) for key, tokens in zip(uncached, encoded)}
+            self.put_many(new_counts)
+            counts.update(new_counts)
+        return [counts[key] for key in keys]
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+
+def token_counter(encoding_name: str) -> TokenCounter:
+    """Return the shared counter for the named encoding."""
+    counter = _counters.get(encoding_name)
+    if counter is None:
+        encoding = get_encoding(encoding_name)
+        with _lock:
+            counter = _counters.setdefault(encoding_name, TokenCounter(encoding))
+    return counter
+
+
+def token_counter_for_model(model_name: str) -> TokenCounter:
+    """Return the shared counter for the encoding used by `model_name` (raising a `KeyError` for unknown models)."""
+    return token_counter(encoding_for_model(model_name).name)
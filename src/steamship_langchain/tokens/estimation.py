@@ -0,0 +1,126 @@
+"""Cheap, approximate token counts, and a hybrid mode that only counts exactly when it matters.
+
+Exact counting encodes every string with tiktoken, which dominates the CPU cost of trimming long histories. An
+approximate count divides a string's UTF-8 length by the average number of bytes per token of its encoding, which is
+orders of magnitude cheaper. A hybrid count uses the approximation unless it is too close to a limit (such as a
+memory's max token limit) to tell which side of the limit the exact count falls on, and only then counts exactly.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from steamship_langchain.tokens.counting import TokenCounter
+
+# average UTF-8 bytes per token on English prose and code. use `calibrate` to fit these to your own workload.
+DEFAULT_BYTES_PER_TOKEN = {"p50k_base": 4.0, "cl100k_base": 4.2}
+MODES = ("exact", "approximate", "hybrid")
+
+
+class TokenEstimator:
+    """Counts tokens exactly, approximately, or (in `hybrid` mode) approximately when far from `limit`.
+
+    `relative_error` bounds the error of approximate counts, relative to the approximation. In hybrid mode, a count
+    whose approximation is within that error of `limit` is counted exactly, so comparisons against the limit are
+    decided as if counting exactly (as long as the bound holds). `calibrate()` fits both the bytes-per-token ratio
+    and the error bound to sample texts.
+
+    Example:
+        .. code-block:: python
+
+            estimator = TokenEstimator(mode="hybrid", limit=2000)
+            chat = ChatOpenAI(client=client, token_estimator=estimator)
+            memory = ConversationTokenBufferMemory(llm=chat, max_token_limit=2000)
+    """
+
+    def __init__(
+        self,
+        mode: str = "approximate",
+        limit: Optional[int] = None,
+        bytes_per_token: Optional[Dict[str, float]] = None,
+        relative_error: float = 0.3,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, not {mode}.")
+        if mode == "hybrid" and limit is None:
+            raise ValueError("A limit is required for hybrid token estimation.")
+        self.mode = mode
+        self.limit = limit
+        self.bytes_per_token = {**DEFAULT_BYTES_PER_TOKEN, **(bytes_per_token or {})}
+        self.relative_error = relative_error
+        self.exact_counts = 0
+        self.approximate_counts = 0
+        self._lock = threading.Lock()
+
+    def approximate(self, encoding_name: str, text: str) -> int:
+        """Approximate the number of tokens in `text`, from its length in bytes."""
+        if not text:
+            return 0
+        ratio = self.bytes_per_token.get(encoding_name, 4.0)
+        return max(1, round(len(text.encode("utf-8")) / ratio))
+
+    def count(self, counter: TokenCounter, text: str) -> int:
+        """Count the tokens in `text` (per the estimator's mode), using `counter` for exact counts."""
+        return self.count_total(counter, [text])
+
+    def count_batch(self, counter: TokenCounter, texts: List[str]) -> List[int]:
+        """Count the tokens in each of `texts`, deciding on exactness for the batch as a whole.
+
+        Callers compare the sum of a batch's counts against a limit (e.g. the messages of a prompt), so in hybrid mode
+        the whole batch is counted exactly when its total is near `limit`, as with `count_total`.
+        """
+        if self.mode != "exact":
+            encoding_name = counter.encoding.name
+            counts = [self.approximate(encoding_name, text) for text in texts]
+            if self.mode == "approximate" or not self._near_limit(sum(counts)):
+                self._record(approximate=len(texts))
+                return counts
+        return self._exact(counter, texts)
+
+    def count_total(self, counter: TokenCounter, texts: List[str], overhead: int = 0) -> int:
+        """Count the total tokens of `texts` plus a fixed `overhead`, deciding on exactness for the total."""
+        if self.mode != "exact":
+            encoding_name = counter.encoding.name
+            total = sum(self.approximate(encoding_name, text) for text in texts) + overhead
+            if self.mode == "approximate" or not self._near_limit(total):
+                self._record(approximate=len(texts))
+                return total
+        return sum(self._exact(counter, texts)) + overhead
+
+    def calibrate(
+        self, counter: TokenCounter, samples: List[str], min_tokens: int = 16
+    ) -> Tuple[float, float]:
+        """Fit the bytes-per-token ratio of `counter`'s encoding, and the relative error bound, to `samples`.
+
+        Samples shorter than `min_tokens` are ignored when fitting the error bound (the relative error of very short
+        strings is large, but so is the slack of any limit they are compared against). Returns the new (ratio, bound).
+        """
+        exact = counter.count_batch(samples)
+        ratio = sum(len(text.encode("utf-8")) for text in samples) / max(1, sum(exact))
+        self.bytes_per_token[counter.encoding.name] = ratio
+        errors = [
+            abs(approximate - count) / approximate
+            for approximate, count in (
+                (self.approximate(counter.encoding.name, text), count)
+                for text, count in zip(samples, exact)
+                if count >= min_tokens
+            )
+        ]
+        self.relative_error = max(errors, default=self.relative_error)
+        return ratio, self.relative_error
+
+    def stats(self) -> Dict[str, int]:
+        """Report the number of strings counted exactly and approximately."""
+        with self._lock:
+            return {"exact": self.exact_counts, "approximate": self.approximate_counts}
+
+    def _near_limit(self, approximate_count: int) -> bool:
+        # the exact count is within `relative_error` of the approximation: if the limit is too, its side is unknown.
+        return abs(approximate_count - self.limit) <= self.relative_error * approximate_count + 1
+
+    def _exact(self, counter: TokenCounter, texts: List[str]) -> List[int]:
+        self._record(exact=len(texts))
+        return counter.count_batch(texts)
+
+    def _record(self, exact: int = 0, approximate: int = 0) -> None:
+        with self._lock:
+            self.exact_counts += exact
+            self.approximate_counts += approximate
@@ -0,0 +1,62 @@
+"""Pre-warm tiktoken encodings at startup, optionally from a local (offline) encoding cache directory.
+
+Loading an encoding makes tiktoken fetch (and then parse) its BPE file, which adds seconds to the first token count
+of a cold process, and fails outright without network access. Packages can instead load the encodings they need up
+front, e.g. in `PackageService.__init__`:
+
+.. code-block:: python
+
+    class MyPackage(PackageService):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            prewarm_encodings(cache_dir=Path(__file__).parent / "tiktoken_cache")
+
+The cache directory uses tiktoken's own cache layout: running `prewarm_encodings(cache_dir=...)` once with network
+access (e.g. at build time) populates it, after which encodings load from it with no network at all.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from steamship import SteamshipError
+
+from steamship_langchain.tokens.counting import encoding_name_for_model, get_encoding
+
+# the encodings used by the wrappers: p50k_base for completion models, cl100k_base for chat models.
+DEFAULT_ENCODINGS = ("p50k_base", "cl100k_base")
+
+
+def set_encoding_cache_dir(cache_dir: Union[str, Path]) -> None:
+    """Make tiktoken read (and write) BPE files from `cache_dir`, rather than its default temporary directory."""
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(cache_dir)
+
+
+def prewarm_encodings(
+    encoding_names: Iterable[str] = DEFAULT_ENCODINGS,
+    model_names: Iterable[str] = (),
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Dict[str, float]:
+    """Load the named encodings (and those used by `model_names`) into the shared registry.
+
+    Returns the time, in seconds, that loading each encoding took (encodings that were already loaded take ~0s).
+    """
+    if cache_dir is not None:
+        set_encoding_cache_dir(cache_dir)
+
+    names = list(dict.fromkeys([*encoding_names, *map(encoding_name_for_model, model_names)]))
+    load_times = {}
+    for name in names:
+        t0 = time.perf_counter()
+        try:
+            get_encoding(name)
+        except Exception as e:
+            raise SteamshipError(
+                message=f"Could not load tiktoken encoding {name} "
+                f"(cache directory: {os.environ.get('TIKTOKEN_CACHE_DIR', 'default')}).",
+                error=e,
+            )
+        load_times[name] = time.perf_counter() - t0
+    logging.info(f"pre-warmed tiktoken encodings: {load_times}")
+    return load_times
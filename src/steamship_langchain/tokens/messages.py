@@ -0,0 +1,146 @@
+"""Per-model token overhead of chat messages, for counting the tokens of a list of messages.
+
+Official documentation: https://github.com/openai/openai-cookbook/blob/
+main/examples/How_to_format_inputs_to_ChatGPT_models.ipynb
+"""
+import functools
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import tiktoken
+
+from steamship_langchain.lru import LRUCache
+from steamship_langchain.tokens.counting import TokenCounter
+
+
+class MessageOverhead(NamedTuple):
+    tokens_per_message: int
+    """Tokens added to every message by the chat format (e.g. `<im_start>{role/name}\\n{content}<im_end>\\n`)."""
+    tokens_per_name: int
+    """Tokens added (or, if negative, removed) when a message has a name."""
+
+
+# every reply is primed with <im_start>assistant
+REPLY_PRIMING_TOKENS = 3
+
+# overheads of specific snapshots, which take precedence over the prefixes below.
+MODEL_MESSAGE_OVERHEAD: Dict[str, MessageOverhead] = {
+    # if there's a name, the role is omitted
+    "gpt-3.5-turbo-0301": MessageOverhead(tokens_per_message=4, tokens_per_name=-1),
+}
+
+# overheads of model families (0613 and later snapshots, and the aliases that track them), by longest prefix.
+MODEL_PREFIX_MESSAGE_OVERHEAD: Dict[str, MessageOverhead] = {
+    "gpt-3.5-turbo": MessageOverhead(tokens_per_message=3, tokens_per_name=1),
+    "gpt-4": MessageOverhead(tokens_per_message=3, tokens_per_name=1),
+}
+
+
+def message_overhead(model_name: str) -> MessageOverhead:
+    """Return the per-message token overhead of `model_name`.
+
+    Raises `NotImplementedError` for models whose chat format is not known.
+    """
+    overhead = MODEL_MESSAGE_OVERHEAD.get(model_name)
+    if overhead is not None:
+        return overhead
+    for prefix in sorted(MODEL_PREFIX_MESSAGE_OVERHEAD, key=len, reverse=True):
+        if model_name.startswith(prefix):
+            return MODEL_PREFIX_MESSAGE_OVERHEAD[prefix]
+    raise NotImplementedError(
+        f"get_num_tokens_from_messages() is not presently implemented "
+        f"for model {model_name}."
+        "See https://github.com/openai/openai-python/blob/main/chatml.md for "
+        "information on how messages are converted to tokens."
+    )
+
+
+def message_texts_and_overhead(
+    message_dicts: List[Dict[str, Any]], overhead: MessageOverhead
+) -> Tuple[List[str], int]:
+    """Flatten message dicts into the strings to encode, and the fixed number of tokens the chat format adds.
+
+    A function call is counted as its name and its (JSON) arguments.
+    """
+    texts = []
+    num_tokens = REPLY_PRIMING_TOKENS
+    for message in message_dicts:
+        num_tokens += overhead.tokens_per_message
+        for key, value in message.items():
+            if key == "function_call":
+                texts.append(value.get("name", ""))
+                arguments = value.get("arguments", "")
+                texts.append(arguments if isinstance(arguments, str) else json.dumps(arguments))
+            else:
+                texts.append(value)
+            if key == "name":
+                num_tokens += overhead.tokens_per_name
+    return texts, num_tokens
+
+
+def message_token_counts(
+    message_dicts: List[Dict[str, Any]],
+    overhead: MessageOverhead,
+    count_batch: Callable[[List[str]], List[int]],
+) -> List[int]:
+    """Count the tokens each message adds to a prompt, counting the texts of all messages with a single `count_batch`.
+
+    A prompt's total is the sum of its messages' counts plus `REPLY_PRIMING_TOKENS`.
+    """
+    texts = []
+    spans = []
+    for message in message_dicts:
+        message_texts, num_tokens = message_texts_and_overhead([message], overhead)
+        spans.append((len(texts), len(message_texts), num_tokens - REPLY_PRIMING_TOKENS))
+        texts.extend(message_texts)
+    counts = count_batch(texts) if texts else []
+    return [fixed + sum(counts[start : start + length]) for start, length, fixed in spans]
+
+
+class MessageTokenCache(LRUCache[int]):
+    """Remembers how many tokens each recently counted message adds to a prompt, keyed by a hash of its content.
+
+    Most messages of a conversation are unchanged from one turn to the next, so re-counting a history (e.g. to
+    check it against a budget) only needs to count the messages added since. Keys are digests of the message
+    (role, name, content and function call), the encoding and the model's message overhead, so memory is bounded
+    by `max_size` regardless of message length. The texts of uncached messages are encoded directly, rather than
+    through the counter, so that they are not cached a second time (by the counter) as well.
+    """
+
+    def __init__(self, max_size: int = 16384):
+        super().__init__(max_size)
+
+    def counts(
+        self, message_dicts: List[Dict[str, Any]], overhead: MessageOverhead, counter: TokenCounter
+    ) -> List[int]:
+        """Return the tokens each message adds to a prompt (see `message_token_counts`), counting only new messages."""
+        keys = [self._key(message, overhead, counter) for message in message_dicts]
+        counts = self.get_many(keys)
+        uncached = {key: msg for key, msg in zip(keys, message_dicts) if key not in counts}
+        if uncached:
+            new_counts = message_token_counts(
+                list(uncached.values()),
+                overhead,
+                functools.partial(_encoded_lengths, counter.encoding),
+            )
+            new_counts = dict(zip(uncached, new_counts))
+            self.put_many(new_counts)
+            counts.update(new_counts)
+        return [counts[key] for key in keys]
+
+    @staticmethod
+    def _key(message: Dict[str, Any], overhead: MessageOverhead, counter: TokenCounter) -> str:
+        content = json.dumps(
+            [counter.encoding.name, overhead, message], sort_keys=True, default=str
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _encoded_lengths(encoding: tiktoken.Encoding, texts: List[str]) -> List[int]:
+    if len(texts) == 1:
+        return [len(encoding.encode_ordinary(texts[0]))]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+message_token_cache = MessageTokenCache()
@@ -0,0 +1,110 @@
+"""Trimming of chat histories to a token budget, before they are uploaded for generation."""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from steamship import SteamshipError
+
+from steamship_langchain.tokens.messages import REPLY_PRIMING_TOKENS
+
+MessageDict = Dict[str, Any]
+
+
+class ContextTrimmer:
+    """Drops (or summarizes) the oldest turns of a chat history, so that its prompt fits within `max_tokens`.
+
+    System messages, and the latest `keep_last` messages, are always kept; a function result is dropped along with
+    the function call it answers. Each message is counted once (and ChatOpenAI caches the counts of messages seen in
+    earlier turns), and dropping keeps a running total, so trimming a history costs time linear in its length rather
+    than re-counting the remaining messages after every drop. A history whose kept messages alone exceed the budget
+    raises a `SteamshipError` before anything is uploaded.
+
+    If `summarize` is set, it is called with the dropped messages, and its result is inserted (as a system message)
+    in their place. `summary_tokens` of the budget are reserved for it; a summary that does not fit is left out.
+
+    Example:
+        .. code-block:: python
+
+            trimmer = ContextTrimmer(max_tokens=4096 - 512)
+            chat = ChatOpenAI(client=client, max_tokens=512, context_trimmer=trimmer)
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        keep_last: int = 1,
+        summarize: Optional[Callable[[List[MessageDict]], str]] = None,
+        summary_tokens: int = 256,
+    ):
+        self.max_tokens = max_tokens
+        self.keep_last = keep_last
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self.trims = 0
+        self.messages_dropped = 0
+        self.tokens_dropped = 0
+        self._lock = threading.Lock()
+
+    def trim(
+        self,
+        message_dicts: List[MessageDict],
+        count_messages: Callable[[List[MessageDict]], List[int]],
+    ) -> List[MessageDict]:
+        """Return `message_dicts`, less the oldest turns that do not fit in the budget.
+
+        `count_messages` returns the number of tokens each of a list of messages adds to a prompt.
+        """
+        counts = count_messages(message_dicts)
+        total = REPLY_PRIMING_TOKENS + sum(counts)
+        if total <= self.max_tokens:
+            return message_dicts
+
+        budget = self.max_tokens - (self.summary_tokens if self.summarize else 0)
+        dropped = []
+        for i in range(max(0, len(message_dicts) - self.keep_last)):
+            role = message_dicts[i].get("role")
+            if role == "system":
+                continue
+            answers_dropped_call = role == "function" and dropped and dropped[-1] == i - 1
+            if total <= budget and not answers_dropped_call:
+                break
+            dropped.append(i)
+            total -= counts[i]
+
+        if total > self.max_tokens:
+            raise SteamshipError(
+                message=f"The {len(message_dicts) - len(dropped)} messages that cannot be trimmed use {total} "
+                f"tokens, more than the budget of {self.max_tokens}."
+            )
+
+        dropped_set = set(dropped)
+        trimmed = [message for i, message in enumerate(message_dicts) if i not in dropped_set]
+        if self.summarize and dropped:
+            summary = {
+                "role": "system",
+                "content": self.summarize([message_dicts[i] for i in dropped]),
+            }
+            summary_count = count_messages([summary])[0]
+            if total + summary_count <= self.max_tokens:
+                # every message before the oldest dropped turn is kept: the summary takes its place.
+                trimmed.insert(dropped[0], summary)
+                total += summary_count
+            else:
+                logging.warning(
+                    f"left out a summary of {summary_count} tokens, which did not fit in the budget."
+                )
+
+        with self._lock:
+            self.trims += 1
+            self.messages_dropped += len(dropped)
+            self.tokens_dropped += sum(counts[i] for i in dropped)
+        return trimmed
+
+    def stats(self) -> Dict[str, int]:
+        """Report the number of histories trimmed, and the messages and tokens dropped from them."""
+        with self._lock:
+            return {
+                "trims": self.trims,
+                "messages_dropped": self.messages_dropped,
+                "tokens_dropped": self.tokens_dropped,
+            }
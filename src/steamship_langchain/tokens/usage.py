@@ -0,0 +1,33 @@
+"""Token usage of generations, as reported by the generator plugin or counted locally, summed across calls."""
+from typing import Any, Dict, Iterable, List, Optional
+
+from steamship import Block
+
+TOKEN_USAGE_TAG_KIND = "token_usage"
+
+
+def reported_token_usage(blocks: List[Block]) -> Optional[Dict[str, int]]:
+    """Return the usage that the plugin reported for a request (in a `token_usage` tag on its output), if any."""
+    for block in blocks:
+        for tag in block.tags or []:
+            if tag.kind == TOKEN_USAGE_TAG_KIND and tag.value:
+                return {key: value for key, value in tag.value.items() if isinstance(value, int)}
+    return None
+
+
+def token_usage(prompt_tokens: int, completion_tokens: int) -> Dict[str, int]:
+    """Build a usage record in the same shape as the OpenAI API's."""
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def combine_token_usage(usages: Iterable[Optional[Dict[str, Any]]]) -> Dict[str, int]:
+    """Sum usage records (e.g. of the message lists of a single `generate` call), skipping missing ones."""
+    total: Dict[str, int] = {}
+    for usage in usages:
+        for key, value in (usage or {}).items():
+            total[key] = total.get(key, 0) + value
+    return total
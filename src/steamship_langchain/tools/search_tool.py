@@ -4,6 +4,8 @@ from steamship import File, Steamship, SteamshipError
 from steamship.data import TagValueKey
 from steamship.utils.kv_store import KeyValueStore
 
+from steamship_langchain.tasks import PollPolicy, wait
+
 
 class SteamshipSERP:
     """Provides a Steamship-compatible Search Tool (with optional caching) for use in LangChain chains and agents."""
@@ -11,12 +13,16 @@ class SteamshipSERP:
     client: Steamship
     cache_store: Optional[KeyValueStore] = None
 
-    def __init__(self, client: Steamship, cache: bool = True):
+    def __init__(
+        self, client: Steamship, cache: bool = True, poll_policy: Optional[PollPolicy] = None
+    ):
         """Initialize the SteamshipSERP tool.
 
         This tool uses the serpapi-wrapper plugin. This will use Google searches to provide answers.
+        `poll_policy` determines how search tasks are polled for completion (default: shared backoff policy).
         """
         self.client = client
+        self.poll_policy = poll_policy
         self.search_tool = self.client.use_plugin("serpapi-wrapper")
         if cache:
             self.cache_store = KeyValueStore(
@@ -32,7 +38,7 @@ class SteamshipSERP:
                     return value.get(TagValueKey.STRING_VALUE, "")
 
             task = self.search_tool.tag(doc=query)
-            task.wait()
+            wait(task, policy=self.poll_policy)
             answer = self._first_tag_value(
                 # TODO: TagKind.SEARCH_RESULT
                 task.output.file,
@@ -9,6 +9,8 @@ from steamship import File, Steamship, SteamshipError, Tag
 from steamship.data import TagKind, TagValueKey
 from steamship.data.plugin.index_plugin_instance import EmbeddingIndexPluginInstance
 
+from steamship_langchain.tasks import PollPolicy, wait
+
 FAMILY_TO_DIMENSIONALITY = {"ada": 1024, "babbage": 2048, "curie": 4096, "davinci": 12288}
 
 MODEL_TO_DIMENSIONALITY = {
@@ -79,10 +81,15 @@ class SteamshipVectorStore(VectorStore):
         client: Steamship,
         embedding: str,
         index_name: str,
+        poll_policy: Optional[PollPolicy] = None,
     ):
-        """Initialize with necessary components."""
+        """Initialize with necessary components.
+
+        `poll_policy` determines how search tasks are polled for completion (default: shared backoff policy).
+        """
 
         self.client = client
+        self.poll_policy = poll_policy
         self.index_name = index_name or uuid.uuid4().hex
 
         self.index: EmbeddingIndexPluginInstance = client.use_plugin(
@@ -155,7 +162,7 @@ class SteamshipVectorStore(VectorStore):
 
     def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
         search_results = self.index.search(query, k=k)
-        search_results.wait()
+        wait(search_results, policy=self.poll_policy)
         return [
             Document(page_content=item.tag.text, metadata=item.tag.value)
             for item in search_results.output.items
@@ -163,7 +170,7 @@ class SteamshipVectorStore(VectorStore):
 
     def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
         search_results = self.index.search(query, k=k)
-        search_results.wait()
+        wait(search_results, policy=self.poll_policy)
         docs = []
         for item in search_results.output.items:
             doc = Document(page_content=item.tag.text, metadata=item.tag.value)
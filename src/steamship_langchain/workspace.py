@@ -0,0 +1,40 @@
+"""Cache the identity of the workspace a Steamship client is anchored to.
+
+LangChain reads `_identifying_params` on every LLM call (to build the `llm_string` used for caching and callbacks).
+Resolving the workspace handle via `client.get_workspace()` costs a round trip to the Steamship engine, so the
+handle is resolved once per client configuration and kept in memory until explicitly invalidated.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from steamship import Steamship
+
+_workspace_handles: Dict[Tuple[str, str, str], str] = {}
+_lock = threading.Lock()
+
+
+def client_scope(client: Steamship) -> Tuple[str, str, str]:
+    """Identify the engine, credentials and workspace a client is anchored to, for scoping cached state."""
+    config = client.config
+    return config.api_base, config.api_key, config.workspace_id or config.workspace_handle
+
+
+def get_workspace_handle(client: Steamship) -> str:
+    """Return the handle of the workspace `client` is anchored to, resolving it only on first use."""
+    key = client_scope(client)
+    with _lock:
+        handle = _workspace_handles.get(key)
+    if handle is None:
+        handle = client.get_workspace().handle
+        with _lock:
+            _workspace_handles[key] = handle
+    return handle
+
+
+def invalidate_workspace_handle(client: Optional[Steamship] = None) -> None:
+    """Forget the cached workspace handle for `client` (or for all clients, if no client is provided)."""
+    with _lock:
+        if client is None:
+            _workspace_handles.clear()
+        else:
+            _workspace_handles.pop(client_scope(client), None)
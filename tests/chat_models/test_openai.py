@@ -1,6 +1,12 @@
 """Test ChatOpenAI wrapper."""
 
+import asyncio
+import sys
+import threading
+from typing import Any, List
+
 import pytest
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.schema import (
     BaseMessage,
     ChatGeneration,
@@ -10,8 +16,12 @@ from langchain.schema import (
     SystemMessage,
 )
 from steamship import Steamship
+from utils.fake_client import FakeSteamship
 
+import steamship_langchain.chat_models.openai as chat_openai_module
 from steamship_langchain.chat_models.openai import ChatOpenAI
+from steamship_langchain.files import ConversationFile
+from steamship_langchain.limits import RateLimiter
 
 
 @pytest.mark.usefixtures("client")
@@ -82,3 +92,197 @@ def test_chat_openai_streaming_llm_output_contains_model_name(client: Steamship)
     llm_result = chat.generate([[message]])
     assert llm_result.llm_output is not None
     assert llm_result.llm_output["model_name"] == chat.model_name
+
+
+class TokenCollector(BaseCallbackHandler):
+    """Collects the tokens reported via on_llm_new_token."""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.append(token)
+
+
+def test_chat_openai_streaming_with_fake_plugin() -> None:
+    """Test that streamed tokens are reported to callbacks and assembled into the final message."""
+    client = FakeSteamship(completion="Hello there, human!", chunk_size=5)
+    collector = TokenCollector()
+    chat = ChatOpenAI(client=client, streaming=True, callbacks=[collector])
+
+    response = chat([HumanMessage(content="Hello")])
+    assert response.content == "Hello there, human!"
+    assert collector.tokens == ["Hello", " ther", "e, hu", "man!"]
+    assert client.plugin.generate_calls[0]["streaming"] is True
+
+
+def test_chat_openai_stream_generator_with_fake_plugin() -> None:
+    """Test streaming partial output as a generator."""
+    client = FakeSteamship(completion="Hello there, human!", chunk_size=5)
+    chat = ChatOpenAI(client=client)
+
+    tokens = list(chat.stream([HumanMessage(content="Hello")]))
+    assert tokens == ["Hello", " ther", "e, hu", "man!"]
+
+
+def test_chat_openai_shares_rate_limiter_with_fake_plugin() -> None:
+    """Test that completions from several threads are admitted through a shared rate limiter."""
+    client = FakeSteamship(completion="Hello there, human!", chunk_size=5)
+    limiter = RateLimiter(max_concurrency=1)
+    chats = [ChatOpenAI(client=client, streaming=True, rate_limiter=limiter) for _ in range(2)]
+
+    responses = []
+    threads = [
+        threading.Thread(target=lambda c=chat: responses.append(c([HumanMessage(content="Hi")])))
+        for chat in chats * 2
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.content for response in responses] == ["Hello there, human!"] * 4
+    assert limiter.stats()["admitted"] == 4
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_chat_openai_reuses_prompt_files() -> None:
+    """Test that prompts are uploaded once, and uploaded again if their File has been deleted since."""
+    client = FakeSteamship(completion="Hello there, human!")
+    chat = ChatOpenAI(client=client, reuse_prompt_files=True)
+
+    assert chat([HumanMessage(content="Hello")]).content == "Hello there, human!"
+    assert chat([HumanMessage(content="Hello")]).content == "Hello there, human!"
+    assert len(client.files) == 1
+    client.files.clear()
+
+    llm_result = asyncio.run(chat.agenerate([[HumanMessage(content="Hello")]]))
+    assert llm_result.generations[0][0].text == "Hello there, human!"
+    assert chat([HumanMessage(content="Hello")]).content == "Hello there, human!"
+    assert len(client.files) == 1
+    assert len(client.plugin.generate_calls) == 5
+
+
+def test_chat_openai_resolves_plugin_on_first_use() -> None:
+    """Test that construction does no I/O, and that the plugin instance is resolved once, when first needed."""
+    openai_module = sys.modules.get("openai")
+    client = FakeSteamship(completion="Hello there, human!")
+    chat = ChatOpenAI(client=client, model_name="gpt-4", max_tokens=10)
+
+    assert client.use_plugin_calls == []
+    assert sys.modules.get("openai") is openai_module
+
+    assert chat([HumanMessage(content="Hello")]).content == "Hello there, human!"
+    assert chat([HumanMessage(content="Hello again")]).content == "Hello there, human!"
+    assert len(client.use_plugin_calls) == 1
+
+    # wrappers with the same config share the resolved instance; other configs get their own.
+    ChatOpenAI(client=client, model_name="gpt-4")([HumanMessage(content="Hi")])
+    assert len(client.use_plugin_calls) == 1
+    ChatOpenAI(client=client, model_name="gpt-3.5-turbo")([HumanMessage(content="Hi")])
+    assert len(client.use_plugin_calls) == 2
+    assert client.use_plugin_calls[0]["config"] == {"model": "gpt-4", "moderate_output": True}
+
+
+def test_chat_openai_rejects_streaming_multiple_completions() -> None:
+    """Test that invalid arguments raise, rather than leaving a partially constructed wrapper."""
+    with pytest.raises(ValueError):
+        ChatOpenAI(client=FakeSteamship(), streaming=True, n=2)
+
+
+def test_chat_openai_agenerate_matches_generate() -> None:
+    """Test that async generation returns the same results as the sync path, for both completion modes."""
+    client = FakeSteamship(completion="Hello there, human!", chunk_size=5)
+    conversations = [[HumanMessage(content=f"Hello {i}")] for i in range(5)]
+    for streaming in (False, True):
+        collector = TokenCollector()
+        chat = ChatOpenAI(client=client, streaming=streaming, callbacks=[collector])
+
+        expected = chat.generate(conversations)
+        actual = asyncio.run(chat.agenerate(conversations))
+        assert [[g.text for g in gs] for gs in actual.generations] == [
+            [g.text for g in gs] for gs in expected.generations
+        ]
+        assert actual.llm_output == expected.llm_output
+        if streaming:
+            # concurrent streams interleave their tokens.
+            assert sorted(collector.tokens) == sorted(["Hello", " ther", "e, hu", "man!"] * 10)
+
+
+def test_chat_openai_agenerate_bounds_concurrency(monkeypatch) -> None:
+    """Test that at most `max_concurrent_generations` message lists are in-flight at once."""
+    in_flight, peak = [0], [0]
+
+    async def _slow_wait(task, *args, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return task.output
+
+    monkeypatch.setattr(chat_openai_module, "wait_async", _slow_wait)
+    chat = ChatOpenAI(client=FakeSteamship(), max_concurrent_generations=3)
+
+    result = asyncio.run(chat.agenerate([[HumanMessage(content="Hi")]] * 10))
+    assert len(result.generations) == 10
+    assert peak[0] == 3
+
+
+def test_chat_openai_conversation_file_uploads_only_new_messages() -> None:
+    """Test that, with a conversation File, each turn appends only its new messages (and the reply)."""
+    client = FakeSteamship(completion="Hello there, human!", chunk_size=5)
+    conversation = ConversationFile(client)
+    history = [SystemMessage(content="You are to chat with the user.")]
+    for turn, streaming in enumerate([False, True, False]):
+        chat = ChatOpenAI(client=client, streaming=streaming, conversation_file=conversation)
+        history.append(HumanMessage(content=f"Message {turn}"))
+        history.append(chat(history))
+
+    assert len(client.files) == 1
+    (file,) = client.files.values()
+    assert [block["text"] for block in file["blocks"]] == [message.content for message in history]
+    assert conversation.stats() == {"files_created": 1, "blocks_appended": 2, "size": 7}
+    assert {call["input_file_id"] for call in client.plugin.generate_calls} == {
+        conversation.file_id
+    }
+
+
+def test_chat_openai_conversation_file_rejects_several_message_lists() -> None:
+    """Test that a conversation File is only used to generate from one list of messages at a time."""
+    chat = ChatOpenAI(client=FakeSteamship(), conversation_file=ConversationFile(FakeSteamship()))
+    conversations = [[HumanMessage(content="a")], [HumanMessage(content="b")]]
+
+    with pytest.raises(ValueError):
+        chat.generate(conversations)
+    with pytest.raises(ValueError):
+        asyncio.run(chat.agenerate(conversations))
+
+
+def test_chat_openai_conversation_turns_do_not_interleave(monkeypatch) -> None:
+    """Test that concurrent turns of one conversation are serialized, from upload through recording the reply."""
+    wait_async = chat_openai_module.wait_async
+
+    async def _slow_wait(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await wait_async(*args, **kwargs)
+
+    monkeypatch.setattr(chat_openai_module, "wait_async", _slow_wait)
+    client = FakeSteamship(completion="Hello there, human!")
+    conversation = ConversationFile(client)
+    chat = ChatOpenAI(client=client, conversation_file=conversation)
+
+    async def _turns():
+        return await asyncio.gather(
+            chat.agenerate([[HumanMessage(content="a")]]),
+            chat.agenerate([[HumanMessage(content="b")]]),
+        )
+
+    results = asyncio.run(_turns())
+    assert [result.generations[0][0].text for result in results] == ["Hello there, human!"] * 2
+    # the histories do not extend each other, so the later turn replaced the File once the earlier had finished.
+    (file,) = client.files.values()
+    assert [block["text"] for block in file["blocks"]] in (
+        ["a", "Hello there, human!"],
+        ["b", "Hello there, human!"],
+    )
+    assert conversation.stats() == {"files_created": 2, "blocks_appended": 0, "size": 2}
@@ -0,0 +1,53 @@
+from steamship import Block, Tag
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.files import ConversationFile
+
+
+def _block(role, text):
+    return Block(text=text, tags=[Tag(kind="role", name=role)])
+
+
+def _texts(client, file_id):
+    return [block["text"] for block in client.files[file_id]["blocks"]]
+
+
+def test_conversation_appends_only_new_blocks():
+    client = FakeSteamship()
+    conversation = ConversationFile(client)
+    history = [_block("system", "be nice"), _block("user", "hi")]
+
+    file_id = conversation.sync(history)
+    conversation.extend([_block("assistant", "hello")])
+    history += [_block("assistant", "hello"), _block("user", "how are you?")]
+    assert conversation.sync(history) == file_id
+
+    assert len(client.files) == 1
+    assert _texts(client, file_id) == ["be nice", "hi", "how are you?"]
+    assert conversation.stats() == {"files_created": 1, "blocks_appended": 1, "size": 4}
+
+
+def test_conversation_restarts_when_history_diverges():
+    client = FakeSteamship()
+    conversation = ConversationFile(client, handle="conversation-1")
+    first = conversation.sync([_block("user", "hi"), _block("user", "again")])
+
+    # e.g. the history was trimmed to fit the context window.
+    second = conversation.sync([_block("user", "again"), _block("user", "more")])
+    assert second != first
+    assert list(client.files) == [second]
+    assert client.files[second]["handle"] == "conversation-1"
+    assert conversation.stats()["files_created"] == 2
+
+
+def test_conversation_resumes_from_handle():
+    client = FakeSteamship()
+    ConversationFile(client, handle="conversation-1").sync([_block("user", "hi")])
+
+    resumed = ConversationFile(client, handle="conversation-1")
+    file_id = resumed.sync([_block("user", "hi"), _block("user", "still there?")])
+    assert _texts(client, file_id) == ["hi", "still there?"]
+    assert resumed.stats() == {"files_created": 0, "blocks_appended": 1, "size": 2}
+
+    resumed.delete()
+    assert client.files == {}
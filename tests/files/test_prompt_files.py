@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from steamship import Block, File, SteamshipError, Tag, TaskState
+from utils.fake_client import FakeSteamship, FakeTask
+
+from steamship_langchain.files import (
+    PromptFileIndex,
+    arun_with_prompt_file,
+    prompt_file_handle,
+    prompt_file_id,
+    run_with_prompt_file,
+)
+
+
+def _blocks(*texts):
+    return [Block(text=text, tags=[Tag(kind="role", name="user")]) for text in texts]
+
+
+def test_prompt_file_handle_is_content_addressed():
+    assert prompt_file_handle(_blocks("a", "b")) == prompt_file_handle(_blocks("a", "b"))
+    assert prompt_file_handle(_blocks("a", "b")) != prompt_file_handle(_blocks("a", "c"))
+    assert prompt_file_handle(_blocks("a")) != prompt_file_handle([Block(text="a")])
+
+
+def test_prompt_files_are_uploaded_once():
+    client = FakeSteamship()
+    index = PromptFileIndex()
+
+    first = prompt_file_id(client, _blocks("system", "hello"), index=index)
+    second = prompt_file_id(client, _blocks("system", "hello"), index=index)
+    other = prompt_file_id(client, _blocks("system", "goodbye"), index=index)
+
+    assert first == second
+    assert other != first
+    assert len(client.files) == 2
+    assert index.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+
+def test_prompt_files_uploaded_elsewhere_are_reused():
+    client = FakeSteamship()
+    file_id = prompt_file_id(client, _blocks("hello"), index=PromptFileIndex())
+
+    # a fresh index (e.g. in another process) finds the existing File by its handle.
+    assert prompt_file_id(client, _blocks("hello"), index=PromptFileIndex()) == file_id
+    assert len(client.files) == 1
+
+
+def test_prompt_file_creation_errors_are_reported():
+    """Test that a failed upload is reported as such, not as a missing File, when no File holds the handle."""
+    client = FakeSteamship()
+
+    def _fail_create(payload):
+        raise SteamshipError(message="Quota exceeded.")
+
+    client._post_file_create = _fail_create
+    with pytest.raises(SteamshipError, match="Quota exceeded."):
+        prompt_file_id(client, _blocks("hello"), index=PromptFileIndex())
+
+
+def test_prompt_file_index_is_size_bounded():
+    client = FakeSteamship()
+    index = PromptFileIndex(max_size=2)
+    for text in ("a", "b", "c"):
+        prompt_file_id(client, _blocks(text), index=index)
+    assert len(index) == 2
+
+
+def _generate(client, runs):
+    def _run(file_id):
+        runs.append(file_id)
+        return client.plugin.generate(input_file_id=file_id)
+
+    return _run
+
+
+def test_deleted_prompt_files_are_uploaded_again():
+    """Test that a prompt File deleted since it was indexed is forgotten and uploaded again, once."""
+    client = FakeSteamship()
+    index = PromptFileIndex()
+    file_id = prompt_file_id(client, _blocks("hello"), index=index)
+    File.get(client, _id=file_id).delete()
+
+    runs = []
+    task = run_with_prompt_file(client, _blocks("hello"), _generate(client, runs), index=index)
+
+    assert task.output.blocks[0].text == "Hello from a fake plugin!"
+    assert runs[0] == file_id
+    assert len(runs) == 2 and runs[1] in client.files
+
+
+def test_deleted_prompt_files_are_uploaded_again_async():
+    client = FakeSteamship()
+    index = PromptFileIndex()
+    file_id = prompt_file_id(client, _blocks("hello"), index=index)
+    File.get(client, _id=file_id).delete()
+
+    runs = []
+    run = _generate(client, runs)
+
+    async def _arun(file_id):
+        return run(file_id)
+
+    task = asyncio.run(arun_with_prompt_file(client, _blocks("hello"), _arun, index=index))
+
+    assert task.output.blocks[0].text == "Hello from a fake plugin!"
+    assert len(runs) == 2 and runs[1] in client.files
+
+
+def test_prompt_file_failures_with_other_causes_are_not_retried():
+    client = FakeSteamship()
+    index = PromptFileIndex()
+    runs = []
+
+    def _fail(file_id):
+        runs.append(file_id)
+        raise SteamshipError(message="Rate limited.")
+
+    with pytest.raises(SteamshipError, match="Rate limited."):
+        run_with_prompt_file(client, _blocks("hello"), _fail, index=index)
+
+    def _failed_task(file_id):
+        runs.append(file_id)
+        return FakeTask(state=TaskState.failed)
+
+    task = run_with_prompt_file(client, _blocks("hello"), _failed_task, index=index)
+    assert task.state == TaskState.failed
+    assert len(runs) == 2
+    assert len(client.files) == 1
+
+
+def test_prompt_files_are_tagged_on_upload():
+    client = FakeSteamship()
+    tags = [Tag(kind="transient", name="test")]
+    file_id = prompt_file_id(client, _blocks("hello"), index=PromptFileIndex(), tags=tags)
+    assert [tag.kind for tag in File.get(client, _id=file_id).tags] == ["transient"]
@@ -0,0 +1,90 @@
+import time
+
+from steamship import Block, File, Tag
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.files import (
+    TRANSIENT_TAG_KIND,
+    PromptFileIndex,
+    TransientFileCollector,
+    prompt_file_id,
+    transient_tag,
+)
+
+
+def _create_file(client: FakeSteamship, age_s: float, transient: bool = True) -> str:
+    tags = [Tag(kind=TRANSIENT_TAG_KIND, value={"created_at": time.time() - age_s})]
+    return File.create(client, blocks=[Block(text="prompt")], tags=tags if transient else None).id
+
+
+def test_transient_tag_records_source_and_creation_time():
+    tag = transient_tag("openai-chat")
+    assert tag.kind == TRANSIENT_TAG_KIND
+    assert tag.name == "openai-chat"
+    assert time.time() - tag.value["created_at"] < 1
+
+
+def test_collector_deletes_expired_transient_files():
+    client = FakeSteamship()
+    expired = [_create_file(client, age_s=120) for _ in range(5)]
+    fresh = _create_file(client, age_s=10)
+    permanent = _create_file(client, age_s=120, transient=False)
+
+    report = TransientFileCollector(client, ttl_s=60, max_concurrency=2).collect()
+
+    assert sorted(report.deleted) == sorted(expired)
+    assert report.kept == 1
+    assert not report.failed
+    assert set(client.files) == {fresh, permanent}
+
+
+def test_collector_dry_run_deletes_nothing():
+    client = FakeSteamship()
+    expired = _create_file(client, age_s=120)
+    _create_file(client, age_s=10)
+
+    report = TransientFileCollector(client, ttl_s=60).collect(dry_run=True)
+
+    assert report.expired == [expired]
+    assert report.deleted == []
+    assert report.kept == 1
+    assert len(client.files) == 2
+
+
+def test_collector_reports_failed_deletions():
+    client = FakeSteamship()
+    expired = [_create_file(client, age_s=120) for _ in range(3)]
+    client.fail_deletes.add(expired[0])
+
+    report = TransientFileCollector(client, ttl_s=60).collect()
+
+    assert list(report.failed) == [expired[0]]
+    assert sorted(report.deleted) == sorted(expired[1:])
+
+
+def test_collector_runs_in_the_background():
+    client = FakeSteamship()
+    _create_file(client, age_s=120)
+
+    collector = TransientFileCollector(client, ttl_s=60)
+    collector.start(interval_s=0.01)
+    deadline = time.time() + 2
+    while client.files and time.time() < deadline:
+        time.sleep(0.01)
+    collector.stop()
+
+    assert not client.files
+
+
+def test_collector_forgets_collected_prompt_files():
+    """Test that collected prompt Files are dropped from the prompt File index, so they are uploaded again."""
+    client = FakeSteamship()
+    index = PromptFileIndex()
+    tags = [Tag(kind=TRANSIENT_TAG_KIND, value={"created_at": time.time() - 120})]
+    file_id = prompt_file_id(client, [Block(text="prompt")], index=index, tags=tags)
+
+    report = TransientFileCollector(client, ttl_s=60, index=index).collect()
+
+    assert report.deleted == [file_id]
+    assert len(index) == 0
+    assert prompt_file_id(client, [Block(text="prompt")], index=index) != file_id
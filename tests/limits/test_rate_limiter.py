@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from steamship_langchain.limits import RateLimiter, limit, limit_async
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(requests_per_second=20)
+
+    t0 = time.perf_counter()
+    for _ in range(24):
+        with limit(limiter, lambda: 0):
+            pass
+    elapsed = time.perf_counter() - t0
+
+    # the first 20 requests are covered by the initial (one second) burst; the remaining four wait 1/20th of a
+    # second each.
+    assert elapsed == pytest.approx(0.2, abs=0.1)
+    assert limiter.stats()["admitted"] == 24
+
+
+def test_rate_limiter_limits_tokens_per_minute():
+    limiter = RateLimiter(tokens_per_minute=600)  # 10 tokens/s, with a burst of 600
+
+    assert limiter.acquire(tokens=600) == pytest.approx(0.0, abs=0.05)
+    limiter.release()
+    # the bucket is now empty: 2 more tokens take 0.2s to refill.
+    assert limiter.acquire(tokens=2) == pytest.approx(0.2, abs=0.1)
+    limiter.release()
+    assert limiter.stats()["tokens_admitted"] == 602
+
+
+def test_rate_limiter_only_estimates_tokens_when_counting_them():
+    def estimate():
+        raise AssertionError("tokens should not be estimated without a tokens/min limit")
+
+    with limit(RateLimiter(requests_per_second=100), estimate):
+        pass
+    with limit(None, estimate):
+        pass
+
+
+def test_rate_limiter_caps_concurrency_across_threads():
+    limiter = RateLimiter(max_concurrency=2)
+    active, max_active = 0, 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal active, max_active
+        with limit(limiter, lambda: 0):
+            with lock:
+                active += 1
+                max_active = max(max_active, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_active == 2
+    stats = limiter.stats()
+    assert stats["admitted"] == 8
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+    assert stats["max_wait_s"] > 0
+
+
+def test_rate_limiter_caps_concurrency_across_asyncio_tasks():
+    limiter = RateLimiter(max_concurrency=3)
+    active, max_active = 0, 0
+
+    async def call():
+        nonlocal active, max_active
+        async with limit_async(limiter, lambda: 0):
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(9)])
+
+    asyncio.run(run())
+    assert max_active == 3
+    assert limiter.stats()["admitted"] == 9
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_rate_limiter_try_acquire_does_not_wait_for_slots():
+    limiter = RateLimiter(max_concurrency=1)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+    limiter.release()
+    assert limiter.stats()["admitted"] == 2
+    assert limiter.stats()["in_flight"] == 0
@@ -1,12 +1,21 @@
+import asyncio
+import threading
 from pathlib import Path
+from typing import Any, List
 
 import pytest
 from langchain.agents.react.wiki_prompt import WIKI_PROMPT
 from langchain.agents.self_ask_with_search.prompt import PROMPT
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.llms.loading import load_llm
+from langchain.schema import Generation
 from steamship import Steamship
+from utils.fake_client import FakeSteamship
 
-from steamship_langchain.llms.openai import OpenAI, OpenAIChat
+from steamship_langchain.limits import RateLimiter
+from steamship_langchain.llms.openai import GenerationBatchError, OpenAI, OpenAIChat
+from steamship_langchain.plugins import plugin_instance_registry
+from steamship_langchain.tasks import FixedPollPolicy, Hedger
 
 
 @pytest.mark.usefixtures("client")
@@ -54,6 +63,262 @@ def test_openai_batching(client: Steamship):
     assert len(generated.generations) == 30
 
 
+@pytest.mark.usefixtures("client")
+def test_openai_concurrent_batching(client: Steamship):
+    """Test that concurrently dispatched sub-batches are merged back in prompt order."""
+    llm_under_test = OpenAI(client=client, temperature=0, batch_size=2, max_concurrent_batches=4)
+
+    prompts = [f"Please respond with only the number {i}" for i in range(10)]
+    generated = llm_under_test.generate(prompts=prompts)
+    assert len(generated.generations) == 10
+    for i, generation in enumerate(generated.generations):
+        assert str(i) in generation[0].text
+    assert generated.llm_output["token_usage"]["total_tokens"] > 0
+
+
+@pytest.mark.usefixtures("client")
+def test_openai_token_budget_packing(client: Steamship):
+    """Test that prompts are packed into sub-batches by token budget, preserving prompt order."""
+    llm_under_test = OpenAI(client=client, temperature=0, batch_token_budget=50)
+
+    long_prompt = "Please respond with a simple 'Long'. " + "Ignore this padding. " * 20
+    prompts = ["Please respond with a simple 'Short'"] * 4 + [long_prompt] + ["Say 'Short'"]
+    sub_prompts = llm_under_test._sub_prompts(prompts)
+    assert [p for sub in sub_prompts for p in sub] == prompts
+    assert [long_prompt] in sub_prompts
+
+    generated = llm_under_test.generate(prompts=prompts)
+    assert len(generated.generations) == 6
+    assert generated.generations[4][0].text.strip() == "Long"
+
+
+@pytest.mark.usefixtures("client")
+def test_openai_plugin_instance_memoized(client: Steamship):
+    """Test that repeat sub-batches with the same params reuse the resolved plugin instance."""
+    plugin_instance_registry.clear()
+    llm_under_test = OpenAI(client=client, temperature=0, batch_size=1)
+
+    generated = llm_under_test.generate(prompts=["Tell me a joke", "Tell me a poem"])
+    assert len(generated.generations) == 2
+    assert plugin_instance_registry.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+@pytest.mark.usefixtures("client")
+def test_openai_async_generate(client: Steamship):
+    """Test that many async generations can be in-flight at once, preserving prompt order."""
+    llm_under_test = OpenAI(client=client, temperature=0, batch_size=2)
+
+    async def _generate_all():
+        return await asyncio.gather(
+            llm_under_test.agenerate(prompts=["Please respond with a simple 'Hello'"] * 3),
+            llm_under_test.agenerate(prompts=["Please respond with a simple 'Goodbye'"]),
+        )
+
+    hello_result, goodbye_result = asyncio.run(_generate_all())
+    assert len(hello_result.generations) == 3
+    for generation in hello_result.generations:
+        assert generation[0].text.strip() == "Hello"
+    assert goodbye_result.generations[0][0].text.strip() == "Goodbye"
+
+
+@pytest.mark.usefixtures("client")
+def test_openai_deduplicates_prompts(client: Steamship):
+    """Test that duplicate prompts are generated once and fanned back out to every position."""
+    llm_under_test = OpenAI(client=client, temperature=0)
+
+    prompts = ["Please respond with a simple 'Hello'", "Please respond with a simple 'Goodbye'"] * 3
+    generated = llm_under_test.generate(prompts=prompts)
+    assert len(generated.generations) == 6
+    assert generated.llm_output["deduplicated_prompts"] == 4
+    for i, generation in enumerate(generated.generations):
+        assert generation[0].text.strip() == ("Hello" if i % 2 == 0 else "Goodbye")
+
+
+def test_openai_deduplicates_prompts_with_fake_plugin():
+    """Test that duplicate prompts are sent to the plugin once, and their generations fanned back out."""
+    client = FakeSteamship()
+    llm_under_test = OpenAI.construct(client=client, batch_size=4)
+
+    generated = llm_under_test.generate(prompts=["hello", "goodbye", "hello", "hello", "goodbye"])
+    assert client.tagger.tag_calls == [["hello", "goodbye"]]
+    assert [generation[0].text for generation in generated.generations] == [
+        "hello!",
+        "goodbye!",
+        "hello!",
+        "hello!",
+        "goodbye!",
+    ]
+    assert generated.llm_output["deduplicated_prompts"] == 3
+    assert generated.llm_output["token_usage"] == {"total_tokens": 2}
+
+    llm_under_test = OpenAI.construct(client=client, batch_size=4, deduplicate_prompts=False)
+    generated = llm_under_test.generate(prompts=["hello", "hello"])
+    assert client.tagger.tag_calls[-1] == ["hello", "hello"]
+    assert len(generated.generations) == 2
+
+
+class FlakyOpenAI(OpenAI):
+    """OpenAI whose generation tasks fail for any batch containing the prompt "fail"."""
+
+    def _tag_batch(self, prompts, stop=None):
+        self.tagged_batches.append(prompts)
+        if "fail" in prompts:
+            raise GenerationBatchError("generation task failed")
+        return [Generation(text=prompt.upper()) for prompt in prompts for _ in range(self.n)], {
+            "total_tokens": len(prompts)
+        }
+
+
+def test_openai_failed_batch_is_bisected():
+    """Test that only the failing prompt of a failed sub-batch is lost, with positional mapping preserved."""
+    llm_under_test = FlakyOpenAI.construct(batch_size=8, n=2, tagged_batches=[])
+
+    prompts = ["a", "b", "fail", "c", "d", "e"]
+    generated = llm_under_test._generate(prompts)
+    assert [[g.text for g in generation] for generation in generated.generations] == [
+        ["A", "A"],
+        ["B", "B"],
+        ["", ""],
+        ["C", "C"],
+        ["D", "D"],
+        ["E", "E"],
+    ]
+    assert generated.generations[2][0].generation_info == {"error": "generation task failed"}
+    assert generated.llm_output["token_usage"] == {"total_tokens": 5}
+    assert ["fail"] in llm_under_test.tagged_batches
+
+
+def test_openai_multiplexed_batches_with_fake_plugin():
+    """Test that multiplexed sub-batches keep prompt order when they finish out of order, and are recovered."""
+    client = FakeSteamship()
+    # the first sub-batch finishes last, and the third fails (and is bisected).
+    client.tagger.refreshes = {"a": 10, "c": 5}
+    client.tagger.failing_prompts = {"fail"}
+    llm_under_test = OpenAI.construct(
+        client=client, batch_size=2, max_concurrent_batches=3, poll_policy=FixedPollPolicy(0.01)
+    )
+
+    prompts = ["a", "b", "c", "d", "e", "fail", "f", "g"]
+    generated = llm_under_test.generate(prompts=prompts)
+    assert [generation[0].text for generation in generated.generations] == [
+        "a!",
+        "b!",
+        "c!",
+        "d!",
+        "e!",
+        "",
+        "f!",
+        "g!",
+    ]
+    assert "generation failed" in generated.generations[5][0].generation_info["error"]
+    assert generated.llm_output["token_usage"] == {"total_tokens": 7}
+    # the failed sub-batch was bisected, and the last sub-batch started, while the first two were still running.
+    assert client.tagger.tag_calls == [
+        ["a", "b"],
+        ["c", "d"],
+        ["e", "fail"],
+        ["e"],
+        ["fail"],
+        ["f", "g"],
+    ]
+
+
+def _generate_in_thread(llm, prompts, timeout_s=5.0):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(llm.generate(prompts=prompts)))
+    thread.start()
+    thread.join(timeout_s)
+    assert not thread.is_alive(), "generate did not finish"
+    return results[0]
+
+
+def test_openai_multiplexed_batches_within_smaller_rate_limit():
+    """Test that a rate limiter allowing fewer calls than the fan-out throttles multiplexed batches."""
+    client = FakeSteamship()
+    client.tagger.refreshes = {prompt: 2 for prompt in "abcd"}
+    limiter = RateLimiter(max_concurrency=2)
+    llm_under_test = OpenAI.construct(
+        client=client,
+        batch_size=1,
+        max_concurrent_batches=4,
+        rate_limiter=limiter,
+        poll_policy=FixedPollPolicy(0.01),
+    )
+
+    generated = _generate_in_thread(llm_under_test, list("abcd"))
+    assert [generation[0].text for generation in generated.generations] == ["a!", "b!", "c!", "d!"]
+    assert limiter.stats()["admitted"] == 4
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_openai_multiplexed_batches_release_rate_limit_on_errors(monkeypatch):
+    """Test that the slots of in-flight batches are released when starting another batch raises."""
+    client = FakeSteamship()
+    client.tagger.refreshes = {prompt: 1000 for prompt in "ab"}
+    limiter = RateLimiter(max_concurrency=4)
+    llm_under_test = OpenAI.construct(
+        client=client,
+        batch_size=1,
+        max_concurrent_batches=4,
+        rate_limiter=limiter,
+        poll_policy=FixedPollPolicy(0.01),
+    )
+    start_batch = OpenAI._start_batch
+
+    def _start_batch(self, prompts, stop=None):
+        if prompts == ["c"]:
+            raise RuntimeError("unexpected")
+        return start_batch(self, prompts, stop)
+
+    monkeypatch.setattr(OpenAI, "_start_batch", _start_batch)
+    with pytest.raises(RuntimeError):
+        llm_under_test.generate(prompts=list("abcd"))
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_openai_bisection_is_bounded_by_depth():
+    """Test that a failed sub-batch is split at most `max_bisect_depth` times."""
+    client = FakeSteamship()
+    client.tagger.failing_prompts = {"fail"}
+    llm_under_test = OpenAI.construct(client=client, batch_size=8, max_bisect_depth=1)
+
+    prompts = ["a", "b", "c", "fail", "d", "e", "f", "g"]
+    generated = llm_under_test.generate(prompts=prompts)
+    assert client.tagger.tag_calls == [prompts, prompts[:4], prompts[4:]]
+    assert [generation[0].text for generation in generated.generations] == [
+        "",
+        "",
+        "",
+        "",
+        "d!",
+        "e!",
+        "f!",
+        "g!",
+    ]
+    assert "generation failed" in generated.generations[0][0].generation_info["error"]
+
+
+def test_openai_timed_out_batch_is_not_bisected():
+    """Test that a sub-batch that times out is failed as a whole, rather than split and retried."""
+    client = FakeSteamship()
+    client.tagger.refreshes = {"slow": 10_000}
+    llm_under_test = OpenAI.construct(
+        client=client,
+        batch_size=8,
+        batch_task_timeout_seconds=0.05,
+        poll_policy=FixedPollPolicy(0.01),
+    )
+
+    generated = llm_under_test.generate(prompts=["a", "slow", "b"])
+    assert client.tagger.tag_calls == [["a", "slow", "b"]]
+    assert [generation[0].text for generation in generated.generations] == ["", "", ""]
+    assert "timeout" in generated.generations[0][0].generation_info["error"]
+
+    generated = asyncio.run(llm_under_test.agenerate(prompts=["a", "slow", "b"]))
+    assert client.tagger.tag_calls == [["a", "slow", "b"]] * 2
+    assert [generation[0].text for generation in generated.generations] == ["", "", ""]
+
+
 @pytest.mark.usefixtures("client")
 def test_openai_multiple_completions(client: Steamship):
     """Basic tests of the OpenAI plugin wrapper number of completions behavior."""
@@ -137,6 +402,90 @@ def test_openai_chat_llm(client: Steamship) -> None:
     assert text_response.strip(' "') == "I pledge allegiance to the"
 
 
+@pytest.mark.usefixtures("client")
+def test_openai_chat_llm_async(client: Steamship) -> None:
+    """Test async generation with the Chat version of the LLM"""
+    llm = OpenAIChat(client=client)
+    llm_result = asyncio.run(
+        llm.agenerate(
+            prompts=["Please print the words of the Pledge of Allegiance"], stop=["flag", "Flag"]
+        )
+    )
+    assert len(llm_result.generations) == 1
+    text_response = llm_result.generations[0][0].text
+    assert text_response.strip(' "') == "I pledge allegiance to the"
+
+
+def test_openai_chat_llm_streaming_with_fake_plugin() -> None:
+    """Test streaming with the Chat version of the LLM"""
+    client = FakeSteamship(completion="I pledge allegiance", chunk_size=3)
+    llm = OpenAIChat(client=client)
+    assert list(llm.stream("Please print the words of the Pledge of Allegiance")) == [
+        "I p",
+        "led",
+        "ge ",
+        "all",
+        "egi",
+        "anc",
+        "e",
+    ]
+
+    llm = OpenAIChat(client=client, streaming=True)
+    llm_result = llm.generate(prompts=["Please print the words of the Pledge of Allegiance"])
+    assert llm_result.generations[0][0].text == "I pledge allegiance"
+
+
+class TokenCollector(BaseCallbackHandler):
+    """Collects the tokens reported via on_llm_new_token."""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.append(token)
+
+
+def test_openai_chat_llm_async_streaming_with_fake_plugin() -> None:
+    """Test that async generation streams, reporting tokens to callbacks as they are written."""
+    client = FakeSteamship(completion="I pledge allegiance", chunk_size=5)
+    collector = TokenCollector()
+    llm = OpenAIChat(client=client, streaming=True, callbacks=[collector])
+
+    llm_result = asyncio.run(llm.agenerate(prompts=["Please print the Pledge of Allegiance"]))
+    assert llm_result.generations[0][0].text == "I pledge allegiance"
+    assert collector.tokens == ["I ple", "dge a", "llegi", "ance"]
+    assert client.plugin.generate_calls[0]["streaming"] is True
+
+
+def test_openai_chat_llm_hedges_sync_and_async_completions() -> None:
+    """Test that both synchronous and asynchronous completions are run through the hedger."""
+    client = FakeSteamship(completion="Hello there, human!")
+    hedger = Hedger(delay_s=1.0)
+    llm = OpenAIChat(client=client, hedger=hedger)
+
+    assert llm("Hello") == "Hello there, human!"
+    llm_result = asyncio.run(llm.agenerate(prompts=["Hello"]))
+    assert llm_result.generations[0][0].text == "Hello there, human!"
+    assert hedger.stats() == {"calls": 2, "hedges_fired": 0, "hedges_won": 0}
+
+
+def test_openai_chat_llm_reuses_prompt_files() -> None:
+    """Test that prompts are uploaded once, and uploaded again if their File has been deleted since."""
+    client = FakeSteamship(completion="Hello there, human!")
+    llm = OpenAIChat(client=client, reuse_prompt_files=True)
+
+    assert llm("Hello") == "Hello there, human!"
+    assert llm("Hello") == "Hello there, human!"
+    assert len(client.files) == 1
+    client.files.clear()
+
+    llm_result = asyncio.run(llm.agenerate(prompts=["Hello"]))
+    assert llm_result.generations[0][0].text == "Hello there, human!"
+    assert llm("Hello") == "Hello there, human!"
+    assert len(client.files) == 1
+    assert len(client.plugin.generate_calls) == 5
+
+
 @pytest.mark.usefixtures("client")
 def test_openai_chat_llm_with_prefixed_messages(client: Steamship) -> None:
     """Test Chat version of the LLM"""
@@ -193,3 +542,14 @@ def test_openai_large_context(client: Steamship):
     generated = llm_under_test.generate(prompts=prompts)
     assert len(generated.generations) != 0
     assert len(generated.generations[0]) > 0
+
+
+def test_openai_chat_resolves_plugin_on_first_use():
+    """Test that OpenAIChat does no I/O at construction, and shares plugin instances across wrappers."""
+    client = FakeSteamship(completion="Hello there, human!")
+    llms = [OpenAIChat(client=client) for _ in range(3)]
+    assert client.use_plugin_calls == []
+
+    assert [llm("Hello") for llm in llms] == ["Hello there, human!"] * 3
+    assert len(client.use_plugin_calls) == 1
+    assert client.use_plugin_calls[0]["config"] == {"model": "gpt-4", "moderate_output": True}
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from steamship_langchain import lru
+from steamship_langchain.plugins import PluginInstanceRegistry, use_plugin
+
+
+def test_registry_memoizes_instances():
+    registry = PluginInstanceRegistry()
+    resolutions = []
+
+    def _resolve():
+        resolutions.append(1)
+        return object()
+
+    first = registry.get_or_create("gpt-abc", _resolve)
+    second = registry.get_or_create("gpt-abc", _resolve)
+    assert first is second
+    assert len(resolutions) == 1
+    assert registry.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    registry.invalidate("gpt-abc")
+    assert registry.get_or_create("gpt-abc", _resolve) is not first
+    assert len(resolutions) == 2
+
+
+def test_registry_is_size_bounded():
+    registry = PluginInstanceRegistry(max_size=2)
+    registry.get_or_create("a", object)
+    registry.get_or_create("b", object)
+    registry.get_or_create("a", object)  # "a" is now the most recently used
+    registry.get_or_create("c", object)  # evicts "b"
+    assert len(registry) == 2
+
+    registry.get_or_create("a", object)
+    registry.get_or_create("b", object)
+    assert registry.stats() == {"hits": 2, "misses": 4, "size": 2}
+
+
+def test_registry_is_thread_safe():
+    registry = PluginInstanceRegistry(max_size=8)
+    keys = [f"key-{i % 16}" for i in range(1000)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda key: registry.get_or_create(key, object), keys))
+    stats = registry.stats()
+    assert stats["hits"] + stats["misses"] == 1000
+    assert stats["size"] <= 8
+
+
+def test_registry_expires_instances(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    registry = PluginInstanceRegistry(ttl_s=60)
+
+    first = registry.get_or_create("a", object)
+    now[0] += 59
+    assert registry.get_or_create("a", object) is first
+    now[0] += 2
+    assert registry.get_or_create("a", object) is not first
+    assert registry.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+def test_use_plugin_keys_instances_by_config():
+    client = SimpleNamespace(
+        config=SimpleNamespace(
+            api_base="https://fake", api_key="key", workspace_id="ws", workspace_handle="ws"
+        ),
+        calls=[],
+    )
+    client.use_plugin = lambda **kwargs: client.calls.append(kwargs) or object()
+    registry = PluginInstanceRegistry()
+
+    first = use_plugin(client, "gpt-4", {"model": "gpt-4", "n": 1}, registry=registry)
+    assert use_plugin(client, "gpt-4", {"n": 1, "model": "gpt-4"}, registry=registry) is first
+    assert use_plugin(client, "gpt-4", {"model": "gpt-3.5-turbo"}, registry=registry) is not first
+    assert [call["config"]["model"] for call in client.calls] == ["gpt-4", "gpt-3.5-turbo"]
+    assert all(call["fetch_if_exists"] for call in client.calls)
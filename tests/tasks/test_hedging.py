@@ -0,0 +1,72 @@
+import pytest
+from steamship import SteamshipError, TaskState
+
+from steamship_langchain.tasks import FixedPollPolicy, Hedger
+
+
+class FakeTask:
+    """Task that finishes (in `final_state`) after a fixed number of status refreshes."""
+
+    def __init__(self, refreshes_to_finish: int, output: str, final_state=TaskState.succeeded):
+        self.task_id = output
+        self.state = TaskState.running
+        self.output = output
+        self.refreshes = 0
+        self.refreshes_to_finish = refreshes_to_finish
+        self.final_state = final_state
+
+    def refresh(self):
+        self.refreshes += 1
+        if self.refreshes >= self.refreshes_to_finish:
+            self.state = self.final_state
+
+
+def starter(*tasks):
+    started = list(tasks)
+    return lambda: started.pop(0)
+
+
+def test_hedger_does_not_hedge_fast_tasks():
+    hedger = Hedger(delay_s=1.0)
+    task = hedger.run(starter(FakeTask(2, "original")), policy=FixedPollPolicy(0.01))
+    assert task.output == "original"
+    assert hedger.stats() == {"calls": 1, "hedges_fired": 0, "hedges_won": 0}
+
+
+def test_hedger_takes_the_hedge_when_it_finishes_first():
+    hedger = Hedger(delay_s=0.03)
+    start = starter(FakeTask(10_000, "stuck"), FakeTask(1, "hedge"))
+    task = hedger.run(start, policy=FixedPollPolicy(0.01))
+    assert task.output == "hedge"
+    assert hedger.stats() == {"calls": 1, "hedges_fired": 1, "hedges_won": 1}
+
+
+def test_hedger_falls_back_to_the_other_task_on_failure():
+    hedger = Hedger(delay_s=0.0)
+    start = starter(FakeTask(1, "failed", final_state=TaskState.failed), FakeTask(3, "hedge"))
+    assert hedger.run(start, policy=FixedPollPolicy(0.01)).output == "hedge"
+
+    start = starter(
+        FakeTask(1, "first", final_state=TaskState.failed),
+        FakeTask(1, "second", final_state=TaskState.failed),
+    )
+    task = hedger.run(start, policy=FixedPollPolicy(0.01))
+    assert task.output == "first"
+    assert task.state == TaskState.failed
+
+
+def test_hedger_uses_observed_latency_percentile():
+    hedger = Hedger(percentile=0.5, min_samples=3)
+    assert hedger.hedge_delay() is None
+    for refreshes in (1, 2, 20):
+        hedger.run(starter(FakeTask(refreshes, "task")), policy=FixedPollPolicy(0.01))
+    assert hedger.stats()["hedges_fired"] == 0
+    assert 0.015 < hedger.hedge_delay() < 0.1
+
+
+def test_hedger_times_out():
+    hedger = Hedger(delay_s=0.01)
+    start = starter(FakeTask(10_000, "stuck"), FakeTask(10_000, "also stuck"))
+    with pytest.raises(SteamshipError):
+        hedger.run(start, max_timeout_s=0.05, policy=FixedPollPolicy(0.01))
+    assert hedger.stats()["hedges_fired"] == 1
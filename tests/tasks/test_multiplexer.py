@@ -0,0 +1,64 @@
+import pytest
+from steamship import SteamshipError, TaskState
+
+from steamship_langchain.tasks import FixedPollPolicy, TaskMultiplexer
+
+
+class FakeTask:
+    """Task that succeeds after a fixed number of status refreshes."""
+
+    def __init__(self, refreshes_to_complete: int, output: str):
+        self.task_id = output
+        self.state = TaskState.running if refreshes_to_complete else TaskState.succeeded
+        self.output = output
+        self.refreshes = 0
+        self.refreshes_to_complete = refreshes_to_complete
+
+    def refresh(self):
+        self.refreshes += 1
+        if self.refreshes >= self.refreshes_to_complete:
+            self.state = TaskState.succeeded
+
+
+def test_multiplexer_yields_tasks_in_completion_order():
+    tasks = [FakeTask(3, "slow"), FakeTask(1, "fast"), FakeTask(0, "done")]
+    with TaskMultiplexer(policy=FixedPollPolicy(0.01)) as multiplexer:
+        futures = [multiplexer.submit(task) for task in tasks]
+        completed = [task.output for task in multiplexer.as_completed()]
+
+    assert completed == ["done", "fast", "slow"]
+    assert [future.result().output for future in futures] == ["slow", "fast", "done"]
+    assert tasks[2].refreshes == 0
+
+
+def test_multiplexer_wait_all():
+    tasks = [FakeTask(i, str(i)) for i in range(1, 5)]
+    with TaskMultiplexer(policy=FixedPollPolicy(0.01)) as multiplexer:
+        for task in tasks:
+            multiplexer.submit(task)
+        outputs = multiplexer.wait_all()
+
+    assert outputs == ["1", "2", "3", "4"]
+    # every pending task is refreshed once per polling round.
+    assert [task.refreshes for task in tasks] == [1, 2, 3, 4]
+
+
+def test_multiplexer_times_out_tasks():
+    policy = FixedPollPolicy(0.01)
+    with TaskMultiplexer(policy=policy, max_timeout_s=0.05) as multiplexer:
+        stuck = multiplexer.submit(FakeTask(10_000, "stuck"))
+        finished = multiplexer.submit(FakeTask(1, "finished"))
+        completed = [task.output for task in multiplexer.as_completed()]
+
+    assert completed == ["finished"]
+    assert finished.result().output == "finished"
+    with pytest.raises(SteamshipError):
+        stuck.result()
+    assert policy.stats()["calls"] == 1
+
+
+def test_multiplexer_rejects_submissions_after_close():
+    multiplexer = TaskMultiplexer(policy=FixedPollPolicy(0.01))
+    multiplexer.close()
+    with pytest.raises(SteamshipError):
+        multiplexer.submit(FakeTask(0, "late"))
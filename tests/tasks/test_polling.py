@@ -0,0 +1,30 @@
+from itertools import islice
+
+from steamship_langchain.tasks import BackoffPollPolicy, FixedPollPolicy
+
+
+def test_backoff_policy_grows_to_cap():
+    policy = BackoffPollPolicy(initial_delay_s=0.1, multiplier=2.0, max_delay_s=1.0, jitter=0.0)
+    assert list(islice(policy.delays(), 6)) == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+
+
+def test_backoff_policy_jitter_is_bounded():
+    policy = BackoffPollPolicy(initial_delay_s=1.0, multiplier=1.0, max_delay_s=10.0, jitter=0.2)
+    for delay in islice(policy.delays(), 100):
+        assert 0.8 <= delay <= 1.2
+
+
+def test_policy_stats():
+    policy = FixedPollPolicy(delay_s=0.5, max_samples=2)
+    assert policy.stats()["calls"] == 0
+
+    policy.record(polls=2, latency_s=1.0)
+    policy.record(polls=4, latency_s=2.0)
+    policy.record(polls=6, latency_s=3.0)
+    assert policy.samples() == ((4, 2.0), (6, 3.0))
+    assert policy.stats() == {
+        "calls": 3,
+        "mean_polls": 4.0,
+        "mean_latency_s": 2.0,
+        "max_recent_latency_s": 3.0,
+    }
@@ -0,0 +1,28 @@
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.tasks import stream_block_text
+
+
+def test_stream_block_text_yields_increments():
+    client = FakeSteamship(chunk_size=4)
+    block = client.create_block(chunks=[b"Hell", b"o, w", b"orld"], streaming=True)
+
+    tokens = list(stream_block_text(client, block.id, retry_delay_s=0))
+    assert tokens == ["Hell", "o, w", "orld"]
+
+
+def test_stream_block_text_handles_split_multibyte_characters():
+    client = FakeSteamship()
+    content = "café ☕".encode("utf-8")
+    block = client.create_block(
+        chunks=[content[i : i + 1] for i in range(len(content))], streaming=True
+    )
+
+    assert "".join(stream_block_text(client, block.id, retry_delay_s=0)) == "café ☕"
+
+
+def test_stream_block_text_completed_block():
+    client = FakeSteamship()
+    block = client.create_block(chunks=[b"already done"], streaming=False)
+
+    assert list(stream_block_text(client, block.id, retry_delay_s=0)) == ["already done"]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from steamship import SteamshipError, TaskState
+
+from steamship_langchain.tasks import FixedPollPolicy, wait, wait_async
+
+
+class FakeTask:
+    """Minimal stand-in for a Steamship Task that succeeds after a fixed number of refreshes."""
+
+    def __init__(self, refreshes_until_done: int, output: str = "done"):
+        self.task_id = "fake-task"
+        self.state = TaskState.running
+        self.output = None
+        self.refresh_count = 0
+        self._refreshes_until_done = refreshes_until_done
+        self._output = output
+
+    def refresh(self):
+        self.refresh_count += 1
+        if self.refresh_count >= self._refreshes_until_done:
+            self.state = TaskState.succeeded
+            self.output = self._output
+
+
+def test_wait_returns_output_and_records_polls():
+    policy = FixedPollPolicy(0.01)
+    task = FakeTask(refreshes_until_done=3)
+    assert wait(task, policy=policy) == "done"
+    assert policy.samples()[0][0] == 3
+    assert policy.stats()["calls"] == 1
+
+
+def test_wait_timeout():
+    task = FakeTask(refreshes_until_done=1000)
+    with pytest.raises(SteamshipError):
+        wait(task, max_timeout_s=0.05, policy=FixedPollPolicy(0.01))
+
+
+def test_wait_async_returns_output():
+    task = FakeTask(refreshes_until_done=3)
+    output = asyncio.run(wait_async(task, policy=FixedPollPolicy(0.01)))
+    assert output == "done"
+    assert task.refresh_count == 3
+
+
+def test_wait_async_overlaps_many_tasks():
+    tasks = [FakeTask(refreshes_until_done=5, output=str(i)) for i in range(20)]
+
+    async def _wait_all():
+        return await asyncio.gather(
+            *[wait_async(task, policy=FixedPollPolicy(0.01)) for task in tasks]
+        )
+
+    assert asyncio.run(_wait_all()) == [str(i) for i in range(20)]
+
+
+def test_wait_async_timeout():
+    task = FakeTask(refreshes_until_done=1000)
+    with pytest.raises(SteamshipError):
+        asyncio.run(wait_async(task, max_timeout_s=0.05, policy=FixedPollPolicy(0.01)))
@@ -0,0 +1,39 @@
+from steamship_langchain import lru
+from steamship_langchain.lru import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used_entries():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used entry
+    assert cache.get("b") is None
+    assert cache.get_many(["a", "c"]) == {"a": 1, "c": 3}
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2}
+
+
+def test_lru_cache_counts_each_missed_key_once():
+    cache = LRUCache(max_size=8)
+    cache.put("a", 0)
+    assert cache.get_many(["a", "b", "a", "b"]) == {"a": 0}
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 1}
+    assert cache.hit_rate() == 2 / 3
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0}
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_size=8, ttl_s=60)
+
+    cache.put("a", 1)
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
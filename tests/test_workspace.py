@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from steamship_langchain.workspace import (
+    client_scope,
+    get_workspace_handle,
+    invalidate_workspace_handle,
+)
+
+
+class FakeClient:
+    """Stand-in for a Steamship client that counts workspace lookups."""
+
+    def __init__(self, workspace_id: str, workspace_handle: str):
+        self.config = SimpleNamespace(
+            api_base="https://api.steamship.com/api/v1/",
+            api_key="test-key",
+            workspace_id=workspace_id,
+            workspace_handle=workspace_handle,
+        )
+        self.lookups = 0
+
+    def get_workspace(self):
+        self.lookups += 1
+        return SimpleNamespace(handle=self.config.workspace_handle)
+
+
+def test_workspace_handle_is_resolved_once():
+    invalidate_workspace_handle()
+    client = FakeClient(workspace_id="ws-1", workspace_handle="my-workspace")
+    for _ in range(5):
+        assert get_workspace_handle(client) == "my-workspace"
+    assert client.lookups == 1
+
+    invalidate_workspace_handle(client)
+    assert get_workspace_handle(client) == "my-workspace"
+    assert client.lookups == 2
+
+
+def test_workspace_handle_is_scoped_to_workspace():
+    invalidate_workspace_handle()
+    first = FakeClient(workspace_id="ws-1", workspace_handle="first")
+    second = FakeClient(workspace_id="ws-2", workspace_handle="second")
+    assert get_workspace_handle(first) == "first"
+    assert get_workspace_handle(second) == "second"
+
+
+def test_client_scope_identifies_workspace():
+    assert client_scope(FakeClient(workspace_id="ws-1", workspace_handle="first")) == (
+        "https://api.steamship.com/api/v1/",
+        "test-key",
+        "ws-1",
+    )
+    assert client_scope(FakeClient(workspace_id=None, workspace_handle="first"))[-1] == "first"
@@ -0,0 +1,16 @@
+import pytest
+from utils.fake_encoding import bigram_encoding
+
+from steamship_langchain.tokens import counting, message_token_cache
+
+
+@pytest.fixture
+def encodings(monkeypatch):
+    """Load a small, offline stand-in for every tiktoken encoding, and start from empty encoding and count caches."""
+    monkeypatch.setattr(counting.tiktoken, "get_encoding", bigram_encoding)
+    monkeypatch.setattr(counting, "_encodings", {})
+    monkeypatch.setattr(counting, "_model_encodings", {})
+    monkeypatch.setattr(counting, "_counters", {})
+    message_token_cache.clear()
+    yield
+    message_token_cache.clear()
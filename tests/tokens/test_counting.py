@@ -0,0 +1,83 @@
+import pytest
+import tiktoken
+
+from steamship_langchain.tokens import TokenCounter, counting, encoding_for_model, get_encoding
+
+
+def _byte_encoding(name: str = "bytes") -> tiktoken.Encoding:
+    """A tiny (one token per byte) encoding that needs no download."""
+    return tiktoken.Encoding(
+        name,
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={"<|endoftext|>": 256},
+    )
+
+
+@pytest.fixture
+def loaded_encodings(monkeypatch):
+    loads = []
+
+    def _get_encoding(name: str) -> tiktoken.Encoding:
+        loads.append(name)
+        return _byte_encoding(name)
+
+    monkeypatch.setattr(counting.tiktoken, "get_encoding", _get_encoding)
+    monkeypatch.setattr(counting, "_encodings", {})
+    monkeypatch.setattr(counting, "_model_encodings", {})
+    monkeypatch.setattr(counting, "_counters", {})
+    return loads
+
+
+def test_encodings_are_loaded_once(loaded_encodings):
+    assert get_encoding("p50k_base") is get_encoding("p50k_base")
+    assert encoding_for_model("gpt-3.5-turbo-0613") is encoding_for_model("gpt-4-0613")
+    assert encoding_for_model("gpt-4").name == "cl100k_base"
+    assert loaded_encodings == ["p50k_base", "cl100k_base"]
+
+    with pytest.raises(KeyError):
+        encoding_for_model("not-a-model")
+
+
+def test_shared_counters_are_registered_per_encoding(loaded_encodings):
+    counter = counting.token_counter_for_model("gpt-3.5-turbo")
+    assert counter is counting.token_counter("cl100k_base")
+    assert counter is not counting.token_counter("p50k_base")
+
+
+def test_token_counter_counts_batches():
+    counter = TokenCounter(_byte_encoding())
+    assert counter.count("hello") == 5
+    assert counter.count_batch(["a b", "", "hello", "a b"]) == [3, 0, 5, 3]
+    # special tokens are counted as ordinary text.
+    assert counter.count("<|endoftext|>") == len("<|endoftext|>")
+
+
+def test_token_counter_caches_counts():
+    encoding = _byte_encoding()
+    batches = []
+    encode_ordinary_batch = encoding.encode_ordinary_batch
+    encoding.encode_ordinary_batch = lambda texts: batches.append(texts) or encode_ordinary_batch(
+        texts
+    )
+    counter = TokenCounter(encoding, max_size=3)
+
+    counter.count_batch(["system", "human", "system"])
+    counter.count_batch(["system", "human", "ai", "human"])
+    # uncached strings are encoded once per batch (a single uncached string is encoded on its own).
+    assert batches == [["system", "human"]]
+    assert counter.stats() == {"hits": 3, "misses": 3, "size": 3}
+
+    counter.count("new")  # evicts the least recently used count ("system")
+    counter.count("system")
+    assert counter.stats()["misses"] == 5
+
+
+def test_token_counter_does_not_retain_strings():
+    counter = TokenCounter(_byte_encoding())
+    long_text = "x" * 100_000
+    assert counter.count_batch([long_text, "short", long_text]) == [100_000, 5, 100_000]
+    assert counter.count(long_text) == 100_000
+    assert counter.stats() == {"hits": 1, "misses": 2, "size": 2}
+    # counts are keyed by fixed-size digests, not by the strings themselves.
+    assert all(len(key) == 32 for key in counter._entries)
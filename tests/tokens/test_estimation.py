@@ -0,0 +1,125 @@
+import random
+
+import pytest
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from utils.fake_client import FakeSteamship
+from utils.fake_encoding import bigram_encoding
+
+from steamship_langchain.chat_models import ChatOpenAI
+from steamship_langchain.tokens import TokenCounter, TokenEstimator, get_encoding
+
+
+def _corpus(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["the", "memory", "agent", "token", "a", "of", "Steamship", "2023", "?", "(x)", "naïve"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(20, 400))) for _ in range(n)]
+
+
+def test_estimator_modes():
+    counter = TokenCounter(bigram_encoding())
+    text = "hello world " * 50
+    exact = counter.count(text)
+
+    assert TokenEstimator(mode="exact").count(counter, text) == exact
+    approximate = TokenEstimator(mode="approximate", bytes_per_token={"cl100k_base": 3.0})
+    assert approximate.count(counter, text) == round(len(text) / 3.0)
+    assert approximate.stats() == {"exact": 0, "approximate": 1}
+
+    with pytest.raises(ValueError):
+        TokenEstimator(mode="hybrid")
+    with pytest.raises(ValueError):
+        TokenEstimator(mode="guess")
+
+
+def test_calibrated_error_bound_holds_on_held_out_text():
+    counter = TokenCounter(bigram_encoding())
+    estimator = TokenEstimator()
+    ratio, bound = estimator.calibrate(counter, _corpus(200, seed=1))
+    assert 1.0 < ratio < 4.0
+    assert bound < 0.2
+
+    for text in _corpus(200, seed=2):
+        approximate = estimator.count(counter, text)
+        assert abs(approximate - counter.count(text)) <= (bound + 0.05) * approximate + 1
+
+
+def test_hybrid_decides_limits_like_exact_counting():
+    counter = TokenCounter(bigram_encoding())
+    calibrated = TokenEstimator()
+    calibrated.calibrate(counter, _corpus(200, seed=1))
+
+    texts = _corpus(300, seed=3)
+    for limit in (50, 200, 500, 1000):
+        hybrid = TokenEstimator(
+            mode="hybrid",
+            limit=limit,
+            bytes_per_token=calibrated.bytes_per_token,
+            relative_error=calibrated.relative_error + 0.05,
+        )
+        for text in texts:
+            assert (hybrid.count(counter, text) > limit) == (counter.count(text) > limit)
+        # only texts near the limit were counted exactly.
+        assert hybrid.stats()["exact"] < len(texts) / 2
+
+
+def test_hybrid_counts_totals_exactly_near_the_limit():
+    counter = TokenCounter(bigram_encoding())
+    texts = ["abcdef " * 10] * 3
+    exact = sum(counter.count_batch(texts)) + 5
+
+    bytes_per_token = {"cl100k_base": 2.0}  # roughly that of the bigram encoding
+    hybrid = TokenEstimator(mode="hybrid", limit=exact, bytes_per_token=bytes_per_token)
+    assert hybrid.count_total(counter, texts, overhead=5) == exact
+    far = TokenEstimator(mode="hybrid", limit=exact * 10, bytes_per_token=bytes_per_token)
+    assert far.count_total(counter, texts, overhead=5) != exact
+    assert far.stats()["exact"] == 0
+
+
+def test_hybrid_counts_batches_exactly_near_the_limit():
+    """Test that hybrid batches are counted exactly when their total, not any one text, is near the limit."""
+    counter = TokenCounter(bigram_encoding())
+    texts = ["abcdef " * 10] * 3
+    exact = counter.count_batch(texts)
+
+    bytes_per_token = {"cl100k_base": 2.0}
+    hybrid = TokenEstimator(mode="hybrid", limit=sum(exact), bytes_per_token=bytes_per_token)
+    assert hybrid.count_batch(counter, texts) == exact
+    assert hybrid.stats() == {"exact": 3, "approximate": 0}
+
+    far = TokenEstimator(mode="hybrid", limit=sum(exact) * 10, bytes_per_token=bytes_per_token)
+    assert far.count_batch(counter, texts) != exact
+    assert far.count_total(counter, texts) == sum(far.count_batch(counter, texts))
+    assert far.stats() == {"exact": 0, "approximate": 9}
+
+
+def test_real_encodings_are_within_default_bound():
+    try:
+        encodings = [get_encoding("p50k_base"), get_encoding("cl100k_base")]
+    except Exception:
+        pytest.skip("tiktoken encodings are not available (no network or encoding cache).")
+
+    with open(__file__) as f:
+        source = f.read()
+    samples = [source[i : i + 2000] for i in range(0, len(source), 2000)] + _corpus(20)
+    for encoding in encodings:
+        counter = TokenCounter(encoding)
+        estimator = TokenEstimator()
+        for text in samples:
+            approximate = estimator.count(counter, text)
+            assert abs(approximate - counter.count(text)) <= estimator.relative_error * approximate
+
+
+def test_chat_openai_uses_token_estimator(encodings):
+    estimator = TokenEstimator(mode="approximate", bytes_per_token={"cl100k_base": 2.0})
+    chat = ChatOpenAI(client=FakeSteamship(), model_name="gpt-4", token_estimator=estimator)
+    messages = [
+        SystemMessage(content="You are a helpful assistant."),
+        HumanMessage(content="What is a token?"),
+        AIMessage(content="A token is a piece of a word."),
+    ]
+
+    exact = ChatOpenAI(client=FakeSteamship(), model_name="gpt-4").get_num_tokens_from_messages(
+        messages
+    )
+    assert chat.get_num_tokens_from_messages(messages) == pytest.approx(exact, rel=0.5)
+    assert estimator.stats() == {"exact": 0, "approximate": 6}
@@ -0,0 +1,58 @@
+import hashlib
+import os
+
+import pytest
+import tiktoken
+from steamship import SteamshipError
+from tiktoken.load import read_file_cached
+
+from steamship_langchain.tokens import counting, prewarm_encodings, set_encoding_cache_dir
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(counting, "_encodings", {})
+    monkeypatch.setattr(counting, "_model_encodings", {})
+    monkeypatch.setattr(counting, "_counters", {})
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    loads = []
+
+    def _get_encoding(name: str) -> tiktoken.Encoding:
+        if name == "missing":
+            raise ValueError("no network")
+        loads.append(name)
+        return tiktoken.Encoding(
+            name,
+            pat_str=r"\S+",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={},
+        )
+
+    monkeypatch.setattr(counting.tiktoken, "get_encoding", _get_encoding)
+    return loads
+
+
+def test_prewarm_loads_encodings_once_and_reports_timings(registry, tmp_path):
+    timings = prewarm_encodings(model_names=["gpt-4", "text-davinci-003"], cache_dir=tmp_path)
+
+    assert list(timings) == ["p50k_base", "cl100k_base"]
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == str(tmp_path)
+
+    prewarm_encodings()
+    assert registry == ["p50k_base", "cl100k_base"]
+    assert counting.token_counter("cl100k_base").count("hi") == 2
+
+
+def test_prewarm_failure_names_the_encoding(registry):
+    with pytest.raises(SteamshipError, match="missing"):
+        prewarm_encodings(encoding_names=["missing"])
+
+
+def test_encoding_cache_dir_is_read_without_network(monkeypatch, tmp_path):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    url = "https://openaipublic.blob.core.windows.net/encodings/offline-test.tiktoken"
+    (tmp_path / hashlib.sha1(url.encode()).hexdigest()).write_bytes(b"cached contents")
+
+    set_encoding_cache_dir(tmp_path)
+    assert read_file_cached(url) == b"cached contents"
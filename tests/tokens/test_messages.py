@@ -0,0 +1,126 @@
+import pytest
+from langchain.schema import AIMessage, FunctionMessage, HumanMessage, SystemMessage
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.chat_models import ChatOpenAI
+from steamship_langchain.tokens import (
+    MessageOverhead,
+    MessageTokenCache,
+    counting,
+    message_overhead,
+    message_token_cache,
+)
+
+
+@pytest.mark.parametrize(
+    "model_name, expected",
+    [
+        ("gpt-3.5-turbo-0301", MessageOverhead(4, -1)),
+        ("gpt-3.5-turbo", MessageOverhead(3, 1)),
+        ("gpt-3.5-turbo-0613", MessageOverhead(3, 1)),
+        ("gpt-3.5-turbo-16k-0613", MessageOverhead(3, 1)),
+        ("gpt-4", MessageOverhead(3, 1)),
+        ("gpt-4-0314", MessageOverhead(3, 1)),
+        ("gpt-4-32k-0613", MessageOverhead(3, 1)),
+        ("gpt-4-1106-preview", MessageOverhead(3, 1)),
+    ],
+)
+def test_message_overhead_table(model_name, expected):
+    assert message_overhead(model_name) == expected
+
+
+def test_message_overhead_of_unknown_models():
+    with pytest.raises(NotImplementedError):
+        message_overhead("text-davinci-003")
+
+
+def test_chat_openai_counts_function_messages(encodings):
+    chat = ChatOpenAI(client=FakeSteamship())  # defaults to gpt-3.5-turbo-0613
+    counter = counting.token_counter("cl100k_base")
+    messages = [
+        SystemMessage(content="You are a helpful assistant."),
+        HumanMessage(content="What is the weather in Boston?"),
+        AIMessage(
+            content="",
+            additional_kwargs={
+                "function_call": {"name": "get_weather", "arguments": '{"city": "Boston"}'}
+            },
+        ),
+        FunctionMessage(name="get_weather", content='{"temperature": 22}'),
+    ]
+
+    texts = [
+        "system",
+        "You are a helpful assistant.",
+        "user",
+        "What is the weather in Boston?",
+        "assistant",
+        "",
+        "get_weather",
+        '{"city": "Boston"}',
+        "function",
+        '{"temperature": 22}',
+        "get_weather",
+    ]
+    # 3 tokens per message, 1 for the function message's name, and 3 to prime the reply.
+    expected = sum(counter.count(text) for text in texts) + 4 * 3 + 1 + 3
+    assert chat.get_num_tokens_from_messages(messages) == expected
+
+
+def test_chat_openai_encodes_all_messages_as_one_batch(encodings, monkeypatch):
+    chat = ChatOpenAI(client=FakeSteamship(), model_name="gpt-4-0613")
+    encoding = counting.token_counter_for_model("gpt-4-0613").encoding
+    batches = []
+    encode_ordinary_batch = encoding.encode_ordinary_batch
+    monkeypatch.setattr(
+        encoding,
+        "encode_ordinary_batch",
+        lambda texts: batches.append(texts) or encode_ordinary_batch(texts),
+    )
+
+    chat.get_num_tokens_from_messages([HumanMessage(content=f"message {i}") for i in range(10)])
+    assert len(batches) == 1
+    assert len(batches[0]) == 20
+
+
+def test_chat_openai_counts_only_new_messages_per_turn(encodings, monkeypatch):
+    chat = ChatOpenAI(client=FakeSteamship(), model_name="gpt-4-0613")
+    counter = counting.token_counter_for_model("gpt-4-0613")
+    batches = []
+    encode_ordinary_batch = counter.encoding.encode_ordinary_batch
+    monkeypatch.setattr(
+        counter.encoding,
+        "encode_ordinary_batch",
+        lambda texts: batches.append(texts) or encode_ordinary_batch(texts),
+    )
+
+    history = [SystemMessage(content="You are a helpful assistant.")]
+    totals = []
+    for turn in range(3):
+        history.append(HumanMessage(content=f"Question {turn}?"))
+        totals.append(chat.get_num_tokens_from_messages(history))
+
+    # after the first turn, only the new message's fields are encoded.
+    assert batches[1:] == [["user", "Question 1?"], ["user", "Question 2?"]]
+    assert message_token_cache.stats() == {"hits": 5, "misses": 4, "size": 4}
+    assert message_token_cache.hit_rate() == 5 / 9
+
+    # the texts of uncached messages are not also cached by the token counter.
+    assert counter.stats()["size"] == 0
+
+    message_token_cache.clear()
+    assert chat.get_num_tokens_from_messages(history) == totals[-1]
+
+
+def test_message_token_cache_is_size_bounded(encodings):
+    cache = MessageTokenCache(max_size=2)
+    counter = counting.token_counter("cl100k_base")
+    overhead = MessageOverhead(3, 1)
+    messages = [{"role": "user", "content": text} for text in ("a", "b", "c")]
+
+    cache.counts(messages, overhead, counter)
+    cache.counts(messages[-1:], overhead, counter)
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 2}
+    # the same content under another role (or overhead) is a different message.
+    cache.counts([{"role": "assistant", "content": "c"}], MessageOverhead(4, -1), counter)
+    assert cache.stats() == {"hits": 1, "misses": 4, "size": 2}
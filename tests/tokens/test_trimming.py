@@ -0,0 +1,182 @@
+import pytest
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from steamship import SteamshipError
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.chat_models import ChatOpenAI
+from steamship_langchain.chat_models.openai import _convert_message_to_dict
+from steamship_langchain.files import ConversationFile
+from steamship_langchain.tokens import (
+    ContextTrimmer,
+    MessageOverhead,
+    TokenEstimator,
+    counting,
+    message_token_counts,
+)
+
+
+def _count_words(message_dicts):
+    # one token per word and no per-message overhead, to keep the arithmetic readable.
+    return [len(message.get("content", "").split()) for message in message_dicts]
+
+
+def _message(role, words, **kwargs):
+    return {"role": role, "content": " ".join([role] * words), **kwargs}
+
+
+def test_trimmer_keeps_histories_within_budget_untouched():
+    history = [_message("system", 5), _message("user", 5)]
+    assert ContextTrimmer(max_tokens=13).trim(history, _count_words) is history
+
+
+def test_trimmer_drops_oldest_turns_and_keeps_system_messages():
+    trimmer = ContextTrimmer(max_tokens=3 + 20)
+    history = [
+        _message("system", 5),
+        _message("user", 10),
+        _message("assistant", 10),
+        _message("user", 5),
+        _message("assistant", 5),
+        _message("user", 5),
+    ]
+    assert trimmer.trim(history, _count_words) == [history[0]] + history[3:]
+    assert trimmer.stats() == {"trims": 1, "messages_dropped": 2, "tokens_dropped": 20}
+
+
+def test_trimmer_drops_function_results_with_their_calls():
+    history = [
+        _message("user", 5),
+        _message("assistant", 5, function_call={"name": "f", "arguments": "{}"}),
+        _message("function", 1, name="f"),
+        _message("user", 5),
+    ]
+    # dropping the first two messages is enough, but the function result would be orphaned.
+    assert ContextTrimmer(max_tokens=3 + 6).trim(history, _count_words) == [history[3]]
+
+
+def test_trimmer_raises_when_kept_messages_do_not_fit():
+    history = [_message("system", 10), _message("user", 1), _message("user", 10)]
+    with pytest.raises(SteamshipError):
+        ContextTrimmer(max_tokens=15).trim(history, _count_words)
+
+
+def test_trimmer_summarizes_dropped_turns():
+    summarized = []
+
+    def _summarize(messages):
+        summarized.append(messages)
+        return "earlier"
+
+    trimmer = ContextTrimmer(max_tokens=3 + 12, summarize=_summarize, summary_tokens=2)
+    history = [_message("system", 5), _message("user", 5), _message("user", 5)]
+    trimmed = trimmer.trim(history, _count_words)
+
+    assert summarized == [[history[1]]]
+    assert trimmed == [history[0], {"role": "system", "content": "earlier"}, history[2]]
+
+
+def test_message_token_counts_add_up_to_the_prompt_total(encodings):
+    chat = ChatOpenAI(client=FakeSteamship())
+    messages = [
+        SystemMessage(content="You are a helpful assistant."),
+        HumanMessage(content="Hello!", additional_kwargs={"name": "alice"}),
+        AIMessage(content="Hi, how can I help?"),
+    ]
+    counts = message_token_counts(
+        [_convert_message_to_dict(m) for m in messages],
+        MessageOverhead(3, 1),
+        counting.token_counter("cl100k_base").count_batch,
+    )
+    assert len(counts) == 3
+    assert sum(counts) + 3 == chat.get_num_tokens_from_messages(messages)
+
+
+def test_chat_openai_uploads_trimmed_history(encodings):
+    client = FakeSteamship(completion="Hello there, human!")
+    history = [SystemMessage(content="You are a helpful assistant.")]
+    history += [HumanMessage(content=f"This is message number {i}.") for i in range(20)]
+    chat = ChatOpenAI(client=client)
+    budget = chat.get_num_tokens_from_messages(history[:1] + history[-5:])
+    chat = ChatOpenAI(client=client, context_trimmer=ContextTrimmer(max_tokens=budget))
+
+    assert chat(history).content == "Hello there, human!"
+    (file,) = client.files.values()
+    assert [block["text"] for block in file["blocks"]] == [
+        m.content for m in history[:1] + history[-5:]
+    ]
+
+
+def test_chat_openai_trims_with_exact_counts_despite_token_estimator(encodings):
+    """Test that an approximating token estimator cannot let an over-budget prompt through the trimmer."""
+    client = FakeSteamship(completion="Hello there, human!")
+    history = [SystemMessage(content="You are a helpful assistant.")]
+    history += [HumanMessage(content=f"This is message number {i}.") for i in range(20)]
+    chat = ChatOpenAI(client=client)
+    budget = chat.get_num_tokens_from_messages(history[:1] + history[-5:])
+    # counts bytes as tokens: far above the exact counts, so approximations would keep too few messages.
+    estimator = TokenEstimator(
+        mode="hybrid", limit=10 * budget, bytes_per_token={"cl100k_base": 1.0}
+    )
+    chat = ChatOpenAI(
+        client=client,
+        context_trimmer=ContextTrimmer(max_tokens=budget),
+        token_estimator=estimator,
+    )
+
+    assert chat(history).content == "Hello there, human!"
+    (file,) = client.files.values()
+    assert [block["text"] for block in file["blocks"]] == [
+        m.content for m in history[:1] + history[-5:]
+    ]
+
+
+def test_chat_openai_trims_conversation_without_restarting_it(encodings):
+    client = FakeSteamship(completion="Hello there, human!")
+    conversation = ConversationFile(client)
+    history = [SystemMessage(content="You are a helpful assistant.")]
+    history += [HumanMessage(content=f"This is message number {i}.") for i in range(4)]
+    chat = ChatOpenAI(client=client)
+    budget = chat.get_num_tokens_from_messages(history[:1] + history[-3:])
+    chat = ChatOpenAI(
+        client=client,
+        context_trimmer=ContextTrimmer(max_tokens=budget),
+        conversation_file=conversation,
+    )
+
+    for turn in range(6):
+        kept = chat._trim([_convert_message_to_dict(m) for m in history])
+        history.append(chat(history))
+
+        # the File holds the whole history, from which generation selects the messages that fit in the budget.
+        (file,) = client.files.values()
+        texts = [block["text"] for block in file["blocks"]]
+        assert texts == [m.content for m in history]
+        indices = client.plugin.generate_calls[-1]["input_file_block_index_list"]
+        assert [texts[i] for i in indices] == [m["content"] for m in kept]
+        history.append(HumanMessage(content=f"This is turn number {turn}."))
+
+    assert conversation.stats() == {"files_created": 1, "blocks_appended": 5, "size": 16}
+
+
+def test_chat_openai_uploads_summarized_conversation_on_its_own(encodings):
+    client = FakeSteamship(completion="Hello there, human!")
+    conversation = ConversationFile(client)
+    history = [SystemMessage(content="You are a helpful assistant.")]
+    history += [HumanMessage(content=f"This is message number {i}.") for i in range(6)]
+    chat = ChatOpenAI(client=client)
+    budget = chat.get_num_tokens_from_messages(history[:1] + history[-3:])
+    trimmer = ContextTrimmer(
+        max_tokens=budget, summarize=lambda dropped: "Earlier.", summary_tokens=8
+    )
+    chat = ChatOpenAI(client=client, context_trimmer=trimmer, conversation_file=conversation)
+
+    history.append(chat(history))
+    # the summarized prompt is a File of its own; the reply is still appended to the conversation File.
+    call = client.plugin.generate_calls[-1]
+    assert call["input_file_id"] != conversation.file_id
+    assert call["output_file_id"] == conversation.file_id
+    assert "Earlier." in [block["text"] for block in client.files[call["input_file_id"]]["blocks"]]
+    assert [block["text"] for block in client.files[conversation.file_id]["blocks"]] == [
+        m.content for m in history
+    ]
+    assert conversation.stats()["files_created"] == 1
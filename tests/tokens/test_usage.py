@@ -0,0 +1,86 @@
+import pytest
+from langchain.schema import HumanMessage, SystemMessage
+from steamship import Block, Tag
+from utils.fake_client import FakeSteamship
+
+from steamship_langchain.chat_models import ChatOpenAI
+from steamship_langchain.llms import OpenAIChat
+from steamship_langchain.tokens import (
+    combine_token_usage,
+    counting,
+    reported_token_usage,
+    token_usage,
+)
+
+
+def test_reported_token_usage():
+    usage = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    assert reported_token_usage([Block(text="hi")]) is None
+    assert (
+        reported_token_usage([Block(text="hi", tags=[Tag(kind="token_usage", value=usage)])])
+        == usage
+    )
+
+
+def test_combine_token_usage_skips_missing_usage():
+    assert combine_token_usage([token_usage(10, 5), None, {}, token_usage(1, 2)]) == token_usage(
+        11, 7
+    )
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_chat_openai_counts_usage_across_message_lists(encodings, streaming):
+    client = FakeSteamship(completion="Hello there, human!")
+    chat = ChatOpenAI(client=client, streaming=streaming)
+    conversations = [
+        [SystemMessage(content="You are a helpful assistant."), HumanMessage(content="Hi!")],
+        [HumanMessage(content="How are you today?")],
+    ]
+
+    result = chat.generate(conversations)
+    completion_tokens = chat.get_num_tokens("Hello there, human!")
+    expected = combine_token_usage(
+        token_usage(chat.get_num_tokens_from_messages(messages), completion_tokens)
+        for messages in conversations
+    )
+    assert result.llm_output == {"token_usage": expected, "model_name": chat.model_name}
+
+
+def test_chat_openai_prefers_reported_usage(encodings):
+    client = FakeSteamship(completion="Hello there, human!")
+    client.plugin.token_usage = token_usage(100, 20)
+    chat = ChatOpenAI(client=client)
+
+    result = chat.generate([[HumanMessage(content="Hi!")]] * 3)
+    assert result.llm_output["token_usage"] == token_usage(300, 60)
+
+
+def test_openai_chat_reports_usage(encodings):
+    client = FakeSteamship(completion="Hello there, human!")
+    llm = OpenAIChat(client=client)
+
+    result = llm.generate(["Hi!"])
+    # counted as the chat model counts the same prompt, not with the completion (p50k_base) encoding.
+    chat = ChatOpenAI(client=client, model_name="gpt-4")
+    expected = token_usage(
+        chat.get_num_tokens_from_messages([HumanMessage(content="Hi!")]),
+        chat.get_num_tokens("Hello there, human!"),
+    )
+    assert result.llm_output == {"token_usage": expected, "model_name": "gpt-4"}
+
+    client.plugin.token_usage = token_usage(7, 3)
+    assert llm.generate(["Hi!"]).llm_output["token_usage"] == token_usage(7, 3)
+
+
+def test_chat_openai_usage_never_fails_generation(monkeypatch):
+    def _unavailable(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(counting.tiktoken, "get_encoding", _unavailable)
+    monkeypatch.setattr(counting, "_encodings", {})
+    monkeypatch.setattr(counting, "_counters", {})
+    chat = ChatOpenAI(client=FakeSteamship(completion="Hello there, human!"))
+
+    result = chat.generate([[HumanMessage(content="Hi!")]])
+    assert result.generations[0][0].text == "Hello there, human!"
+    assert result.llm_output["token_usage"] == {}
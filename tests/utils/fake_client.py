@@ -0,0 +1,227 @@
+"""Fake Steamship client and generator plugin, for testing without a running Steamship engine."""
+import re
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Set, Union
+
+from steamship import Block, File, SteamshipError, Tag, TaskState
+from steamship.data import TagValueKey
+from steamship.data.tags.tag_constants import RoleTag, TagKind
+
+
+class FakeTask:
+    """A Task that completes with the provided output, after `refreshes_to_complete` status refreshes."""
+
+    def __init__(
+        self,
+        output: Any = None,
+        state: str = TaskState.succeeded,
+        status_message: Optional[str] = None,
+        refreshes_to_complete: int = 0,
+    ):
+        self.task_id = uuid.uuid4().hex
+        self.state = state if refreshes_to_complete == 0 else TaskState.running
+        self.output = output
+        self.status_message = status_message
+        self.refreshes = 0
+        self._final_state = state
+        self._refreshes_to_complete = refreshes_to_complete
+
+    def wait(self, *args, **kwargs) -> Any:
+        self.state = self._final_state
+        return self.output
+
+    def refresh(self) -> None:
+        self.refreshes += 1
+        if self.refreshes >= self._refreshes_to_complete:
+            self.state = self._final_state
+
+
+class FakeGeneratorPlugin:
+    """Generator plugin that replies with a fixed completion, split into fixed-size chunks when streaming."""
+
+    def __init__(self, client: "FakeSteamship", completion: str, chunk_size: int = 4):
+        self.client = client
+        self.completion = completion
+        self.chunk_size = chunk_size
+        self.generate_calls: List[Dict[str, Any]] = []
+        self.token_usage: Optional[Dict[str, int]] = None
+
+    def generate(
+        self,
+        input_file_id: str = None,
+        options: Optional[dict] = None,
+        streaming: Optional[bool] = None,
+        **kwargs,
+    ) -> FakeTask:
+        self.generate_calls.append(
+            {"input_file_id": input_file_id, "options": options, "streaming": streaming, **kwargs}
+        )
+        if input_file_id not in self.client.files:
+            raise SteamshipError(message=f"File {input_file_id} not found.")
+        content = self.completion.encode("utf-8")
+        if streaming:
+            chunks = [
+                content[i : i + self.chunk_size] for i in range(0, len(content), self.chunk_size)
+            ]
+        else:
+            chunks = [content]
+        tags = [Tag(kind="token_usage", value=self.token_usage)] if self.token_usage else []
+        block = self.client.create_block(chunks=chunks, streaming=bool(streaming), tags=tags)
+        if kwargs.get("append_output_to_file"):
+            self.client.files[kwargs["output_file_id"]].setdefault("blocks", []).append(
+                {
+                    "text": self.completion,
+                    "tags": [{"kind": TagKind.ROLE, "name": RoleTag.ASSISTANT}],
+                }
+            )
+        return FakeTask(output=SimpleNamespace(blocks=[block]))
+
+
+class FakeTaggerPlugin:
+    """Completion (gpt-3) plugin, which tags each prompt block of a File with the generation "<prompt>!".
+
+    Tasks for batches holding any of `failing_prompts` fail. A batch's task takes the largest number of refreshes
+    given in `refreshes` for its prompts to complete.
+    """
+
+    def __init__(self):
+        self.tag_calls: List[List[str]] = []
+        self.failing_prompts: Set[str] = set()
+        self.refreshes: Dict[str, int] = {}
+
+    def tag(self, doc: File) -> FakeTask:
+        prompts = [block.text for block in doc.blocks]
+        self.tag_calls.append(prompts)
+        refreshes = max(self.refreshes.get(prompt, 0) for prompt in prompts)
+        if self.failing_prompts.intersection(prompts):
+            return FakeTask(
+                state=TaskState.failed,
+                status_message="generation failed",
+                refreshes_to_complete=refreshes,
+            )
+
+        generations = [
+            Block(
+                text=prompt,
+                tags=[Tag(kind=TagKind.GENERATION, value={TagValueKey.STRING_VALUE: f"{prompt}!"})],
+            )
+            for prompt in prompts
+        ]
+        usage = Tag(kind="token_usage", value={"total_tokens": len(prompts)})
+        return FakeTask(
+            output=SimpleNamespace(file=SimpleNamespace(blocks=generations, tags=[usage])),
+            refreshes_to_complete=refreshes,
+        )
+
+
+class FakeSteamship:
+    """In-memory stand-in for the Steamship client.
+
+    Implements the engine operations the wrappers use for Files and Blocks. Streaming blocks reveal one more chunk of
+    their content each time their raw content is requested.
+    """
+
+    def __init__(self, completion: str = "Hello from a fake plugin!", chunk_size: int = 4):
+        self.config = SimpleNamespace(
+            api_base="https://fake.steamship.run/api/v1/",
+            api_key="fake-key",
+            workspace_id=uuid.uuid4().hex,
+            workspace_handle="fake-workspace",
+        )
+        self.plugin = FakeGeneratorPlugin(self, completion=completion, chunk_size=chunk_size)
+        self.tagger = FakeTaggerPlugin()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.blocks: Dict[str, Dict[str, Any]] = {}
+        self.fail_deletes: Set[str] = set()
+        self.use_plugin_calls: List[Dict[str, Any]] = []
+
+    def use_plugin(self, *args, **kwargs) -> Union[FakeGeneratorPlugin, FakeTaggerPlugin]:
+        self.use_plugin_calls.append(kwargs)
+        return self.tagger if kwargs.get("plugin_handle") == "gpt-3" else self.plugin
+
+    def get_workspace(self) -> SimpleNamespace:
+        return SimpleNamespace(handle=self.config.workspace_handle, id=self.config.workspace_id)
+
+    def create_block(
+        self, chunks: List[bytes], streaming: bool, tags: Optional[List[Tag]] = None
+    ) -> Block:
+        block_id = uuid.uuid4().hex
+        self.blocks[block_id] = {
+            "chunks": chunks,
+            "revealed": 0 if streaming else len(chunks),
+            "tags": tags or [],
+        }
+        return self._block(block_id)
+
+    def _file(self, file_id: str) -> File:
+        payload = self.files[file_id]
+        file = File(
+            id=file_id,
+            handle=payload.get("handle"),
+            blocks=[Block(**block) for block in payload.get("blocks", [])],
+            tags=[Tag(**tag) for tag in payload.get("tags") or []],
+        )
+        file.client = self
+        return file
+
+    def _block(self, block_id: str) -> Block:
+        state = self.blocks[block_id]
+        streaming = state["revealed"] < len(state["chunks"])
+        block = Block(
+            id=block_id,
+            text=None if streaming else b"".join(state["chunks"]).decode("utf-8"),
+            tags=[Tag(kind=TagKind.ROLE, name=RoleTag.ASSISTANT), *state["tags"]],
+            stream_state="started" if streaming else "complete",
+        )
+        block.client = self
+        return block
+
+    def post(self, operation: str, payload: Any = None, expect: Any = None, **kwargs) -> Any:
+        handler = getattr(self, "_post_" + operation.replace("/", "_"), None)
+        if handler is None:
+            raise NotImplementedError(f"FakeSteamship does not support {operation}")
+        return handler(payload)
+
+    def _post_file_create(self, payload: Dict[str, Any]) -> File:
+        if payload.get("handle") and any(
+            file["handle"] == payload["handle"] for file in self.files.values()
+        ):
+            raise SteamshipError(message=f"File {payload['handle']} already exists.")
+        file_id = uuid.uuid4().hex
+        self.files[file_id] = payload
+        return self._file(file_id)
+
+    def _post_file_get(self, payload: Any) -> File:
+        for file_id, file in self.files.items():
+            if file_id == payload.id or (payload.handle and file["handle"] == payload.handle):
+                return self._file(file_id)
+        raise SteamshipError(message="File not found.")
+
+    def _post_file_query(self, payload: Any) -> SimpleNamespace:
+        kind = re.search(r'kind "([^"]+)"', payload.tag_filter_query).group(1)
+        return SimpleNamespace(
+            files=[
+                self._file(file_id)
+                for file_id, file in self.files.items()
+                if any(tag.get("kind") == kind for tag in file.get("tags") or [])
+            ]
+        )
+
+    def _post_file_delete(self, payload: Any) -> None:
+        if payload.id in self.fail_deletes:
+            raise SteamshipError(message=f"Could not delete file {payload.id}.")
+        self.files.pop(payload.id)
+
+    def _post_block_create(self, payload: Dict[str, Any]) -> Block:
+        block = {"text": payload["text"], "tags": payload["tags"], "mimeType": payload["mimeType"]}
+        self.files[payload["fileId"]].setdefault("blocks", []).append(block)
+        return Block(**block)
+
+    def _post_block_get(self, payload: Any) -> Block:
+        return self._block(payload.id)
+
+    def _post_block_raw(self, payload: Dict[str, Any]) -> bytes:
+        state = self.blocks[payload["id"]]
+        state["revealed"] = min(state["revealed"] + 1, len(state["chunks"]))
+        return b"".join(state["chunks"][: state["revealed"]])
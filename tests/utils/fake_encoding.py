@@ -0,0 +1,15 @@
+"""Small tiktoken encodings that can be built without downloading any BPE files."""
+import string
+
+import tiktoken
+
+
+def bigram_encoding(name: str = "cl100k_base") -> tiktoken.Encoding:
+    """An encoding with one token per byte, plus one token per pair of lowercase letters."""
+    ranks = {bytes([i]): i for i in range(256)}
+    for a in string.ascii_lowercase:
+        for b in string.ascii_lowercase:
+            ranks[(a + b).encode()] = len(ranks)
+    return tiktoken.Encoding(
+        name, pat_str=r" ?[a-z]+| ?[^a-z\s]+|\s+", mergeable_ranks=ranks, special_tokens={}
+    )